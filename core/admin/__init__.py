@@ -1,13 +1,14 @@
 # Import de toutes les configurations admin pour maintenir la compatibilité
 from .services import ServiceAdmin
 from .users import UserAdmin
-from .gaps import AuditSourceAdmin, ProcessAdmin, GapTypeAdmin, GapReportAdmin, GapAdmin, HistoriqueModificationAdmin
+from .gaps import AuditSourceAdmin, ProcessAdmin, GapTypeAdmin, GapReportAdmin, GapAdmin, HistoriqueModificationAdmin, HistoriqueArchiveAdmin
 from .workflow import ValidateurServiceAdmin
 from .notifications import NotificationAdmin, GapValidationAdmin
+from .monitoring import SlowQuerySampleAdmin, RequestProfileAdmin
 
 # Export explicite pour les imports directs
 __all__ = [
     'ServiceAdmin', 'UserAdmin', 'AuditSourceAdmin', 'ProcessAdmin', 
-    'GapTypeAdmin', 'GapReportAdmin', 'GapAdmin', 'HistoriqueModificationAdmin',
-    'ValidateurServiceAdmin', 'NotificationAdmin', 'GapValidationAdmin'
+    'GapTypeAdmin', 'GapReportAdmin', 'GapAdmin', 'HistoriqueModificationAdmin', 'HistoriqueArchiveAdmin',
+    'ValidateurServiceAdmin', 'NotificationAdmin', 'GapValidationAdmin', 'SlowQuerySampleAdmin', 'RequestProfileAdmin'
 ]
\ No newline at end of file
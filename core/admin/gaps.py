@@ -11,7 +11,8 @@ from django.urls import reverse
 from django.contrib import messages
 from django.utils.html import format_html
 from django.core.exceptions import ValidationError
-from core.models import AuditSource, Process, GapType, GapReport, Gap, GapReportAttachment, GapAttachment, HistoriqueModification
+from core.models import AuditSource, Process, GapType, GapReport, Gap, GapReportAttachment, GapAttachment, HistoriqueModification, HistoriqueArchive
+from core.utils.historique import invalidate_checkpoint_counters
 
 
 @admin.register(AuditSource)
@@ -567,9 +568,11 @@ class HistoriqueModificationAdmin(admin.ModelAdmin):
     list_display = ['objet_repr', 'action', 'utilisateur', 'created_at', 'objet_type']
     list_filter = ['action', 'objet_type', 'created_at', 'utilisateur']
     search_fields = ['description', 'objet_repr', 'utilisateur__matricule', 'utilisateur__nom', 'utilisateur__prenom']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
     date_hierarchy = 'created_at'
-    readonly_fields = ('gap_report', 'gap', 'action', 'objet_type', 'objet_id', 'objet_repr', 'utilisateur', 'created_at', 'donnees_avant', 'donnees_apres')
+    # Éviter le COUNT(*) complet de la table à chaque affichage (table volumineuse)
+    show_full_result_count = False
+    readonly_fields = ('gap_report', 'gap', 'action', 'objet_type', 'objet_id', 'objet_repr', 'utilisateur', 'created_at', 'est_checkpoint', 'donnees_avant', 'donnees_apres')
     
     fieldsets = (
         ('Objet modifié', {
@@ -579,7 +582,7 @@ class HistoriqueModificationAdmin(admin.ModelAdmin):
             'fields': ('action', 'description', 'utilisateur', 'created_at')
         }),
         ('Détails techniques', {
-            'fields': ('donnees_avant', 'donnees_apres'),
+            'fields': ('est_checkpoint', 'donnees_avant', 'donnees_apres'),
             'classes': ('collapse',)  # Section repliable par défaut
         }),
     )
@@ -633,6 +636,7 @@ class HistoriqueModificationAdmin(admin.ModelAdmin):
             
             # Suppression effective
             deleted_count, _ = HistoriqueModification.objects.all().delete()
+            invalidate_checkpoint_counters()
             
             # Message de confirmation
             details = ", ".join([f"{count} {action}" for action, count in action_counts.items()])
@@ -678,4 +682,36 @@ class HistoriqueModificationAdmin(admin.ModelAdmin):
             'app_label': self.model._meta.app_label,
         }
         
-        return render(request, 'admin/historique/delete_all_confirmation.html', context)
\ No newline at end of file
+        return render(request, 'admin/historique/delete_all_confirmation.html', context)
+
+
+@admin.register(HistoriqueArchive)
+class HistoriqueArchiveAdmin(admin.ModelAdmin):
+    list_display = ['gap_report_id', 'nombre_entrees', 'date_debut', 'date_fin', 'taille', 'archived_at']
+    search_fields = ['gap_report_id']
+    ordering = ['-date_fin']
+    date_hierarchy = 'date_fin'
+    readonly_fields = ('gap_report_id', 'gap_ids', 'date_debut', 'date_fin', 'nombre_entrees', 'taille', 'archived_at', 'entrees')
+    exclude = ('donnees',)
+    
+    @admin.display(description="Taille compressée")
+    def taille(self, obj):
+        return f"{len(obj.donnees) / 1024:.1f} Ko"
+    
+    @admin.display(description="Entrées")
+    def entrees(self, obj):
+        return format_html(
+            '<pre style="white-space: pre-wrap">{}</pre>',
+            '\n'.join(
+                f"{entry.created_at:%d/%m/%Y %H:%M} - {entry.action} - {entry.objet_repr}"
+                for entry in obj.get_entrees()
+            )
+        )
+    
+    def has_add_permission(self, request):
+        # Les segments sont créés par la commande archive_historique
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        # Archive en lecture seule
+        return False
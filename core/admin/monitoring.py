@@ -0,0 +1,132 @@
+"""
+Configuration de l'interface d'administration pour la supervision des performances.
+"""
+from django.contrib import admin
+from django.http import HttpResponse
+from django.urls import path, reverse
+from django.shortcuts import get_object_or_404, render
+from django.utils.html import format_html, format_html_join
+from core.models import SlowQuerySample, RequestProfile
+from core.utils.profiling import top_functions
+from core.utils.slow_queries import slow_query_shapes
+
+
+@admin.register(SlowQuerySample)
+class SlowQuerySampleAdmin(admin.ModelAdmin):
+    change_list_template = "admin/monitoring/slowquerysample_change_list.html"
+    list_display = ['created_at', 'duree', 'view_name', 'apercu']
+    list_filter = ['view_name', 'created_at']
+    search_fields = ['shape', 'view_name', 'path']
+    ordering = ['-created_at']
+    date_hierarchy = 'created_at'
+    readonly_fields = ('created_at', 'duration', 'view_name', 'path', 'sql', 'params', 'plan_display', 'shape')
+    exclude = ('plan', 'shape_hash')
+    
+    @admin.display(description="Durée", ordering='duration')
+    def duree(self, obj):
+        return f"{obj.duration * 1000:.0f} ms"
+    
+    @admin.display(description="Requête")
+    def apercu(self, obj):
+        return obj.shape[:120]
+    
+    @admin.display(description="Plan d'exécution")
+    def plan_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.plan or '-')
+    
+    def has_add_permission(self, request):
+        # Échantillons enregistrés automatiquement par PerformanceMonitoringMiddleware
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('formes/', self.admin_site.admin_view(self.shapes_view), name='slowquerysample_shapes'),
+        ]
+        return custom_urls + urls
+    
+    def shapes_view(self, request):
+        """Requêtes lentes regroupées par forme, avec percentiles de durée"""
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Requêtes lentes par forme",
+            'shapes': slow_query_shapes(),
+            'opts': self.model._meta,
+            'app_label': self.model._meta.app_label,
+        }
+        return render(request, 'admin/monitoring/slow_query_shapes.html', context)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'view_name', 'user', 'status_code', 'duree', 'samples', 'telecharger']
+    list_filter = ['view_name', 'method', 'created_at']
+    search_fields = ['path', 'view_name', 'user__matricule']
+    ordering = ['-created_at']
+    date_hierarchy = 'created_at'
+    list_select_related = ['user']
+    readonly_fields = (
+        'created_at', 'method', 'path', 'view_name', 'user', 'status_code', 'duration',
+        'interval', 'samples', 'telecharger', 'top_functions_display',
+    )
+    exclude = ('collapsed',)
+    
+    @admin.display(description="Durée", ordering='duration')
+    def duree(self, obj):
+        return f"{obj.duration * 1000:.0f} ms"
+    
+    @admin.display(description="Profil")
+    def telecharger(self, obj):
+        url = reverse('admin:requestprofile_download', args=[obj.pk])
+        return format_html('<a href="{}">Télécharger (speedscope)</a>', url)
+    
+    @admin.display(description="Fonctions les plus coûteuses")
+    def top_functions_display(self, obj):
+        functions = top_functions(obj.collapsed)
+        if not functions:
+            return "Aucun échantillon (requête plus courte que l'intervalle d'échantillonnage)"
+        rows = format_html_join(
+            '\n', '<tr><td><code>{}</code></td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            (
+                (
+                    function['function'], function['self'], function['total'],
+                    f"{function['total'] * 100 / obj.samples:.0f} %",
+                )
+                for function in functions
+            )
+        )
+        return format_html(
+            '<table><thead><tr><th>Fonction</th><th>Propre</th><th>Cumulé</th><th>Part</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            rows
+        )
+    
+    def has_add_permission(self, request):
+        # Profils enregistrés par RequestProfilingMiddleware (?__profile=1)
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                '<int:profile_id>/telecharger/',
+                self.admin_site.admin_view(self.download_view),
+                name='requestprofile_download'
+            ),
+        ]
+        return custom_urls + urls
+    
+    def download_view(self, request, profile_id):
+        """Télécharge le profil au format collapsed stacks (speedscope.app, flamegraph.pl)"""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        response = HttpResponse(profile.collapsed, content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="profil-{profile.pk}.collapsed.txt"'
+        return response
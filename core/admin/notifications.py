@@ -15,19 +15,19 @@ from core.models import Notification, GapValidation
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     change_list_template = "admin/notifications/notification_change_list.html"
-    list_display = ['title', 'user', 'gap', 'type', 'priority', 'is_read', 'created_at']
+    list_display = ['display_title', 'user', 'gap', 'type', 'priority', 'is_read', 'created_at']
     list_filter = ['type', 'priority', 'is_read', 'created_at']
-    search_fields = ['title', 'message', 'user__matricule', 'user__nom', 'user__prenom', 'gap__gap_number']
+    search_fields = ['title', 'message', 'template_key', 'user__matricule', 'user__nom', 'user__prenom', 'gap__gap_number']
     ordering = ['-created_at']
     date_hierarchy = 'created_at'
-    readonly_fields = ('read_at', 'created_at', 'updated_at')
+    readonly_fields = ('display_title', 'display_message', 'read_at', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Destinataire', {
             'fields': ('user', 'gap')
         }),
         ('Contenu', {
-            'fields': ('type', 'title', 'message', 'priority')
+            'fields': ('type', 'template_key', 'params', 'display_title', 'display_message', 'priority')
         }),
         ('État', {
             'fields': ('is_read', 'read_at')
@@ -40,9 +40,18 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
-            'user', 'gap', 'gap__gap_type', 'gap__gap_report'
+            'user', 'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+            'gap_report__service', 'gap_report__audit_source'
         )
     
+    def display_title(self, obj):
+        return obj.display_title
+    display_title.short_description = "Titre"
+    
+    def display_message(self, obj):
+        return obj.display_message
+    display_message.short_description = "Message"
+    
     def has_add_permission(self, request):
         """Empêcher la création manuelle de notifications"""
         return False
@@ -35,11 +35,13 @@ class MatriculeAuthBackend(ModelBackend):
     
     def get_user(self, user_id):
         """
-        Récupère un utilisateur par son ID.
+        Récupère un utilisateur par son ID, depuis le cache (voir get_cached_auth_user) :
+        aucune requête SQL à chaud pour l'utilisateur et son service.
         """
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
+        from core.utils.cache import get_cached_auth_user  # Import local pour éviter les imports circulaires
+        
+        user = get_cached_auth_user(user_id)
+        if user is None:
             return None
         
-        return user if self.user_can_authenticate(user) and user.actif else None
\ No newline at end of file
+        return user if self.user_can_authenticate(user) and user.actif else None
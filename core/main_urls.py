@@ -56,4 +56,7 @@ urlpatterns = [
     path('validation/pending/', validation.pending_validations, name='pending_validations'),
     path('notifications/', validation.notifications_list, name='notifications_list'),
     path('notifications/<int:notification_id>/mark-read/', validation.mark_notification_read, name='mark_notification_read'),
+    
+    # Métriques de supervision (format Prometheus)
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
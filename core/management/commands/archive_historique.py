@@ -0,0 +1,47 @@
+"""
+Commande d'archivage de l'historique des modifications.
+Déplace l'historique des déclarations closes ou anciennes vers des segments compressés.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.utils.historique_archive import archiver_historique, get_archive_delays
+
+
+class Command(BaseCommand):
+    help = "Archive l'historique des déclarations closes ou anciennes dans des segments compressés"
+
+    def add_arguments(self, parser):
+        age_days, closed_days = get_archive_delays()
+        parser.add_argument('--age-days', type=int, default=None,
+                            help=f"Archiver les déclarations sans activité depuis N jours (défaut: {age_days})")
+        parser.add_argument('--closed-days', type=int, default=None,
+                            help="Archiver les déclarations dont tous les écarts sont terminés "
+                                 f"et sans activité depuis N jours (défaut: {closed_days})")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Nombre maximum de déclarations à archiver")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Mesure le volume archivable sans rien déplacer")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        stats = archiver_historique(
+            age_days=options['age_days'],
+            closed_days=options['closed_days'],
+            limit=options['limit'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.monotonic() - start
+
+        before = stats['bytes_json']
+        after = stats['bytes_compressed']
+        ratio = (1 - after / before) * 100 if before else 0
+
+        self.stdout.write(f"Déclarations archivées : {stats['reports']}")
+        self.stdout.write(f"Entrées déplacées : {stats['entries']}")
+        self.stdout.write(f"Données : {before} octets -> {after} octets compressés")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compression : {ratio:.1f}% en {elapsed:.2f}s"
+            + (" (simulation, aucune donnée modifiée)" if options['dry_run'] else "")
+        ))
@@ -0,0 +1,42 @@
+"""
+Commande de compactage des notifications rendues en gabarit + paramètres.
+Affiche le gain de place estimé sur les colonnes de contenu de la table.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import Notification
+from core.utils.notifications import compact_notifications
+
+
+class Command(BaseCommand):
+    help = "Compacte les notifications stockées en texte rendu et mesure la réduction de taille"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Nombre de lignes par lot de mise à jour (défaut: 1000)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Mesure le gain sans modifier les données")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        stats = compact_notifications(
+            Notification.objects.all(),
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.monotonic() - start
+
+        before = stats['bytes_before']
+        after = stats['bytes_after']
+        reduction = (1 - after / before) * 100 if before else 0
+
+        self.stdout.write(f"Notifications analysées : {stats['scanned']}")
+        self.stdout.write(f"Notifications compactées : {stats['compacted']}")
+        self.stdout.write(f"Contenu avant : {before} octets")
+        self.stdout.write(f"Contenu après : {after} octets")
+        self.stdout.write(self.style.SUCCESS(
+            f"Réduction : {reduction:.1f}% en {elapsed:.2f}s"
+            + (" (simulation, aucune donnée modifiée)" if options['dry_run'] else "")
+        ))
@@ -0,0 +1,47 @@
+"""
+Commande de compression de l'historique des modifications.
+Convertit les entrées stockées en instantanés complets vers le format différentiel
+avec instantanés périodiques, et affiche le gain de place estimé.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models import HistoriqueModification
+from core.utils.historique import compress_historique, get_checkpoint_interval
+
+
+class Command(BaseCommand):
+    help = "Compresse l'historique stocké en instantanés complets et mesure la réduction de taille"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Nombre d'entrées par lot de mise à jour (défaut: 500)")
+        parser.add_argument('--checkpoint-interval', type=int, default=None,
+                            help="Nombre d'entrées entre deux instantanés complets "
+                                 f"(défaut: réglage HISTORIQUE_CHECKPOINT_INTERVAL, actuellement {get_checkpoint_interval()})")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Mesure le gain sans modifier les données")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        stats = compress_historique(
+            HistoriqueModification.objects.all(),
+            batch_size=options['batch_size'],
+            interval=options['checkpoint_interval'],
+            dry_run=options['dry_run']
+        )
+        elapsed = time.monotonic() - start
+
+        before = stats['bytes_before']
+        after = stats['bytes_after']
+        reduction = (1 - after / before) * 100 if before else 0
+
+        self.stdout.write(f"Objets traités : {stats['objects']}")
+        self.stdout.write(f"Entrées compressées : {stats['compressed']}")
+        self.stdout.write(f"Données avant : {before} octets")
+        self.stdout.write(f"Données après : {after} octets")
+        self.stdout.write(self.style.SUCCESS(
+            f"Réduction : {reduction:.1f}% en {elapsed:.2f}s"
+            + (" (simulation, aucune donnée modifiée)" if options['dry_run'] else "")
+        ))
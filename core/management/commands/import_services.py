@@ -0,0 +1,64 @@
+"""
+Commande d'import des services depuis un fichier JSON d'export.
+Par défaut, synchronisation par code non destructive : les services absents du fichier sont
+désactivés, jamais supprimés. --replace remplace tous les services (import par niveaux hiérarchiques).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.import_users import write_sync_report
+from core.utils.imports import ImportFileError, import_services, iter_json_records, sync_services
+
+
+class Command(BaseCommand):
+    help = "Synchronise les services avec un fichier JSON d'export (créations, modifications, désactivations)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Fichier JSON d'export des services")
+        parser.add_argument('--replace', action='store_true',
+                            help="Supprime tous les services puis les recrée depuis le fichier")
+        parser.add_argument('--no-deactivate', action='store_true',
+                            help="Ne pas désactiver les services absents du fichier")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Affiche le différentiel et la durée d'écriture sans rien modifier")
+        parser.add_argument('--ignore-errors', action='store_true',
+                            help="Avec --replace : importe les lignes valides même si d'autres sont en erreur "
+                                 "(par défaut, rien n'est modifié)")
+
+    def handle(self, *args, **options):
+        if options['replace'] and (options['dry_run'] or options['no_deactivate']):
+            raise CommandError("--dry-run et --no-deactivate ne s'appliquent pas à --replace.")
+        if options['ignore_errors'] and not options['replace']:
+            raise CommandError("--ignore-errors nécessite --replace.")
+        try:
+            with open(options['fichier'], 'rb') as json_file:
+                if options['replace']:
+                    result = import_services(iter_json_records(json_file), ignore_errors=options['ignore_errors'])
+                else:
+                    result = sync_services(
+                        iter_json_records(json_file),
+                        deactivate_missing=not options['no_deactivate'],
+                        dry_run=options['dry_run'],
+                    )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        if not options['replace']:
+            write_sync_report(self, result)
+            return
+
+        for error in result.format_errors():
+            self.stdout.write(self.style.ERROR(error))
+        if result.aborted:
+            raise CommandError(
+                f"Import annulé : {len(result.errors)} ligne(s) en erreur, aucun service modifié"
+                # Avec --ignore-errors, seule une dépendance circulaire annule l'import
+                + ("." if options['ignore_errors'] else " (--ignore-errors pour importer les lignes valides).")
+            )
+        self.stdout.write(
+            f"Validation : {result.timings['validation']:.2f}s"
+            + (f" - Écriture : {result.timings['write']:.2f}s" if 'write' in result.timings else "")
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé : {result.deleted} services supprimés, {result.created} importés, "
+            f"{len(result.errors)} ligne(s) en erreur"
+        ))
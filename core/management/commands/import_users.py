@@ -0,0 +1,97 @@
+"""
+Commande d'import des utilisateurs depuis un fichier JSON d'export.
+Par défaut, synchronisation par matricule non destructive : les utilisateurs absents du fichier
+sont désactivés, jamais supprimés. --replace remplace tous les utilisateurs.
+Pour les fichiers volumineux, préférable à l'import par l'interface : progression affichée,
+aucune limite de durée de requête.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils.imports import (
+    DEFAULT_BATCH_SIZE, ImportFileError, import_users, iter_json_records, sync_users,
+)
+
+
+def write_sync_report(command, result):
+    """Affiche le différentiel, les erreurs et le bilan d'une synchronisation (voir core.utils.imports)."""
+    for change in result.changes:
+        command.stdout.write(change)
+    for error in result.format_errors():
+        command.stdout.write(command.style.ERROR(error))
+    command.stdout.write(
+        f"Calcul du différentiel : {result.timings['diff']:.2f}s - "
+        + (f"Écriture estimée : {result.timings['write']:.2f}s (simulation, annulée)" if result.dry_run
+           else f"Écriture : {result.timings['write']:.2f}s")
+    )
+    command.stdout.write(command.style.WARNING(f"Simulation : {result.summary()}") if result.dry_run
+                         else command.style.SUCCESS(f"Synchronisation terminée : {result.summary()}"))
+
+
+class Command(BaseCommand):
+    help = "Synchronise les utilisateurs avec un fichier JSON d'export (créations, modifications, désactivations)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Fichier JSON d'export des utilisateurs")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f"Taille des lots de validation et d'écriture (défaut: {DEFAULT_BATCH_SIZE})")
+        parser.add_argument('--replace', action='store_true',
+                            help="Supprime tous les utilisateurs puis les recrée depuis le fichier")
+        parser.add_argument('--no-deactivate', action='store_true',
+                            help="Ne pas désactiver les utilisateurs absents du fichier")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Affiche le différentiel et la durée d'écriture sans rien modifier")
+        parser.add_argument('--ignore-errors', action='store_true',
+                            help="Avec --replace : importe les lignes valides même si d'autres sont en erreur "
+                                 "(par défaut, rien n'est modifié)")
+
+    def handle(self, *args, **options):
+        if options['replace'] and (options['dry_run'] or options['no_deactivate']):
+            raise CommandError("--dry-run et --no-deactivate ne s'appliquent pas à --replace.")
+        if options['ignore_errors'] and not options['replace']:
+            raise CommandError("--ignore-errors nécessite --replace.")
+        start = time.monotonic()
+
+        def progress(rows, result):
+            self.stdout.write(
+                f"{rows} lignes lues, {len(result.errors)} erreur(s) - {time.monotonic() - start:.1f}s"
+            )
+
+        try:
+            with open(options['fichier'], 'rb') as json_file:
+                if not options['replace']:
+                    result = sync_users(
+                        iter_json_records(json_file),
+                        deactivate_missing=not options['no_deactivate'],
+                        dry_run=options['dry_run'],
+                        batch_size=options['batch_size'],
+                        progress=progress,
+                    )
+                else:
+                    result = import_users(
+                        iter_json_records(json_file), batch_size=options['batch_size'], progress=progress,
+                        ignore_errors=options['ignore_errors'],
+                    )
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        if not options['replace']:
+            write_sync_report(self, result)
+            return
+
+        for error in result.format_errors():
+            self.stdout.write(self.style.ERROR(error))
+        if result.aborted:
+            raise CommandError(
+                f"Import annulé : {len(result.errors)} ligne(s) en erreur, aucun utilisateur modifié "
+                "(--ignore-errors pour importer les lignes valides)."
+            )
+        self.stdout.write(
+            f"Hachage : {result.timings['hash']:.2f}s - Validation : {result.timings['validation']:.2f}s"
+            f" - Écriture : {result.timings['write']:.2f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Import terminé : {result.deleted} utilisateurs supprimés, {result.created} importés, "
+            f"{len(result.errors)} ligne(s) en erreur en {time.monotonic() - start:.2f}s"
+        ))
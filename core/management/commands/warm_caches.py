@@ -0,0 +1,46 @@
+"""
+Commande de préchauffage des caches de données de référence.
+À lancer après un déploiement ou un redémarrage de Redis.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.utils.cache_warmup import DEFAULT_WARMUP_WORKERS, WARMERS, warm_caches
+
+
+class Command(BaseCommand):
+    help = "Préchauffe les caches de données de référence (services, types d'écarts, workflow...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=DEFAULT_WARMUP_WORKERS,
+                            help=f"Nombre de caches remplis en parallèle (défaut: {DEFAULT_WARMUP_WORKERS})")
+        parser.add_argument('--users', action='store_true',
+                            help="Initialise aussi les générations de cache des utilisateurs actifs")
+        parser.add_argument('--force', action='store_true',
+                            help="Invalide les données de référence avant de les recalculer")
+        parser.add_argument('--only', nargs='+', default=None,
+                            choices=[name for name, _func in WARMERS] + ['generations_utilisateurs'],
+                            help="Caches à préchauffer (défaut: tous)")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        results = warm_caches(
+            workers=options['workers'],
+            users=options['users'] or (options['only'] and 'generations_utilisateurs' in options['only']),
+            force=options['force'],
+            only=options['only'],
+        )
+        elapsed = time.monotonic() - start
+
+        for result in results:
+            if result['error']:
+                self.stdout.write(self.style.ERROR(
+                    f"{result['name']} : échec après {result['seconds']:.2f}s ({result['error']})"
+                ))
+            else:
+                self.stdout.write(f"{result['name']} : {result['seconds']:.2f}s")
+
+        failures = sum(1 for result in results if result['error'])
+        summary = f"{len(results) - failures}/{len(results)} caches préchauffés en {elapsed:.2f}s"
+        self.stdout.write(self.style.ERROR(summary) if failures else self.style.SUCCESS(summary))
@@ -2,9 +2,14 @@ from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib import messages
 from django.conf import settings
-from django.db import connection
-from django.utils.deprecation import MiddlewareMixin
-from .signals import set_current_user
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from .signals import historique_context
+from .utils.metrics import record_request
+from .utils.performance import NPlusOneError, QueryRecorder, detect_n_plus_one, get_view_thresholds, record_queries
+from .utils.profiling import SamplingProfiler, save_profile, wants_profile
+from .utils.server_timing import server_timing_context, timed
+from .utils.slow_queries import DEFAULT_SAMPLE_SIZE, should_sample, store_slow_queries
+from contextlib import nullcontext
 import time
 import logging
 
@@ -55,71 +60,196 @@ class ForcePasswordChangeMiddleware:
 class HistoriqueMiddleware:
     """
     Middleware pour capturer l'utilisateur actuel dans les signaux d'historique.
+    Ouvre la portée d'historique de la requête (utilisateur, tampon d'historique) :
+    les entrées sont écrites en un seul INSERT groupé après le commit de chaque
+    transaction, et le contexte est nettoyé à la fin de la requête.
+    Compatible sync et async : chaque requête a son propre contexte (contextvars).
+
+    La branche async (__acall__) n'est utilisée que si toute la pile est async-capable.
+    Avec le MIDDLEWARE du projet, PerformanceMonitoringMiddleware, ServerTimingMiddleware,
+    RequestProfilingMiddleware, ForcePasswordChangeMiddleware et ServerTimingViewMiddleware
+    sont synchrones : Django adapte toute la chaîne en synchrone, y compris sous ASGI.
+    Ils le restent volontairement, leurs mesures reposant sur la connexion et la pile
+    d'appels du thread de la requête (connection.execute_wrapper, profileur).
     """
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        
         # Définir l'utilisateur actuel pour les signaux
-        if request.user.is_authenticated:
-            set_current_user(request.user)
-        else:
-            set_current_user(None)
-
-        response = self.get_response(request)
+        user = request.user if request.user.is_authenticated else None
+        with historique_context(user):
+            response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        user = await request.auser()
+        user = user if user.is_authenticated else None
+        
+        # Les écritures en base sont interdites dans la boucle : le tampon est écrit ensuite
+        with historique_context(user, flush=False) as buffer:
+            response = await self.get_response(request)
+        await sync_to_async(buffer.flush)()
         return response
 
 
-class PerformanceMonitoringMiddleware(MiddlewareMixin):
+class PerformanceMonitoringMiddleware:
     """
     Middleware pour surveiller les performances de l'application en production.
-    Enregistre les requêtes lentes et surveille l'usage de la base de données.
+    Mesure chaque requête via connection.execute_wrapper (nombre de requêtes SQL,
+    temps total en base, requête la plus lente, formes de requêtes répétées) et
+    journalise les dépassements des seuils, configurables par vue (voir get_view_thresholds).
+    À placer en tête de MIDDLEWARE pour inclure les requêtes des autres middlewares.
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
         self.logger = logging.getLogger('ecarts_actions.performance')
+    
+    def __call__(self, request):
+        start_time = time.perf_counter()
+        recorder = QueryRecorder(keep_slowest=getattr(settings, 'SLOW_QUERY_SAMPLE_SIZE', DEFAULT_SAMPLE_SIZE))
+        with record_queries(recorder), self.detect_n_plus_one() as detector:
+            request.db_recorder = recorder
+            response = self.get_response(request)
+        execution_time = time.perf_counter() - start_time
         
-    def process_request(self, request):
-        """Marque le début de la requête."""
-        request.start_time = time.time()
-        request.queries_start = len(connection.queries)
+        if detector is not None and detector.problems():
+            self.logger.warning(f"Requêtes N+1: {request.method} {request.path}\n{detector.report()}")
+            if getattr(settings, 'NPLUSONE_RAISE', False):
+                raise NPlusOneError(detector.report())
         
-    def process_response(self, request, response):
-        """Analyse les performances à la fin de la requête."""
-        if not hasattr(request, 'start_time'):
-            return response
-            
-        # Calculer le temps d'exécution
-        execution_time = time.time() - request.start_time
+        view_name = request.resolver_match.view_name if request.resolver_match else None
+        thresholds = get_view_thresholds(view_name)
+        record_request(view_name, request.method, response.status_code, execution_time, recorder)
+        self.check_thresholds(request, response, recorder, execution_time, view_name, thresholds)
+        
+        # Échantillonner les requêtes SQL lentes (requêtes HTTP tirées au sort ou lentes)
+        if getattr(settings, 'SLOW_QUERY_SAMPLING', True) and (
+            execution_time > thresholds['time'] or should_sample()
+        ):
+            try:
+                store_slow_queries(recorder, view_name, request.path)
+            except Exception:
+                self.logger.exception(f"Échec de l'échantillonnage des requêtes lentes: {request.path}")
         
-        # Compter les requêtes DB
-        db_queries = len(connection.queries) - getattr(request, 'queries_start', 0)
+        # Ajouter des headers de debug pour les administrateurs
+        if getattr(request.user, 'droits', None) in ['SA', 'AD']:
+            response['X-Execution-Time'] = f"{execution_time:.3f}s"
+            response['X-DB-Queries'] = str(recorder.count)
+            response['X-DB-Time'] = f"{recorder.duration:.3f}s"
         
-        # Seuil de surveillance configurable
-        slow_threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD', 1.0)
+        return response
+    
+    def detect_n_plus_one(self):
+        """Détecteur de requêtes N+1, actif si NPLUSONE_DETECTION (développement, CI)."""
+        if getattr(settings, 'NPLUSONE_DETECTION', False):
+            return detect_n_plus_one()
+        return nullcontext()
+    
+    def check_thresholds(self, request, response, recorder, execution_time, view_name, thresholds):
+        """Journalise les requêtes lentes, trop nombreuses en base ou répétitives."""
+        description = f"{request.method} {request.path} ({view_name or '-'})"
+        user = getattr(request.user, 'matricule', 'Anonymous')
         
         # Enregistrer les requêtes lentes
-        if execution_time > slow_threshold:
+        if execution_time > thresholds['time']:
+            slowest = recorder.slowest
             self.logger.warning(
-                f"Requête lente détectée: {request.method} {request.path} - "
-                f"Temps: {execution_time:.3f}s - Requêtes DB: {db_queries} - "
-                f"User: {getattr(request.user, 'matricule', 'Anonymous')} - "
-                f"Status: {response.status_code}"
+                f"Requête lente détectée: {description} - "
+                f"Temps: {execution_time:.3f}s - Requêtes DB: {recorder.count} "
+                f"({recorder.duration:.3f}s) - User: {user} - Status: {response.status_code}"
+                + (f" - Plus lente ({slowest['duration']:.3f}s): {slowest['sql'][:500]}" if slowest else "")
             )
         
         # Surveiller l'usage excessif de la DB
-        if db_queries > 20:  # Seuil configurable
+        if recorder.count > thresholds['queries']:
             self.logger.warning(
-                f"Trop de requêtes DB: {request.method} {request.path} - "
-                f"Requêtes DB: {db_queries} - Temps: {execution_time:.3f}s - "
-                f"User: {getattr(request.user, 'matricule', 'Anonymous')}"
+                f"Trop de requêtes DB: {description} - "
+                f"Requêtes DB: {recorder.count} ({recorder.duration:.3f}s) - "
+                f"Temps: {execution_time:.3f}s - User: {user}"
             )
+            # Les formes répétées indiquent des requêtes N+1
+            for shape, count in recorder.duplicates(thresholds['duplicates'])[:5]:
+                self.logger.warning(f"Requête répétée {count} fois: {description} - {shape[:500]}")
+
+
+class RequestProfilingMiddleware:
+    """
+    Middleware de profilage à la demande : ?__profile=1 ou l'en-tête X-Profile: 1 exécute
+    la requête sous un profileur par échantillonnage (administrateurs SA/AD uniquement).
+    Le profil est consultable et téléchargeable (speedscope) dans l'administration ;
+    son adresse est renvoyée dans l'en-tête X-Profile-URL.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.logger = logging.getLogger('ecarts_actions.performance')
+    
+    def __call__(self, request):
+        if not wants_profile(request):
+            return self.get_response(request)
         
-        # Ajouter des headers de debug pour les administrateurs
-        if hasattr(request.user, 'droits') and request.user.droits in ['SA', 'AD']:
-            response['X-Execution-Time'] = f"{execution_time:.3f}s"
-            response['X-DB-Queries'] = str(db_queries)
+        with SamplingProfiler() as profiler:
+            response = self.get_response(request)
+        
+        try:
+            profile = save_profile(request, response, profiler)
+        except Exception:
+            self.logger.exception(f"Échec de l'enregistrement du profil: {request.path}")
+            return response
+        response['X-Profile-Id'] = str(profile.pk)
+        response['X-Profile-URL'] = reverse('admin:core_requestprofile_change', args=[profile.pk])
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ajoutant l'en-tête Server-Timing à chaque réponse : temps total, middlewares,
+    vue, base de données, cache, rendu des gabarits et gestionnaires de signaux
+    (voir core.utils.server_timing). À placer juste après PerformanceMonitoringMiddleware,
+    dont il reprend les mesures SQL ; ServerTimingViewMiddleware, en fin de MIDDLEWARE,
+    mesure la vue.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', True):
+            return self.get_response(request)
         
-        return response
\ No newline at end of file
+        start_time = time.perf_counter()
+        recorder = getattr(request, 'db_recorder', None)
+        with server_timing_context() as timing, (nullcontext(recorder) if recorder else record_queries()) as recorder:
+            db_count, db_duration = recorder.count, recorder.duration
+            response = self.get_response(request)
+        total = time.perf_counter() - start_time
+        
+        timing.add('total', total)
+        timing.add('middleware', total - timing.durations.get('view', 0.0))
+        timing.add('db', recorder.duration - db_duration, recorder.count - db_count)
+        response['Server-Timing'] = timing.header()
+        return response
+
+
+class ServerTimingViewMiddleware:
+    """
+    Mesure la vue (résolution d'URL, vue et rendu des TemplateResponse) pour Server-Timing.
+    À placer en dernier dans MIDDLEWARE.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with timed('view'):
+            return self.get_response(request)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_add_gap_report_to_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, help_text='Valeurs propres à la notification (les données des objets liés sont relues au rendu)', verbose_name='Paramètres du message'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='template_key',
+            field=models.CharField(blank=True, help_text="Clé du gabarit utilisé pour rendre le titre et le message à l'affichage", max_length=40, verbose_name='Gabarit du message'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='message',
+            field=models.TextField(blank=True, default='', help_text='Texte libre, uniquement pour les notifications sans gabarit', verbose_name='Message'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='title',
+            field=models.CharField(blank=True, default='', help_text='Texte libre, uniquement pour les notifications sans gabarit', max_length=200, verbose_name='Titre'),
+        ),
+    ]
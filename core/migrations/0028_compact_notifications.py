@@ -0,0 +1,242 @@
+"""
+Conversion des notifications déjà rendues (titre et message en texte) en gabarit + paramètres.
+Les gabarits et la logique de conversion sont figés ici, tels qu'ils étaient lors de cette
+migration : les modifications ultérieures de core.utils.notifications ne changent pas son effet.
+"""
+import json
+import re
+import string
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+DESCRIPTION_EXCERPT_LENGTH = 100
+
+NOTIFICATION_TEMPLATES = {
+    'validation_request_initial': {
+        'title': "{gap_number} - Nouvel événement à valider",
+        'message': "Un nouvel écart ({gap_number}) a été déclaré par {declarant} "
+                   "et nécessite votre validation (Niveau 1).\n\n"
+                   "Service: {service}\n"
+                   "Type: {gap_type}\n"
+                   "Description: {description_excerpt}...",
+    },
+    'validation_request_next': {
+        'title': "{gap_number} - Événement à valider (Niveau {level})",
+        'message': "L'écart {gap_number} a été approuvé au niveau {previous_level} par {validator} "
+                   "et nécessite maintenant votre validation (Niveau {level}).\n\n"
+                   "Service: {service}\n"
+                   "Type: {gap_type}\n"
+                   "Description: {description_excerpt}...",
+    },
+    'gap_rejected': {
+        'title': "{gap_number} - Événement rejeté",
+        'message': "Votre événement {gap_number} a été rejeté au niveau {level} par {validator}.",
+        'comment': "\nCommentaire: {comment}",
+    },
+    'gap_retained': {
+        'title': "{gap_number} - Événement retenu",
+        'message': "Votre événement {gap_number} a été retenu après validation complète par {validator}.",
+    },
+    'validation_completed_rejected': {
+        'title': "{gap_number} - Traitement effectué : Non retenu",
+        'message': "Vous avez rejeté l'événement {gap_number}. Le déclarant a été notifié.",
+    },
+    'validation_completed_retained': {
+        'title': "{gap_number} - Traitement effectué : Retenu",
+        'message': "Vous avez approuvé l'événement {gap_number}. "
+                   "L'événement est maintenant retenu et le déclarant a été notifié.",
+    },
+    'validation_completed_approved': {
+        'title': "{gap_number} - Traitement effectué : Approuvé",
+        'message': "Vous avez approuvé l'événement {gap_number}. Il passe maintenant au niveau {level}.",
+    },
+    'gap_created': {
+        'title': "{gap_number} - Événement créé",
+        'message': "Votre événement {gap_number} ({gap_type}) a été créé avec succès.",
+    },
+    'gap_modified': {
+        'title': "Écart {gap_number} modifié",
+        'message': "Votre événement {gap_number} a été modifié par {author}.",
+    },
+    'gap_modified_status': {
+        'title': "Écart {gap_number} modifié",
+        'message': "Le statut de votre écart {gap_number} a été modifié par {author} : {old_status} → {new_status}.",
+    },
+    'gap_reclassified_event': {
+        'title': "Événement reclassé - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
+    },
+    'gap_reclassified_gap': {
+        'title': "Écart reclassé - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en écart et nécessite désormais une validation.",
+    },
+    'gap_type_changed_event': {
+        'title': "Modification de type - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
+    },
+    'gap_type_changed_gap': {
+        'title': "Modification de type - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en écart et nécessite désormais une validation.",
+    },
+    'gap_deleted': {
+        'title': "{gap_number} - Événement supprimé",
+        'message': "Votre événement {gap_number} ({gap_type}) a été supprimé par {author}.",
+    },
+    'gap_status_changed': {
+        'title': "{gap_number} - Statut modifié",
+        'message': "Le statut de votre événement {gap_number} a été modifié vers '{status}' par {author}.",
+        'comment': " Commentaire: {comment}",
+    },
+    'declaration_involved': {
+        'title': "Déclaration #{gap_report_id} - Vous êtes impliqué",
+        'message': "Vous avez été associé à une déclaration d'événement créée par {author}. "
+                   "Service: {service}, Source: {audit_source}.",
+    },
+}
+
+RELATED_FIELDS = (
+    'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+    'gap_report__service', 'gap_report__audit_source',
+)
+
+CONTENT_FIELDS = ['template_key', 'params', 'title', 'message']
+
+
+class _DefaultDict(dict):
+    def __missing__(self, key):
+        return ''
+
+
+def derive_params(gap=None, gap_report=None):
+    """Paramètres relus depuis l'écart et la déclaration liés."""
+    params = {}
+    if gap is not None:
+        params['gap_type'] = gap.gap_type.name
+        params['description_excerpt'] = gap.description[:DESCRIPTION_EXCERPT_LENGTH]
+        if gap_report is None:
+            gap_report = gap.gap_report
+    if gap_report is not None:
+        params['gap_report_id'] = gap_report.id
+        params['service'] = gap_report.service.nom if gap_report.service else 'Non défini'
+        params['audit_source'] = gap_report.audit_source.name
+    return params
+
+
+def render_notification(template_key, params):
+    """Rend (titre, message) d'un gabarit ; les paramètres absents sont rendus vides."""
+    template = NOTIFICATION_TEMPLATES.get(template_key)
+    if template is None:
+        return '', ''
+    params = _DefaultDict(
+        (key, value if isinstance(value, (str, int, float, bool, type(None))) else json.dumps(value))
+        for key, value in (params or {}).items()
+    )
+    title = template['title'].format_map(params)
+    message = template['message'].format_map(params)
+    if template.get('comment') and params.get('comment'):
+        message += template['comment'].format_map(params)
+    return title, message
+
+
+def _compile_pattern(template_string):
+    """Transforme une chaîne str.format en expression régulière à groupes nommés."""
+    pattern = ''
+    seen = set()
+    for literal, field_name, _spec, _conversion in string.Formatter().parse(template_string):
+        pattern += re.escape(literal)
+        if field_name is None:
+            continue
+        if field_name in seen:
+            pattern += f'(?P={field_name})'
+        else:
+            seen.add(field_name)
+            pattern += f'(?P<{field_name}>.*?)'
+    return pattern
+
+
+def _compiled_templates():
+    compiled = {}
+    for template_key, template in NOTIFICATION_TEMPLATES.items():
+        message_pattern = _compile_pattern(template['message'])
+        if template.get('comment'):
+            message_pattern += f"(?:{_compile_pattern(template['comment'])})?"
+        compiled[template_key] = (
+            re.compile(_compile_pattern(template['title']) + r'\Z', re.DOTALL),
+            re.compile(message_pattern + r'\Z', re.DOTALL),
+        )
+    return compiled
+
+
+def compact_notification(compiled, title, message, derived):
+    """Retrouve (gabarit, paramètres) reproduisant exactement le texte, sinon (None, None)."""
+    for template_key, (title_re, message_re) in compiled.items():
+        title_match = title_re.match(title)
+        if not title_match:
+            continue
+        message_match = message_re.match(message)
+        if not message_match:
+            continue
+
+        captured = {**title_match.groupdict(), **message_match.groupdict()}
+        params = {
+            key: value for key, value in captured.items()
+            if value is not None and str(derived.get(key)) != value
+        }
+        if render_notification(template_key, {**derived, **params}) == (title, message):
+            return template_key, params
+    return None, None
+
+
+def compact_existing_notifications(apps, schema_editor):
+    """Convertit les notifications déjà rendues en gabarit + paramètres."""
+    Notification = apps.get_model('core', 'Notification')
+    compiled = _compiled_templates()
+    rows = Notification.objects.filter(template_key='').select_related(*RELATED_FIELDS).order_by('pk')
+    batch = []
+    for notification in rows.iterator(chunk_size=BATCH_SIZE):
+        derived = derive_params(gap=notification.gap, gap_report=notification.gap_report)
+        template_key, params = compact_notification(compiled, notification.title, notification.message, derived)
+        if template_key is None:
+            continue
+        notification.template_key = template_key
+        notification.params = params
+        notification.title = ''
+        notification.message = ''
+        batch.append(notification)
+        if len(batch) >= BATCH_SIZE:
+            Notification.objects.bulk_update(batch, CONTENT_FIELDS)
+            batch = []
+    if batch:
+        Notification.objects.bulk_update(batch, CONTENT_FIELDS)
+
+
+def expand_notifications(apps, schema_editor):
+    """Retour arrière : réécrit le titre et le message rendus dans chaque ligne."""
+    Notification = apps.get_model('core', 'Notification')
+    rows = Notification.objects.exclude(template_key='').select_related(*RELATED_FIELDS).order_by('pk')
+    batch = []
+    for notification in rows.iterator(chunk_size=BATCH_SIZE):
+        context = derive_params(gap=notification.gap, gap_report=notification.gap_report)
+        context.update(notification.params or {})
+        notification.title, notification.message = render_notification(notification.template_key, context)
+        notification.template_key = ''
+        notification.params = {}
+        batch.append(notification)
+        if len(batch) >= BATCH_SIZE:
+            Notification.objects.bulk_update(batch, CONTENT_FIELDS)
+            batch = []
+    if batch:
+        Notification.objects.bulk_update(batch, CONTENT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_notification_template_key_params'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_existing_notifications, expand_notifications),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_compact_notifications'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historiquemodification',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Créé le'),
+        ),
+        migrations.AlterField(
+            model_name='historiquemodification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Modifié le'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_historique_explicit_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiquemodification',
+            name='est_checkpoint',
+            field=models.BooleanField(default=False, help_text="Si coché, donnees_apres contient l'état complet de l'objet ; sinon seulement les champs modifiés", verbose_name='Instantané complet'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_historique_est_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gap_report_id', models.PositiveIntegerField(verbose_name='ID de la déclaration')),
+                ('gap_ids', models.JSONField(default=list, help_text='Écarts concernés par les entrées du segment', verbose_name='IDs des écarts')),
+                ('date_debut', models.DateTimeField(verbose_name='Première entrée')),
+                ('date_fin', models.DateTimeField(verbose_name='Dernière entrée')),
+                ('nombre_entrees', models.PositiveIntegerField(verbose_name="Nombre d'entrées")),
+                ('donnees', models.BinaryField(help_text='Liste JSON des entrées, compressée (zlib)', verbose_name='Entrées compressées')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivé le')),
+            ],
+            options={
+                'verbose_name': "Archive d'historique",
+                'verbose_name_plural': "Archives d'historique",
+                'ordering': ['-date_fin'],
+                'indexes': [models.Index(fields=['gap_report_id', '-date_fin'], name='core_histor_gap_rep_753940_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_historique_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuerySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shape', models.TextField(verbose_name='Forme de la requête')),
+                ('shape_hash', models.CharField(db_index=True, max_length=64, verbose_name='Empreinte de la forme')),
+                ('sql', models.TextField(verbose_name='Requête SQL')),
+                ('params', models.JSONField(blank=True, default=list, verbose_name='Paramètres')),
+                ('duration', models.FloatField(verbose_name='Durée (s)')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('path', models.CharField(blank=True, max_length=500, verbose_name='Chemin')),
+                ('plan', models.TextField(blank=True, verbose_name="Plan d'exécution")),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Créé le')),
+            ],
+            options={
+                'verbose_name': 'Requête lente',
+                'verbose_name_plural': 'Requêtes lentes',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_slow_query_sample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, verbose_name='Chemin')),
+                ('method', models.CharField(max_length=10, verbose_name='Méthode')),
+                ('view_name', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Statut')),
+                ('duration', models.FloatField(verbose_name='Durée (s)')),
+                ('interval', models.FloatField(verbose_name="Intervalle d'échantillonnage (s)")),
+                ('samples', models.PositiveIntegerField(verbose_name='Échantillons')),
+                ('collapsed', models.TextField(verbose_name="Piles d'appels (format collapsed)")),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Créé le')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
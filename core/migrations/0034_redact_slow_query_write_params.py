@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def redact_write_params(apps, schema_editor):
+    """Masque les paramètres déjà enregistrés des écritures (INSERT, UPDATE...)."""
+    SlowQuerySample = apps.get_model('core', 'SlowQuerySample')
+    batch = []
+    for sample in SlowQuerySample.objects.only('id', 'sql', 'params').iterator(chunk_size=1000):
+        if sample.sql.lstrip().upper().startswith('SELECT') or not sample.params:
+            continue
+        sample.params = ['***'] * len(sample.params)
+        batch.append(sample)
+        if len(batch) >= 1000:
+            SlowQuerySample.objects.bulk_update(batch, ['params'])
+            batch = []
+    if batch:
+        SlowQuerySample.objects.bulk_update(batch, ['params'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_request_profile'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_write_params, migrations.RunPython.noop),
+    ]
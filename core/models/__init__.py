@@ -1,10 +1,11 @@
 # Import de tous les modèles pour maintenir la compatibilité
 from .services import Service
 from .users import User
-from .gaps import AuditSource, Process, GapType, GapReport, Gap, HistoriqueModification
+from .gaps import AuditSource, Process, GapType, GapReport, Gap, HistoriqueModification, HistoriqueArchive
 from .attachments import GapReportAttachment, GapAttachment
 from .workflow import ValidateurService
 from .notifications import Notification, GapValidation
+from .monitoring import SlowQuerySample, RequestProfile
 
 # Export explicite pour les imports directs
-__all__ = ['Service', 'User', 'AuditSource', 'Process', 'GapType', 'GapReport', 'Gap', 'HistoriqueModification', 'GapReportAttachment', 'GapAttachment', 'ValidateurService', 'Notification', 'GapValidation']
\ No newline at end of file
+__all__ = ['Service', 'User', 'AuditSource', 'Process', 'GapType', 'GapReport', 'Gap', 'HistoriqueModification', 'HistoriqueArchive', 'GapReportAttachment', 'GapAttachment', 'ValidateurService', 'Notification', 'GapValidation', 'SlowQuerySample', 'RequestProfile']
\ No newline at end of file
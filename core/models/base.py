@@ -28,4 +28,70 @@ class CodedModel(models.Model):
     )
     
     class Meta:
-        abstract = True
\ No newline at end of file
+        abstract = True
+
+
+class OriginalValuesModel(models.Model):
+    """
+    Modèle abstrait conservant les valeurs des champs telles que chargées depuis la base.
+    Permet de détecter les modifications avant/après sauvegarde sans relire l'objet
+    (les valeurs sont capturées par from_db et rafraîchies après chaque sauvegarde).
+    """
+    
+    class Meta:
+        abstract = True
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_values = {
+            name: value for name, value in zip(field_names, values)
+            if value is not models.DEFERRED
+        }
+        return instance
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._store_original_values(fields)
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Les signaux post_save ont vu les anciennes valeurs ; l'état sauvegardé devient la référence
+        self._store_original_values(kwargs.get('update_fields'))
+    
+    def _store_original_values(self, fields=None):
+        """
+        Mémorise les valeurs courantes comme valeurs d'origine.
+        
+        Args:
+            fields: Noms des champs à mémoriser (défaut: tous les champs chargés)
+        """
+        deferred = self.get_deferred_fields()
+        concrete_fields = self._meta.concrete_fields
+        if fields is not None:
+            fields = set(fields)
+            concrete_fields = [f for f in concrete_fields if f.name in fields or f.attname in fields]
+        
+        original_values = getattr(self, '_original_values', None) or {}
+        original_values.update({
+            field.attname: getattr(self, field.attname)
+            for field in concrete_fields if field.attname not in deferred
+        })
+        self._original_values = original_values
+    
+    def get_original_values(self):
+        """
+        Retourne les valeurs d'origine des champs chargés, indexées par attname
+        (ex: 'gap_type_id'), ou None si l'instance n'a pas été chargée depuis la base.
+        """
+        return getattr(self, '_original_values', None)
+    
+    def load_original_values(self):
+        """
+        Charge les valeurs d'origine depuis la base (une requête).
+        Repli pour les instances construites manuellement avec une clé primaire.
+        """
+        self._original_values = type(self)._base_manager.using(self._state.db or 'default').filter(
+            pk=self.pk
+        ).values(*[field.attname for field in self._meta.concrete_fields]).first()
+        return self._original_values
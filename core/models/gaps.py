@@ -1,12 +1,15 @@
 """
 Modèles pour la gestion des écarts et des audits.
 """
+from itertools import chain
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .base import TimestampedModel, CodedModel
+from django.utils import timezone
+from .base import TimestampedModel, CodedModel, OriginalValuesModel
 from .services import Service
 
 User = get_user_model()
@@ -184,7 +187,7 @@ class Process(CodedModel, TimestampedModel):
         return self.name
 
 
-class GapType(TimestampedModel):
+class GapType(OriginalValuesModel, TimestampedModel):
     """
     Type d'événement (Quoi) - entité administrable.
     Chaque type est associé à une source d'audit spécifique.
@@ -252,7 +255,7 @@ class GapType(TimestampedModel):
         return f"{self.audit_source.name} - {self.name}"
 
 
-class GapReport(TimestampedModel):
+class GapReport(OriginalValuesModel, TimestampedModel):
     """
     Entête de déclaration d'écart.
     Regroupe les informations de contexte pour un ou plusieurs écarts.
@@ -346,7 +349,7 @@ class GapReport(TimestampedModel):
         return f"Déclaration #{self.id} - {self.audit_source.name} - {self.observation_date}"
 
 
-class Gap(TimestampedModel):
+class Gap(OriginalValuesModel, TimestampedModel):
     """
     Écart individuel associé à une déclaration.
     """
@@ -640,6 +643,15 @@ class HistoriqueModification(TimestampedModel):
         verbose_name="Données après modification",
         help_text="État des données après la modification (format JSON)"
     )
+    est_checkpoint = models.BooleanField(
+        default=False,
+        verbose_name="Instantané complet",
+        help_text="Si coché, donnees_apres contient l'état complet de l'objet ; sinon seulement les champs modifiés"
+    )
+    
+    # Horodatage fixé au moment de la modification et non à l'écriture (différée) en base
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Créé le")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Modifié le")
     
     class Meta:
         verbose_name = "Historique de modification"
@@ -655,9 +667,10 @@ class HistoriqueModification(TimestampedModel):
         return f"{self.action} - {self.objet_repr} par {self.utilisateur} le {self.created_at.strftime('%d/%m/%Y à %H:%M')}"
     
     @classmethod
-    def enregistrer_modification(cls, objet, action, utilisateur, description, donnees_avant=None, donnees_apres=None):
+    def enregistrer_modification(cls, objet, action, utilisateur, description, donnees_avant=None, donnees_apres=None, est_checkpoint=False):
         """
         Méthode utilitaire pour enregistrer une modification dans l'historique.
+        Pendant une requête, l'écriture est différée et groupée (voir core.utils.historique).
         
         Args:
             objet: L'objet modifié (GapReport ou Gap)
@@ -666,6 +679,7 @@ class HistoriqueModification(TimestampedModel):
             description: Description de la modification
             donnees_avant: Données avant modification (optionnel)
             donnees_apres: Données après modification (optionnel)
+            est_checkpoint: True si donnees_apres est un instantané complet de l'objet
         """
         # Déterminer le type d'objet et la déclaration associée
         if isinstance(objet, GapReport):
@@ -679,7 +693,9 @@ class HistoriqueModification(TimestampedModel):
         else:
             raise ValueError(f"Type d'objet non supporté: {type(objet)}")
         
-        return cls.objects.create(
+        from core.utils.historique import enregistrer
+        now = timezone.now()
+        return enregistrer(cls(
             gap_report=gap_report,
             gap=gap,
             action=action,
@@ -689,8 +705,129 @@ class HistoriqueModification(TimestampedModel):
             utilisateur=utilisateur,
             description=description,
             donnees_avant=donnees_avant,
-            donnees_apres=donnees_apres
+            donnees_apres=donnees_apres,
+            est_checkpoint=est_checkpoint,
+            created_at=now,
+            updated_at=now
+        ))
+    
+    def reconstruire_etat(self):
+        """
+        Reconstruit l'état de l'objet (Gap ou GapReport) juste après cette entrée.
+        Rejoue les différentiels depuis le dernier instantané complet, en poursuivant
+        dans les segments d'archive si cet instantané a été archivé.
+        
+        Returns:
+            dict: État sérialisé de l'objet, ou None s'il n'existait pas à ce point
+        """
+        from core.utils.historique import is_full_snapshot, replay_entries
+        from core.utils.historique_archive import historique_objet_archive
+        
+        entries = HistoriqueModification.objects.filter(
+            models.Q(created_at__lt=self.created_at) |
+            models.Q(created_at=self.created_at, id__lte=self.id),
+            objet_type=self.objet_type,
+            objet_id=self.objet_id
+        ).order_by('-created_at', '-id')
+        
+        # Les entrées archivées sont toujours plus anciennes que celles de la table
+        gap_report_id = self.objet_id if self.objet_type == 'gap_report' else self.gap_report_id
+        archived = historique_objet_archive(
+            self.objet_type, self.objet_id, gap_report_id,
+            position=(self.created_at, self.id)
         )
+        
+        # Remonter jusqu'au dernier instantané complet (ou suppression)
+        to_replay = []
+        for entry in chain(entries.iterator(chunk_size=50), archived):
+            to_replay.append(entry)
+            if entry.action == 'suppression' or entry.est_checkpoint or is_full_snapshot(entry.donnees_apres):
+                break
+        
+        to_replay.reverse()
+        return replay_entries(to_replay)
+    
+    @classmethod
+    def etat_objet(cls, objet, entree):
+        """
+        Reconstruit l'état d'un Gap ou d'un GapReport à une entrée d'historique donnée.
+        
+        Args:
+            objet: Instance de Gap ou GapReport
+            entree: Entrée d'historique (instance ou ID) de cet objet
+        """
+        from core.utils.historique_archive import entree_archivee
+        
+        objet_type = 'gap_report' if isinstance(objet, GapReport) else 'gap'
+        if not isinstance(entree, cls):
+            try:
+                entree = cls.objects.get(pk=entree)
+            except cls.DoesNotExist:
+                # L'entrée a pu être déplacée dans l'archive de la déclaration
+                gap_report_id = objet.pk if objet_type == 'gap_report' else objet.gap_report_id
+                archivee = entree_archivee(gap_report_id, int(entree))
+                if archivee is None:
+                    raise
+                entree = archivee
+        if entree.objet_type != objet_type or entree.objet_id != objet.pk:
+            raise ValueError("Cette entrée d'historique ne concerne pas cet objet")
+        return entree.reconstruire_etat()
+
+
+class HistoriqueArchive(models.Model):
+    """
+    Segment d'archive de l'historique des modifications.
+    Contient, compressées, les entrées d'historique d'une déclaration (et de ses écarts)
+    déplacées hors de la table HistoriqueModification (voir core.utils.historique_archive).
+    """
+    
+    # Clés simples (pas de ForeignKey) : l'archive ne dépend pas des objets vivants
+    gap_report_id = models.PositiveIntegerField(
+        verbose_name="ID de la déclaration"
+    )
+    gap_ids = models.JSONField(
+        default=list,
+        verbose_name="IDs des écarts",
+        help_text="Écarts concernés par les entrées du segment"
+    )
+    date_debut = models.DateTimeField(
+        verbose_name="Première entrée"
+    )
+    date_fin = models.DateTimeField(
+        verbose_name="Dernière entrée"
+    )
+    nombre_entrees = models.PositiveIntegerField(
+        verbose_name="Nombre d'entrées"
+    )
+    donnees = models.BinaryField(
+        verbose_name="Entrées compressées",
+        help_text="Liste JSON des entrées, compressée (zlib)"
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Archivé le"
+    )
+    
+    class Meta:
+        verbose_name = "Archive d'historique"
+        verbose_name_plural = "Archives d'historique"
+        ordering = ['-date_fin']
+        indexes = [
+            models.Index(fields=['gap_report_id', '-date_fin']),
+        ]
+    
+    def __str__(self):
+        return f"Déclaration #{self.gap_report_id} - {self.nombre_entrees} entrées ({self.date_debut:%d/%m/%Y} - {self.date_fin:%d/%m/%Y})"
+    
+    def get_entrees(self):
+        """
+        Décompresse le segment.
+        
+        Returns:
+            list: Entrées (instances non sauvegardées de HistoriqueModification), des plus récentes aux plus anciennes
+        """
+        from core.utils.historique_archive import decode_segment
+        return decode_segment(self)
 
 
 # Signaux pour invalider le cache automatiquement
@@ -699,7 +836,7 @@ class HistoriqueModification(TimestampedModel):
 def invalidate_audit_source_cache(sender, **kwargs):
     """Invalide le cache quand une source d'audit est modifiée ou supprimée."""
     from core.utils.cache import invalidate_reference_data_cache
-    invalidate_reference_data_cache()
+    invalidate_reference_data_cache('audit_sources', 'gap_types')
 
 
 @receiver(post_save, sender=Process)
@@ -707,12 +844,22 @@ def invalidate_audit_source_cache(sender, **kwargs):
 def invalidate_process_cache(sender, **kwargs):
     """Invalide le cache quand un processus est modifié ou supprimé."""
     from core.utils.cache import invalidate_reference_data_cache
-    invalidate_reference_data_cache()
+    invalidate_reference_data_cache('processes')
 
 
 @receiver(post_save, sender=GapType)
 @receiver(post_delete, sender=GapType)
-def invalidate_gap_type_cache(sender, **kwargs):
-    """Invalide le cache quand un type d'événement est modifié ou supprimé."""
+def invalidate_gap_type_cache(sender, instance, **kwargs):
+    """
+    Invalide le cache quand un type d'événement est modifié ou supprimé :
+    la liste complète et les listes par source d'audit concernées (ancienne et nouvelle).
+    """
     from core.utils.cache import invalidate_reference_data_cache
-    invalidate_reference_data_cache()
\ No newline at end of file
+    audit_source_ids = {instance.audit_source_id}
+    original_values = instance.get_original_values()
+    if original_values and original_values.get('audit_source_id'):
+        audit_source_ids.add(original_values['audit_source_id'])
+    invalidate_reference_data_cache(
+        'gap_types',
+        *(f'gap_types:audit_source:{audit_source_id}' for audit_source_id in audit_source_ids)
+    )
@@ -0,0 +1,61 @@
+"""
+Modèles de supervision des performances (échantillons de requêtes SQL lentes, profils de requêtes).
+"""
+from django.conf import settings
+from django.db import models
+
+
+class SlowQuerySample(models.Model):
+    """
+    Requête SQL lente échantillonnée, avec son plan d'exécution.
+    Table plafonnée (SLOW_QUERY_SAMPLE_MAX_ROWS) : les échantillons les plus anciens sont supprimés.
+    """
+    shape = models.TextField(verbose_name="Forme de la requête")
+    shape_hash = models.CharField(max_length=64, db_index=True, verbose_name="Empreinte de la forme")
+    sql = models.TextField(verbose_name="Requête SQL")
+    params = models.JSONField(default=list, blank=True, verbose_name="Paramètres")
+    duration = models.FloatField(verbose_name="Durée (s)")
+    view_name = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    path = models.CharField(max_length=500, blank=True, verbose_name="Chemin")
+    plan = models.TextField(blank=True, verbose_name="Plan d'exécution")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Requête lente"
+        verbose_name_plural = "Requêtes lentes"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.duration:.3f}s - {self.shape[:80]}"
+
+
+class RequestProfile(models.Model):
+    """
+    Profil d'exécution d'une requête HTTP, demandé par un administrateur (?__profile=1).
+    Stocké au format collapsed stacks (speedscope, flamegraph.pl) ; table plafonnée (PROFILE_MAX_ROWS).
+    """
+    path = models.CharField(max_length=500, verbose_name="Chemin")
+    method = models.CharField(max_length=10, verbose_name="Méthode")
+    view_name = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="Utilisateur"
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name="Statut")
+    duration = models.FloatField(verbose_name="Durée (s)")
+    interval = models.FloatField(verbose_name="Intervalle d'échantillonnage (s)")
+    samples = models.PositiveIntegerField(verbose_name="Échantillons")
+    collapsed = models.TextField(verbose_name="Piles d'appels (format collapsed)")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration:.3f}s)"
@@ -3,6 +3,7 @@ Modèles pour la gestion des notifications de validation des écarts.
 """
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
 from .base import TimestampedModel
 from .gaps import Gap
 
@@ -64,13 +65,33 @@ class Notification(TimestampedModel):
         verbose_name="Type de notification"
     )
     
+    template_key = models.CharField(
+        max_length=40,
+        blank=True,
+        verbose_name="Gabarit du message",
+        help_text="Clé du gabarit utilisé pour rendre le titre et le message à l'affichage"
+    )
+    
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Paramètres du message",
+        help_text="Valeurs propres à la notification (les données des objets liés sont relues au rendu)"
+    )
+    
     title = models.CharField(
         max_length=200,
-        verbose_name="Titre"
+        blank=True,
+        default='',
+        verbose_name="Titre",
+        help_text="Texte libre, uniquement pour les notifications sans gabarit"
     )
     
     message = models.TextField(
-        verbose_name="Message"
+        blank=True,
+        default='',
+        verbose_name="Message",
+        help_text="Texte libre, uniquement pour les notifications sans gabarit"
     )
     
     priority = models.CharField(
@@ -103,7 +124,52 @@ class Notification(TimestampedModel):
         ]
     
     def __str__(self):
-        return f"{self.title} - {self.user.get_full_name()}"
+        return f"{self.display_title} - {self.user.get_full_name()}"
+    
+    @classmethod
+    def notify(cls, user, type, template_key, gap=None, gap_report=None, priority='normal', **params):
+        """
+        Crée une notification à partir d'un gabarit.
+        
+        Args:
+            user: Destinataire
+            type: Type de notification (voir TYPE_CHOICES)
+            template_key: Clé du gabarit (voir core.utils.notifications)
+            gap: Écart concerné (optionnel)
+            gap_report: Déclaration concernée (optionnel)
+            priority: Priorité de la notification
+            **params: Paramètres propres au message (non dérivables des objets liés)
+        """
+        return cls.objects.create(
+            user=user,
+            gap=gap,
+            gap_report=gap_report,
+            type=type,
+            template_key=template_key,
+            params=params,
+            priority=priority
+        )
+    
+    @cached_property
+    def _rendered(self):
+        """Titre et message rendus (une seule fois par instance)."""
+        if not self.template_key:
+            return self.title, self.message
+        
+        from core.utils.notifications import derive_params, render_notification
+        context = derive_params(gap=self.gap, gap_report=self.gap_report)
+        context.update(self.params or {})
+        return render_notification(self.template_key, context)
+    
+    @property
+    def display_title(self):
+        """Titre affiché de la notification."""
+        return self._rendered[0]
+    
+    @property
+    def display_message(self):
+        """Message affiché de la notification."""
+        return self._rendered[1]
     
     def mark_as_read(self):
         """Marque la notification comme lue."""
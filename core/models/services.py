@@ -3,6 +3,8 @@ Modèles liés à la gestion des services et de l'organisation hiérarchique.
 """
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from .base import TimestampedModel, CodedModel
 
 
@@ -225,4 +227,13 @@ class Service(TimestampedModel, CodedModel):
         if reasons:
             return f"Le service ne peut pas être supprimé car il {' et '.join(reasons)}."
         
-        return None
\ No newline at end of file
+        return None
+
+# Signaux pour invalider le cache automatiquement
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_service_cache(sender, instance, **kwargs):
+    """Invalide le cache quand un service est modifié ou supprimé, y compris celui de ses utilisateurs."""
+    from core.utils.cache import invalidate_reference_data_cache, invalidate_service_users_cache
+    invalidate_reference_data_cache('services')
+    invalidate_service_users_cache(instance.pk)
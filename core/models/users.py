@@ -4,6 +4,8 @@ Modèles liés à la gestion des utilisateurs et de l'authentification.
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.core.validators import RegexValidator
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from .base import TimestampedModel
 from .services import Service
 
@@ -130,6 +132,14 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
     
     def save(self, *args, **kwargs):
         """Sauvegarde avec logique métier."""
+        self.apply_droits_flags()
+        super().save(*args, **kwargs)
+    
+    def apply_droits_flags(self):
+        """
+        Définit is_staff et is_superuser d'après les droits.
+        Appelée par save() ; à appeler explicitement avant bulk_create/bulk_update.
+        """
         # Définir is_staff basé sur les droits
         if self.droits in [self.SUPER_ADMIN, self.ADMIN]:
             self.is_staff = True
@@ -141,8 +151,6 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
             self.is_superuser = True
         else:
             self.is_superuser = False
-            
-        super().save(*args, **kwargs)
     
     def get_full_name(self):
         """Retourne le nom complet de l'utilisateur."""
@@ -171,10 +179,26 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
     
     def get_service_path(self):
         """Retourne le chemin hiérarchique du service de l'utilisateur."""
+        # Chemin préchargé pour l'utilisateur authentifié (voir get_cached_auth_user)
+        service_path = getattr(self, '_service_path', None)
+        if service_path is not None and service_path[0] == self.service_id:
+            return service_path[1]
         if self.service:
             return self.service.get_chemin_hierarchique()
         return "Aucun service"
     
+    def get_session_auth_hash(self):
+        """
+        Retourne le hachage d'authentification de session.
+        Pour l'utilisateur chargé depuis le cache, le mot de passe n'est pas chargé : le hachage
+        précalculé est utilisé (voir get_cached_auth_user), sauf si le mot de passe a été
+        chargé ou modifié sur l'instance.
+        """
+        session_auth_hash = getattr(self, '_session_auth_hash', None)
+        if session_auth_hash is not None and 'password' not in self.__dict__:
+            return session_auth_hash
+        return super().get_session_auth_hash()
+    
     def is_active(self):
         """Surcharge pour intégrer le champ actif dans l'authentification Django."""
         return self.actif
@@ -251,4 +275,23 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
         if reasons:
             return f"L'utilisateur ne peut pas être supprimé car il {' et '.join(reasons)}."
         
-        return None
\ No newline at end of file
+        return None
+
+
+# Signaux pour invalider le cache automatiquement
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_data_cache(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalide le cache propre à l'utilisateur quand il est modifié ou supprimé
+    (la simple mise à jour de la date de connexion n'invalide rien).
+    """
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    from core.utils.cache import invalidate_user_cache, invalidate_reference_data_cache
+    invalidate_user_cache(instance.pk)
+    
+    # Les noms des validateurs figurent dans les données de routage des validations
+    from .workflow import ValidateurService  # Import local pour éviter les imports circulaires
+    if kwargs.get('created') is False and ValidateurService.objects.filter(validateur=instance).exists():
+        invalidate_reference_data_cache('validateurs')
@@ -3,6 +3,8 @@ Modèles liés à la gestion du workflow de validation des écarts.
 """
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from .base import TimestampedModel
 from .services import Service
 from .users import User
@@ -154,4 +156,17 @@ class ValidateurService(TimestampedModel):
             max_niveau=models.Max('niveau')
         )['max_niveau']
         
-        return max_niveau or 0
\ No newline at end of file
+        return max_niveau or 0
+
+
+# Signaux pour invalider le cache automatiquement
+@receiver(post_save, sender=ValidateurService)
+@receiver(post_delete, sender=ValidateurService)
+def invalidate_validateur_cache(sender, instance, **kwargs):
+    """
+    Invalide le cache du routage des validations et celui du validateur
+    quand une affectation est modifiée ou supprimée.
+    """
+    from core.utils.cache import invalidate_reference_data_cache, invalidate_user_cache
+    invalidate_reference_data_cache('validateurs')
+    invalidate_user_cache(instance.validateur_id)
@@ -2,8 +2,11 @@
 Service pour gérer le workflow de validation des écarts.
 """
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from ..models import Gap, ValidateurService, Notification, GapValidation
+from ..utils.cache import get_cached_max_validation_level
+from ..utils.historique import historique_logged
 
 
 class ValidationService:
@@ -36,13 +39,10 @@ class ValidationService:
                 user=validator.validateur,
                 gap=gap,
                 type='validation_request',
-                title=f"{gap.gap_number} - Nouvel événement à valider",
-                message=f"Un nouvel écart ({gap.gap_number}) a été déclaré par {gap.gap_report.declared_by.get_full_name()} "
-                       f"et nécessite votre validation (Niveau 1).\n\n"
-                       f"Service: {gap.gap_report.service.nom}\n"
-                       f"Type: {gap.gap_type.name}\n"
-                       f"Description: {gap.description[:100]}...",
-                priority='normal'
+                template_key='validation_request_initial',
+                priority='normal',
+                gap_number=gap.gap_number,
+                declarant=gap.gap_report.declared_by.get_full_name()
             )
     
     @classmethod
@@ -83,7 +83,7 @@ class ValidationService:
             if action == 'rejected':
                 gap.status = 'rejected'
                 
-                # Créer l'historique de validation AVANT de sauvegarder pour éviter le signal générique
+                # Créer l'historique de validation (le signal générique ne la double pas, voir historique_logged)
                 from ..models.gaps import HistoriqueModification
                 HistoriqueModification.enregistrer_modification(
                     objet=gap,
@@ -94,7 +94,8 @@ class ValidationService:
                     donnees_apres={'status': 'rejected', 'validated_by': validator.get_full_name(), 'level': level}
                 )
                 
-                gap.save(update_fields=['status', 'updated_at'])
+                with historique_logged(gap):
+                    gap.save(update_fields=['status', 'updated_at'])
                 
                 # Marquer comme lues les notifications de validation pour ce validateur
                 cls._mark_validation_notifications_read(gap, validator)
@@ -104,10 +105,12 @@ class ValidationService:
                     user=gap.gap_report.declared_by,
                     gap=gap,
                     type='gap_rejected',
-                    title=f"{gap.gap_number} - Événement rejeté",
-                    message=f"Votre événement {gap.gap_number} a été rejeté au niveau {level} par {validator.get_full_name()}.\n"
-                           f"Commentaire: {comment}" if comment else f"Votre événement {gap.gap_number} a été rejeté au niveau {level} par {validator.get_full_name()}.",
-                    priority='high'
+                    template_key='gap_rejected',
+                    priority='high',
+                    gap_number=gap.gap_number,
+                    level=level,
+                    validator=validator.get_full_name(),
+                    comment=comment
                 )
                 
                 # Créer une notification pour le validateur confirmant son action
@@ -115,9 +118,9 @@ class ValidationService:
                     user=validator,
                     gap=gap,
                     type='validation_completed',
-                    title=f"{gap.gap_number} - Traitement effectué : Non retenu",
-                    message=f"Vous avez rejeté l'événement {gap.gap_number}. Le déclarant a été notifié.",
-                    priority='normal'
+                    template_key='validation_completed_rejected',
+                    priority='normal',
+                    gap_number=gap.gap_number
                 )
                 return True
             
@@ -129,7 +132,7 @@ class ValidationService:
                     # Validation terminée, écart retenu
                     gap.status = 'retained'
                     
-                    # Créer l'historique de validation AVANT de sauvegarder pour éviter le signal générique
+                    # Créer l'historique de validation (le signal générique ne la double pas, voir historique_logged)
                     from ..models.gaps import HistoriqueModification
                     HistoriqueModification.enregistrer_modification(
                         objet=gap,
@@ -140,7 +143,8 @@ class ValidationService:
                         donnees_apres={'status': 'retained', 'validated_by': validator.get_full_name(), 'level': level}
                     )
                     
-                    gap.save(update_fields=['status', 'updated_at'])
+                    with historique_logged(gap):
+                        gap.save(update_fields=['status', 'updated_at'])
                     
                     # Marquer comme lues les notifications de validation pour ce validateur
                     cls._mark_validation_notifications_read(gap, validator)
@@ -150,9 +154,10 @@ class ValidationService:
                         user=gap.gap_report.declared_by,
                         gap=gap,
                         type='gap_retained',
-                        title=f"{gap.gap_number} - Événement retenu",
-                        message=f"Votre événement {gap.gap_number} a été retenu après validation complète par {validator.get_full_name()}.",
-                        priority='high'
+                        template_key='gap_retained',
+                        priority='high',
+                        gap_number=gap.gap_number,
+                        validator=validator.get_full_name()
                     )
                     
                     # Créer une notification pour le validateur confirmant son action
@@ -160,9 +165,9 @@ class ValidationService:
                         user=validator,
                         gap=gap,
                         type='validation_completed',
-                        title=f"{gap.gap_number} - Traitement effectué : Retenu",
-                        message=f"Vous avez approuvé l'événement {gap.gap_number}. L'événement est maintenant retenu et le déclarant a été notifié.",
-                        priority='normal'
+                        template_key='validation_completed_retained',
+                        priority='normal',
+                        gap_number=gap.gap_number
                     )
                     return True
                 else:
@@ -177,9 +182,10 @@ class ValidationService:
                         user=validator,
                         gap=gap,
                         type='validation_completed',
-                        title=f"{gap.gap_number} - Traitement effectué : Approuvé",
-                        message=f"Vous avez approuvé l'événement {gap.gap_number}. Il passe maintenant au niveau {next_level}.",
-                        priority='normal'
+                        template_key='validation_completed_approved',
+                        priority='normal',
+                        gap_number=gap.gap_number,
+                        level=next_level
                     )
                     
                     next_validators = ValidateurService.get_validateurs_service(
@@ -195,13 +201,12 @@ class ValidationService:
                             user=next_validator.validateur,
                             gap=gap,
                             type='validation_request',
-                            title=f"{gap.gap_number} - Événement à valider (Niveau {next_level})",
-                            message=f"L'écart {gap.gap_number} a été approuvé au niveau {level} par {validator.get_full_name()} "
-                                   f"et nécessite maintenant votre validation (Niveau {next_level}).\n\n"
-                                   f"Service: {gap.gap_report.service.nom}\n"
-                                   f"Type: {gap.gap_type.name}\n"
-                                   f"Description: {gap.description[:100]}...",
-                            priority='normal'
+                            template_key='validation_request_next',
+                            priority='normal',
+                            gap_number=gap.gap_number,
+                            level=next_level,
+                            previous_level=level,
+                            validator=validator.get_full_name()
                         )
                     
                     return False
@@ -267,7 +272,7 @@ class ValidationService:
         """
         Retourne le niveau maximum de validation pour un écart.
         """
-        return ValidateurService.get_niveaux_max_service(gap.gap_report.service)
+        return get_cached_max_validation_level(gap.gap_report.service_id)
     
     @classmethod
     def _can_validate_now(cls, gap, validator, validator_level):
@@ -292,17 +297,17 @@ class ValidationService:
         return validator_level == (last_validation.level + 1)
     
     @classmethod
-    def _create_notification(cls, user, gap, type, title, message, priority='normal'):
+    def _create_notification(cls, user, gap, type, template_key, priority='normal', **params):
         """
-        Crée une notification.
+        Crée une notification à partir d'un gabarit.
         """
-        Notification.objects.create(
+        Notification.notify(
             user=user,
-            gap=gap,
             type=type,
-            title=title,
-            message=message,
-            priority=priority
+            template_key=template_key,
+            gap=gap,
+            priority=priority,
+            **params
         )
     
     @classmethod
@@ -323,10 +328,10 @@ class ValidationService:
         # Marquer aussi toutes les notifications non lues de validation_request pour ce validateur
         # au cas où il y aurait un problème de correspondance
         additional_count = Notification.objects.filter(
+            Q(params__gap_number=gap.gap_number) | Q(title__contains=gap.gap_number),
             user=validator,
             type='validation_request',
-            is_read=False,
-            title__contains=gap.gap_number
+            is_read=False
         ).update(
             is_read=True,
             read_at=timezone.now()
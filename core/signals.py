@@ -2,48 +2,81 @@
 Signaux Django pour l'historique des modifications.
 """
 import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.core.serializers.json import DjangoJSONEncoder
-from threading import local
+from django.template.defaultfilters import linebreaksbr
+from django.utils.html import format_html
 
-from .models.gaps import GapReport, Gap, HistoriqueModification, GapType
+from .models.gaps import GapReport, Gap, HistoriqueModification, HistoriqueArchive, GapType
 from .models.attachments import GapReportAttachment, GapAttachment
+from .utils.metrics import GAPS_CREATED
+from .utils.server_timing import timed
+from .utils.historique import (
+    enregistrer as enregistrer_historique, historique_buffer, is_checkpoint_due, is_historique_logged
+)
 
 User = get_user_model()
 
-# Thread-local storage pour stocker l'utilisateur actuel et les données avant modification
-_thread_locals = local()
+# Contexte de la requête courante (une valeur par thread ou tâche asyncio) :
+# utilisateur actuel et modification spécifique en cours
+_current_user = ContextVar('historique_current_user', default=None)
+_specific_modification = ContextVar('historique_specific_modification', default=None)
+
+
+@contextmanager
+def historique_context(user=None, flush=True):
+    """
+    Portée d'historique d'une requête : utilisateur actuel, indicateur de modification
+    spécifique et tampon d'historique. Tout est restauré à la sortie de la portée,
+    y compris les valeurs définies entre-temps par set_current_user.
+    
+    Args:
+        user: Utilisateur à l'origine des modifications (None si anonyme)
+        flush: Si False, le tampon produit n'est pas écrit à la sortie (voir historique_buffer)
+    """
+    user_token = _current_user.set(user)
+    modification_token = _specific_modification.set(None)
+    try:
+        with historique_buffer(flush=flush) as buffer:
+            yield buffer
+    finally:
+        _specific_modification.reset(modification_token)
+        _current_user.reset(user_token)
 
 
 def set_current_user(user):
     """
-    Définit l'utilisateur actuel pour le thread.
+    Définit l'utilisateur actuel pour la requête (contexte) courante.
     À appeler depuis les vues ou middlewares.
     """
-    _thread_locals.user = user
+    _current_user.set(user)
 
 
 def get_current_user():
     """
-    Récupère l'utilisateur actuel du thread.
+    Récupère l'utilisateur actuel de la requête (contexte) courante.
     """
-    return getattr(_thread_locals, 'user', None)
+    return _current_user.get()
 
 
 def set_specific_modification_in_progress(modification_type):
     """
     Marque qu'une modification spécifique est en cours pour éviter les doublons génériques.
+    L'indicateur est levé à la fin de la portée de la requête (voir historique_context).
     """
-    _thread_locals.specific_modification_in_progress = modification_type
+    _specific_modification.set(modification_type)
 
 
 def is_specific_modification_in_progress():
     """
     Vérifie si une modification spécifique est en cours.
     """
-    return hasattr(_thread_locals, 'specific_modification_in_progress')
+    return _specific_modification.get() is not None
 
 
 def _serialize_model_instance(instance, for_json=False):
@@ -98,27 +131,85 @@ def _convert_data_for_json(data):
     return json_data
 
 
-def _get_field_changes(old_data, new_instance):
+def _serialize_related(field, pk):
     """
-    Compare les données anciennes avec la nouvelle instance et retourne les changements.
+    Sérialise une valeur de clé étrangère comme _serialize_model_instance.
     """
-    if not old_data:
+    if pk is None:
+        return None
+    related = field.related_model._base_manager.filter(pk=pk).first()
+    return {'id': pk, 'str': str(related) if related else str(pk)}
+
+
+def _get_field_changes(instance):
+    """
+    Compare les valeurs d'origine de l'instance (capturées au chargement, voir
+    OriginalValuesModel) avec ses valeurs courantes et retourne les changements.
+    Seuls les champs modifiés sont sérialisés.
+    """
+    original_values = instance.get_original_values()
+    if not original_values:
         return {}
     
     changes = {}
-    new_data = _serialize_model_instance(new_instance, for_json=False)
-    
-    for field_name, old_value in old_data.items():
-        new_value = new_data.get(field_name)
-        if old_value != new_value:
-            changes[field_name] = {
-                'avant': old_value,
-                'apres': new_value
-            }
+    for field in instance._meta.fields:
+        if field.attname not in original_values:
+            continue  # Champ différé, jamais chargé
+        
+        old_value = original_values[field.attname]
+        new_value = getattr(instance, field.attname)
+        if old_value == new_value:
+            continue
+        
+        if field.is_relation:
+            old_value = _serialize_related(field, old_value)
+            related = getattr(instance, field.name)
+            new_value = {'id': related.pk, 'str': str(related)} if related is not None else None
+        changes[field.name] = {
+            'avant': old_value,
+            'apres': new_value
+        }
     
     return changes
 
 
+def _build_change_payload(instance, changes):
+    """
+    Construit les données d'historique d'une modification : seuls les champs modifiés
+    sont stockés, avec un instantané complet périodique (voir core.utils.historique).
+    
+    Returns:
+        tuple: (donnees_avant, donnees_apres, est_checkpoint)
+    """
+    objet_type = 'gap_report' if isinstance(instance, GapReport) else 'gap'
+    donnees_avant = _convert_data_for_json({name: change['avant'] for name, change in changes.items()})
+    
+    if is_checkpoint_due(objet_type, instance.pk):
+        return donnees_avant, _serialize_model_instance(instance, for_json=True), True
+    
+    donnees_apres = _convert_data_for_json({name: change['apres'] for name, change in changes.items()})
+    return donnees_avant, donnees_apres, False
+
+
+def describe_status_change(gap, old_status, new_status, comment=''):
+    """
+    Description HTML d'un changement de statut d'écart (même présentation que les entrées
+    produites par les signaux), suivie du commentaire éventuel, échappé.
+    """
+    description = _generate_change_description(
+        {'status': {'avant': old_status, 'apres': new_status}}, 'changement_statut', 'événement', gap
+    )
+    if comment:
+        description += format_html(
+            '<div class="modification-item mb-3">'
+            '<div class="font-medium text-gray-800 mb-1">• Commentaire</div>'
+            '<div class="pl-4 text-gray-700">{}</div>'
+            '</div>',
+            linebreaksbr(comment, autoescape=True)
+        )
+    return description
+
+
 def _generate_change_description(changes, action, model_name, instance=None):
     """
     Génère une description lisible des changements.
@@ -231,32 +322,20 @@ def _generate_change_description(changes, action, model_name, instance=None):
 
 @receiver(pre_save, sender=GapReport)
 @receiver(pre_save, sender=Gap)
+@receiver(pre_save, sender=GapType)
+@timed('signals')
 def store_pre_save_data(sender, instance, **kwargs):
     """
-    Stocke les données avant modification pour comparaison.
-    Optimisé pour réduire les requêtes en environnement concurrent.
-    """
-    if instance.pk:  # Modification d'un objet existant
-        try:
-            # Optimisation : utiliser only() pour récupérer seulement les champs nécessaires
-            fields_to_track = []
-            if sender == GapReport:
-                fields_to_track = [
-                    'audit_source', 'source_reference', 'service', 'process',
-                    'location', 'observation_date', 'declared_by'
-                ]
-            elif sender == Gap:
-                fields_to_track = [
-                    'gap_type', 'description', 'status', 'gap_number'
-                ]
-            
-            old_instance = sender.objects.only(*fields_to_track).get(pk=instance.pk)
-            _thread_locals.__dict__[f'pre_save_{sender.__name__}_{instance.pk}'] = _serialize_model_instance(old_instance, for_json=False)
-        except sender.DoesNotExist:
-            pass
+    S'assure que les valeurs avant modification sont disponibles pour comparaison.
+    Les instances chargées depuis la base les ont déjà (OriginalValuesModel) : aucune
+    requête n'est faite, sauf pour une instance construite manuellement avec une clé primaire.
+    """
+    if instance.pk and instance.get_original_values() is None and not kwargs.get('raw'):
+        instance.load_original_values()
 
 
 @receiver(post_save, sender=GapReport)
+@timed('signals')
 def log_gap_report_changes(sender, instance, created, **kwargs):
     """
     Enregistre les modifications des Déclarations d'évenements et crée des notifications pour les utilisateurs impliqués.
@@ -272,7 +351,8 @@ def log_gap_report_changes(sender, instance, created, **kwargs):
             action='creation',
             utilisateur=user,
             description=_generate_change_description({}, 'creation', 'déclaration d\'événement', instance),
-            donnees_apres=_serialize_model_instance(instance, for_json=True)
+            donnees_apres=_serialize_model_instance(instance, for_json=True),
+            est_checkpoint=True
         )
         
         # Les notifications pour involved_users seront gérées par le signal m2m_changed
@@ -284,17 +364,18 @@ def log_gap_report_changes(sender, instance, created, **kwargs):
             return
             
         # Modification
-        old_data = getattr(_thread_locals, f'pre_save_{sender.__name__}_{instance.pk}', None)
-        changes = _get_field_changes(old_data, instance)
+        changes = _get_field_changes(instance)
         
         if changes:  # Seulement si il y a des changements réels
+            donnees_avant, donnees_apres, est_checkpoint = _build_change_payload(instance, changes)
             HistoriqueModification.enregistrer_modification(
                 objet=instance,
                 action='modification',
                 utilisateur=user,
                 description=_generate_change_description(changes, 'modification', 'déclaration d\'événement', instance),
-                donnees_avant=_convert_data_for_json(old_data),
-                donnees_apres=_serialize_model_instance(instance, for_json=True)
+                donnees_avant=donnees_avant,
+                donnees_apres=donnees_apres,
+                est_checkpoint=est_checkpoint
             )
         else:
             # Même sans changements de champs, vérifier si c'est dû à une modification M2M
@@ -308,6 +389,7 @@ def log_gap_report_changes(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=Gap)
+@timed('signals')
 def log_gap_changes(sender, instance, created, **kwargs):
     """
     Enregistre les modifications des événements et déclenche les notifications de validation.
@@ -323,7 +405,8 @@ def log_gap_changes(sender, instance, created, **kwargs):
             action='creation',
             utilisateur=user,
             description=_generate_change_description({}, 'creation', 'événement', instance),
-            donnees_apres=_serialize_model_instance(instance, for_json=True)
+            donnees_apres=_serialize_model_instance(instance, for_json=True),
+            est_checkpoint=True
         )
         
         # Si c'est un écart (is_gap=True) en statut déclaré, créer une notification de validation
@@ -334,24 +417,24 @@ def log_gap_changes(sender, instance, created, **kwargs):
         # Créer une notification pour le déclarant sur la création de l'écart
         if hasattr(instance, 'gap_report') and instance.gap_report and instance.gap_report.declared_by != user:
             from .models.notifications import Notification
-            Notification.objects.create(
+            Notification.notify(
                 user=instance.gap_report.declared_by,
                 gap=instance,
                 type='gap_created',
-                title=f"{instance.gap_number} - Événement créé",
-                message=f"Votre événement {instance.gap_number} ({instance.gap_type.name}) a été créé avec succès.",
-                priority='normal'
+                template_key='gap_created',
+                priority='normal',
+                gap_number=instance.gap_number
             )
         elif hasattr(instance, 'gap_report') and instance.gap_report and instance.gap_report.declared_by == user:
             # Auto-notification pour le créateur
             from .models.notifications import Notification
-            Notification.objects.create(
+            Notification.notify(
                 user=user,
                 gap=instance,
                 type='gap_created',
-                title=f"{instance.gap_number} - Événement créé",
-                message=f"Votre événement {instance.gap_number} ({instance.gap_type.name}) a été créé avec succès.",
-                priority='normal'
+                template_key='gap_created',
+                priority='normal',
+                gap_number=instance.gap_number
             )
             
     else:
@@ -361,36 +444,26 @@ def log_gap_changes(sender, instance, created, **kwargs):
             return
             
         # Modification
-        old_data = getattr(_thread_locals, f'pre_save_{sender.__name__}_{instance.pk}', None)
-        changes = _get_field_changes(old_data, instance)
+        changes = _get_field_changes(instance)
         
         if changes:  # Seulement si il y a des changements réels
             # Vérifier si c'est un changement de statut spécifique
             action = 'modification'
             if 'status' in changes:
                 action = 'changement_statut'
-                
-                # Vérifier si une validation vient d'être enregistrée pour éviter les doublons
-                from datetime import timedelta
-                from django.utils import timezone
-                recent_validation = HistoriqueModification.objects.filter(
-                    gap=instance,
-                    action='validation',
-                    created_at__gte=timezone.now() - timedelta(seconds=5)
-                ).exists()
-                
-                if recent_validation:
-                    # Une validation vient d'être enregistrée, ne pas créer l'historique générique
-                    return
             
-            HistoriqueModification.enregistrer_modification(
-                objet=instance,
-                action=action,
-                utilisateur=user,
-                description=_generate_change_description(changes, action, 'événement', instance),
-                donnees_avant=_convert_data_for_json(old_data),
-                donnees_apres=_serialize_model_instance(instance, for_json=True)
-            )
+            # Ne pas doubler une entrée déjà enregistrée explicitement (validation, changement de statut)
+            if not is_historique_logged(instance):
+                donnees_avant, donnees_apres, est_checkpoint = _build_change_payload(instance, changes)
+                HistoriqueModification.enregistrer_modification(
+                    objet=instance,
+                    action=action,
+                    utilisateur=user,
+                    description=_generate_change_description(changes, action, 'événement', instance),
+                    donnees_avant=donnees_avant,
+                    donnees_apres=donnees_apres,
+                    est_checkpoint=est_checkpoint
+                )
             
             # Vérifier si le gap_type a changé et gérer les notifications
             if 'gap_type' in changes:
@@ -421,13 +494,13 @@ def log_gap_changes(sender, instance, created, **kwargs):
                             
                             # Notifier le déclarant du changement
                             if instance.gap_report and instance.gap_report.declared_by:
-                                Notification.objects.create(
+                                Notification.notify(
                                     user=instance.gap_report.declared_by,
                                     gap=instance,
                                     type='gap_modified',
-                                    title=f"Événement reclassé - {instance.gap_number}",
-                                    message=f"Votre déclaration {instance.gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
-                                    priority='normal'
+                                    template_key='gap_reclassified_event',
+                                    priority='normal',
+                                    gap_number=instance.gap_number
                                 )
                                 
                         # Changement d'événement vers écart
@@ -438,13 +511,13 @@ def log_gap_changes(sender, instance, created, **kwargs):
                             # Notifier le déclarant du changement
                             if instance.gap_report and instance.gap_report.declared_by:
                                 from .models.notifications import Notification
-                                Notification.objects.create(
+                                Notification.notify(
                                     user=instance.gap_report.declared_by,
                                     gap=instance,
                                     type='gap_modified',
-                                    title=f"Écart reclassé - {instance.gap_number}",
-                                    message=f"Votre déclaration {instance.gap_number} a été reclassée en écart et nécessite désormais une validation.",
-                                    priority='high'
+                                    template_key='gap_reclassified_gap',
+                                    priority='high',
+                                    gap_number=instance.gap_number
                                 )
                     except Exception:
                         pass  # Ignorer les erreurs silencieusement
@@ -475,26 +548,29 @@ def log_gap_changes(sender, instance, created, **kwargs):
                         notification_type = None
                     else:
                         notification_type = 'gap_modified'
-                        title = f"Écart {instance.gap_number} modifié"
-                        message = f"Le statut de votre écart {instance.gap_number} a été modifié par {user.get_full_name()} : {old_status} → {new_status}."
+                        template_key = 'gap_modified_status'
+                        params = {'old_status': old_status, 'new_status': new_status}
                 else:
                     notification_type = 'gap_modified'
-                    title = f"Écart {instance.gap_number} modifié"
-                    message = f"Votre événement {instance.gap_number} a été modifié par {user.get_full_name()}."
+                    template_key = 'gap_modified'
+                    params = {}
                 
                 # Créer la notification seulement si un type a été défini
                 if notification_type:
-                    Notification.objects.create(
+                    Notification.notify(
                         user=instance.gap_report.declared_by,
                         gap=instance,
                         type=notification_type,
-                        title=title,
-                        message=message,
-                        priority='normal'
+                        template_key=template_key,
+                        priority='normal',
+                        gap_number=instance.gap_number,
+                        author=user.get_full_name(),
+                        **params
                     )
 
 
 @receiver(post_delete, sender=GapReport)
+@timed('signals')
 def log_gap_report_deletion(sender, instance, **kwargs):
     """
     Enregistre la suppression des Déclarations d'évenements.
@@ -504,7 +580,7 @@ def log_gap_report_deletion(sender, instance, **kwargs):
         return
     
     # Pour les suppressions, on crée une entrée spéciale car l'objet n'existe plus
-    HistoriqueModification.objects.create(
+    enregistrer_historique(HistoriqueModification(
         gap_report=None,  # L'objet est supprimé
         gap=None,
         action='suppression',
@@ -514,24 +590,21 @@ def log_gap_report_deletion(sender, instance, **kwargs):
         utilisateur=user,
         description=_generate_change_description({}, 'suppression', 'déclaration d\'événement', instance),
         donnees_avant=_serialize_model_instance(instance, for_json=True)
-    )
+    ))
 
 
-@receiver(pre_save, sender=GapType)
-def pre_save_gap_type(sender, instance, **kwargs):
+@receiver(post_delete, sender=GapReport)
+@timed('signals')
+def delete_gap_report_archives(sender, instance, **kwargs):
     """
-    Enregistre l'état du GapType avant sauvegarde pour détecter les changements.
+    Supprime les segments d'archive d'une déclaration supprimée,
+    comme la suppression en cascade de son historique non archivé.
     """
-    if instance.pk:
-        try:
-            old_instance = sender.objects.get(pk=instance.pk)
-            thread_key = f'pre_save_{sender.__name__}_{instance.pk}'
-            setattr(_thread_locals, thread_key, _serialize_model_instance(old_instance))
-        except sender.DoesNotExist:
-            pass
+    HistoriqueArchive.objects.filter(gap_report_id=instance.id).delete()
 
 
 @receiver(post_save, sender=GapType)
+@timed('signals')
 def handle_gap_type_changes(sender, instance, created, **kwargs):
     """
     Gère les changements du GapType, particulièrement les modifications du champ is_gap.
@@ -544,12 +617,8 @@ def handle_gap_type_changes(sender, instance, created, **kwargs):
     if not user:
         return
     
-    # Récupérer les données avant modification
-    old_data = getattr(_thread_locals, f'pre_save_{sender.__name__}_{instance.pk}', None)
-    if not old_data:
-        return
-    
-    changes = _get_field_changes(old_data, instance)
+    # Comparer avec les valeurs avant modification
+    changes = _get_field_changes(instance)
     
     # Vérifier si le champ is_gap a changé
     if 'is_gap' in changes:
@@ -576,13 +645,13 @@ def handle_gap_type_changes(sender, instance, created, **kwargs):
                 
                 # Notifier le déclarant du changement
                 if gap.gap_report and gap.gap_report.declared_by:
-                    Notification.objects.create(
+                    Notification.notify(
                         user=gap.gap_report.declared_by,
                         gap=gap,
                         type='gap_modified',
-                        title=f"Modification de type - {gap.gap_number}",
-                        message=f"Votre déclaration {gap.gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
-                        priority='normal'
+                        template_key='gap_type_changed_event',
+                        priority='normal',
+                        gap_number=gap.gap_number
                     )
                     
             elif not old_is_gap and new_is_gap:
@@ -591,17 +660,18 @@ def handle_gap_type_changes(sender, instance, created, **kwargs):
                 
                 # Notifier le déclarant du changement
                 if gap.gap_report and gap.gap_report.declared_by:
-                    Notification.objects.create(
+                    Notification.notify(
                         user=gap.gap_report.declared_by,
                         gap=gap,
                         type='gap_modified',
-                        title=f"Modification de type - {gap.gap_number}",
-                        message=f"Votre déclaration {gap.gap_number} a été reclassée en écart et nécessite désormais une validation.",
-                        priority='high'
+                        template_key='gap_type_changed_gap',
+                        priority='high',
+                        gap_number=gap.gap_number
                     )
 
 
 @receiver(post_delete, sender=Gap)
+@timed('signals')
 def log_gap_deletion(sender, instance, **kwargs):
     """
     Enregistre la suppression des événements.
@@ -611,7 +681,7 @@ def log_gap_deletion(sender, instance, **kwargs):
         return
     
     # Pour les suppressions, on crée une entrée spéciale car l'objet n'existe plus
-    HistoriqueModification.objects.create(
+    enregistrer_historique(HistoriqueModification(
         gap_report=instance.gap_report,  # On garde la référence à la déclaration
         gap=None,  # L'événement est supprimé
         action='suppression',
@@ -621,23 +691,26 @@ def log_gap_deletion(sender, instance, **kwargs):
         utilisateur=user,
         description=_generate_change_description({}, 'suppression', 'événement', instance),
         donnees_avant=_serialize_model_instance(instance, for_json=True)
-    )
+    ))
     
     # Créer une notification pour le déclarant sur la suppression de l'écart
     if hasattr(instance, 'gap_report') and instance.gap_report and instance.gap_report.declared_by:
         from .models.notifications import Notification
         
-        Notification.objects.create(
+        Notification.notify(
             user=instance.gap_report.declared_by,
             gap=None,  # L'événement est supprimé, pas de référence
             type='gap_deleted',
-            title=f"{instance.gap_number} - Événement supprimé",
-            message=f"Votre événement {instance.gap_number} ({instance.gap_type.name}) a été supprimé par {user.get_full_name()}.",
-            priority='normal'
+            template_key='gap_deleted',
+            priority='normal',
+            gap_number=instance.gap_number,
+            gap_type=instance.gap_type.name,  # Non dérivable : l'événement n'existe plus
+            author=user.get_full_name()
         )
 
 
 @receiver(m2m_changed, sender=GapReport.involved_users.through)
+@timed('signals')
 def handle_involved_users_changed(sender, instance, action, pk_set, **kwargs):
     """
     Gère les changements dans les utilisateurs impliqués d'une déclaration.
@@ -663,13 +736,13 @@ def handle_involved_users_changed(sender, instance, action, pk_set, **kwargs):
         if new_involved_users.exists():
             description = f"{instance.id} - Déclaration d'événement modifiée - Ajout de personnes présentes : {', '.join(user_names)}"
             
-            # Créer l'historique de modification
+            # Créer l'historique de modification (seul le changement m2m est stocké)
             HistoriqueModification.enregistrer_modification(
                 objet=instance,
                 action='modification',
                 utilisateur=user,
                 description=description,
-                donnees_apres=_serialize_model_instance(instance, for_json=True)
+                donnees_apres={'involved_users': {'ajoutes': sorted(pk_set)}}
             )
         
         # Notifier chaque nouvel utilisateur impliqué (sauf le déclarant et l'utilisateur qui fait la modification)
@@ -680,14 +753,14 @@ def handle_involved_users_changed(sender, instance, action, pk_set, **kwargs):
         )
         
         for involved_user in users_to_notify:
-            Notification.objects.create(
+            Notification.notify(
                 user=involved_user,
                 gap=None,  # Pas d'écart spécifique
                 gap_report=instance,  # Référence à la déclaration
                 type='declaration_involved',
-                title=f"Déclaration #{instance.id} - Vous êtes impliqué",
-                message=f"Vous avez été associé à une déclaration d'événement créée par {user.get_full_name()}. Service: {instance.service.nom if instance.service else 'Non défini'}, Source: {instance.audit_source.name}.",
-                priority='normal'
+                template_key='declaration_involved',
+                priority='normal',
+                author=user.get_full_name()
             )
     
     elif action == 'post_remove' and pk_set:
@@ -704,17 +777,18 @@ def handle_involved_users_changed(sender, instance, action, pk_set, **kwargs):
         if removed_users.exists():
             description = f"{instance.id} - Déclaration d'événement modifiée - Suppression de personnes présentes : {', '.join(user_names)}"
             
-            # Créer l'historique de modification
+            # Créer l'historique de modification (seul le changement m2m est stocké)
             HistoriqueModification.enregistrer_modification(
                 objet=instance,
                 action='modification',
                 utilisateur=user,
                 description=description,
-                donnees_apres=_serialize_model_instance(instance, for_json=True)
+                donnees_apres={'involved_users': {'retires': sorted(pk_set)}}
             )
 
 
 @receiver(post_save, sender=GapReportAttachment)
+@timed('signals')
 def log_gap_report_attachment_changes(sender, instance, created, **kwargs):
     """
     Enregistre les ajouts de pièces jointes aux déclarations d'événements.
@@ -732,11 +806,12 @@ def log_gap_report_attachment_changes(sender, instance, created, **kwargs):
             action='modification',
             utilisateur=user,
             description=f"{instance.gap_report.id} - Déclaration d'événement modifiée - Ajout de pièce jointe : {instance.name}",
-            donnees_apres=_serialize_model_instance(instance.gap_report, for_json=True)
+            donnees_apres={'pieces_jointes': {'ajout': instance.name}}
         )
 
 
 @receiver(post_delete, sender=GapReportAttachment)
+@timed('signals')
 def log_gap_report_attachment_deletion(sender, instance, **kwargs):
     """
     Enregistre les suppressions de pièces jointes des déclarations d'événements.
@@ -753,11 +828,12 @@ def log_gap_report_attachment_deletion(sender, instance, **kwargs):
         action='modification',
         utilisateur=user,
         description=f"{instance.gap_report.id} - Déclaration d'événement modifiée - Suppression de pièce jointe : {instance.name}",
-        donnees_apres=_serialize_model_instance(instance.gap_report, for_json=True)
+        donnees_apres={'pieces_jointes': {'suppression': instance.name}}
     )
 
 
 @receiver(post_save, sender=GapAttachment)
+@timed('signals')
 def log_gap_attachment_changes(sender, instance, created, **kwargs):
     """
     Enregistre les ajouts de pièces jointes aux événements.
@@ -775,11 +851,12 @@ def log_gap_attachment_changes(sender, instance, created, **kwargs):
             action='modification',
             utilisateur=user,
             description=f"{instance.gap.gap_number} - Événement modifié - Ajout de pièce jointe : {instance.name}",
-            donnees_apres=_serialize_model_instance(instance.gap, for_json=True)
+            donnees_apres={'pieces_jointes': {'ajout': instance.name}}
         )
 
 
 @receiver(post_delete, sender=GapAttachment)
+@timed('signals')
 def log_gap_attachment_deletion(sender, instance, **kwargs):
     """
     Enregistre les suppressions de pièces jointes des événements.
@@ -796,5 +873,15 @@ def log_gap_attachment_deletion(sender, instance, **kwargs):
         action='modification',
         utilisateur=user,
         description=f"{instance.gap.gap_number} - Événement modifié - Suppression de pièce jointe : {instance.name}",
-        donnees_apres=_serialize_model_instance(instance.gap, for_json=True)
-        )
\ No newline at end of file
+        donnees_apres={'pieces_jointes': {'suppression': instance.name}}
+        )
+
+
+@receiver(post_save, sender=Gap)
+@timed('signals')
+def count_gap_creation(sender, instance, created, **kwargs):
+    """
+    Compte les créations d'écarts pour les métriques (une fois la transaction validée).
+    """
+    if created:
+        transaction.on_commit(GAPS_CREATED.inc)
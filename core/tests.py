@@ -1 +1,156 @@
-# Create your tests here.
+"""
+Tests du contexte d'historique par requête (HistoriqueMiddleware, contextvars).
+"""
+import asyncio
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import include, path
+from django.utils.module_loading import import_string
+
+from .middleware import HistoriqueMiddleware
+from .models import HistoriqueModification, User
+from .signals import get_current_user, is_specific_modification_in_progress, set_specific_modification_in_progress
+from .utils.historique import enregistrer, get_current_buffer
+
+CONCURRENT_REQUESTS = 4
+
+# Point de rendez-vous des requêtes concurrentes (recréé par chaque test)
+_barrier = None
+
+
+async def historique_probe(request):
+    """Vue de test : lit et modifie le contexte d'historique en s'entrelaçant avec les autres requêtes."""
+    buffer = get_current_buffer()
+    if _barrier is not None:
+        await _barrier.wait()
+    flag_before = is_specific_modification_in_progress()
+
+    user = get_current_user()
+    set_specific_modification_in_progress('test')
+    # Comme toute écriture d'historique, hors de la boucle (requête SQL possible)
+    await sync_to_async(enregistrer)(HistoriqueModification(
+        action='modification',
+        objet_type='Test',
+        objet_id=user.pk,
+        objet_repr=user.matricule,
+        description=f"Sonde {user.matricule}",
+        utilisateur=user,
+    ))
+    if _barrier is not None:
+        # Toutes les requêtes ont défini leur indicateur et rempli leur tampon
+        await _barrier.wait()
+
+    return JsonResponse({
+        'user': get_current_user().matricule,
+        'flag_before': flag_before,
+        'flag_after': is_specific_modification_in_progress(),
+        'same_buffer': get_current_buffer() is buffer,
+        'buffer_id': id(buffer),
+        'buffered': [entry.description for entry in buffer.entries],
+    })
+
+
+urlpatterns = [
+    path('probe/', historique_probe),
+    path('', include('ecarts_actions.urls')),
+]
+
+ASYNC_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.HistoriqueMiddleware',
+]
+
+# MIDDLEWARE du projet, sans la barre de débogage (développement uniquement)
+PROJECT_MIDDLEWARE = [path for path in settings.MIDDLEWARE if not path.startswith('debug_toolbar.')]
+
+SYNC_ONLY_MIDDLEWARE = [
+    'core.middleware.PerformanceMonitoringMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
+    'core.middleware.ForcePasswordChangeMiddleware',
+    'core.middleware.ServerTimingViewMiddleware',
+]
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class HistoriqueMiddlewareTests(TransactionTestCase):
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                matricule=f'T{index:04d}', nom='Test', prenom=f'Utilisateur {index}', must_change_password=False
+            )
+            for index in range(CONCURRENT_REQUESTS)
+        ]
+
+    def tearDown(self):
+        global _barrier
+        _barrier = None
+
+    def assert_context_reset(self):
+        self.assertIsNone(get_current_user())
+        self.assertFalse(is_specific_modification_in_progress())
+        self.assertIsNone(get_current_buffer())
+
+    async def _concurrent_probes(self):
+        """Lance une requête par utilisateur en parallèle ; retourne les réponses décodées."""
+        global _barrier
+        _barrier = asyncio.Barrier(CONCURRENT_REQUESTS)
+        clients = []
+        for user in self.users:
+            client = AsyncClient()
+            await client.aforce_login(user, backend='core.backends.MatriculeAuthBackend')
+            clients.append(client)
+        responses = await asyncio.gather(*(client.get('/probe/') for client in clients))
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        return [response.json() for response in responses]
+
+    @override_settings(MIDDLEWARE=ASYNC_MIDDLEWARE)
+    async def test_concurrent_async_requests_are_isolated(self):
+        with mock.patch.object(
+            HistoriqueMiddleware, '__acall__', autospec=True, side_effect=HistoriqueMiddleware.__acall__
+        ) as acall:
+            results = await self._concurrent_probes()
+        self.assertEqual(acall.call_count, CONCURRENT_REQUESTS)
+
+        for user, result in zip(self.users, results):
+            self.assertEqual(result['user'], user.matricule)
+            self.assertFalse(result['flag_before'])
+            self.assertTrue(result['flag_after'])
+            self.assertTrue(result['same_buffer'])
+            self.assertEqual(result['buffered'], [f"Sonde {user.matricule}"])
+        self.assertEqual(len({result['buffer_id'] for result in results}), CONCURRENT_REQUESTS)
+
+        # Chaque tampon a été écrit après sa réponse, avec le bon utilisateur
+        entries = {
+            entry.objet_repr: entry.utilisateur_id
+            async for entry in HistoriqueModification.objects.filter(objet_type='Test')
+        }
+        self.assertEqual(entries, {user.matricule: user.pk for user in self.users})
+        self.assert_context_reset()
+
+    @override_settings(MIDDLEWARE=PROJECT_MIDDLEWARE)
+    async def test_project_middleware_stack_runs_synchronously(self):
+        for middleware_path in SYNC_ONLY_MIDDLEWARE:
+            self.assertIn(middleware_path, PROJECT_MIDDLEWARE)
+            self.assertFalse(getattr(import_string(middleware_path), 'async_capable', False), middleware_path)
+
+        with mock.patch.object(HistoriqueMiddleware, '__acall__', autospec=True) as acall:
+            client = AsyncClient()
+            await client.aforce_login(self.users[0], backend='core.backends.MatriculeAuthBackend')
+            response = await client.get('/probe/')
+        acall.assert_not_called()
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['user'], self.users[0].matricule)
+        self.assertFalse(result['flag_before'])
+        self.assertTrue(result['flag_after'])
+        self.assertTrue(await HistoriqueModification.objects.filter(objet_repr=self.users[0].matricule).aexists())
+        self.assert_context_reset()
@@ -30,4 +30,5 @@ urlpatterns = [
     path('api/delete-gap-attachment/<int:pk>/', gaps.delete_gap_attachment, name='delete_gap_attachment'),
     path('api/delete-gap/<int:pk>/', gaps.delete_gap, name='delete_gap'),
     path('api/delete-gap-confirm/<int:pk>/', gaps.delete_gap_confirm, name='delete_gap_confirm'),
+    path('api/historique/', gaps.historique_timeline_api, name='historique_timeline'),
 ]
\ No newline at end of file
@@ -2,65 +2,500 @@
 Utilitaires de cache pour l'application EcartsActions.
 Optimise les performances pour un usage avec de nombreux utilisateurs concurrents.
 """
+from collections import OrderedDict
 from functools import wraps
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.conf import settings
+from django.http import HttpResponse
 import hashlib
 import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+
+from core.utils.server_timing import timed
+
+logger = logging.getLogger(__name__)
+
+
+# --- Cache local (premier niveau) ---------------------------------------------------
+#
+# Les données de référence sont lues à chaque requête par chaque worker : un cache LRU
+# borné, propre au processus, évite l'aller-retour Redis et le dépickling. Il est placé
+# devant le cache partagé et indexé par les clés versionnées (voir tagged_cache_key) :
+# une invalidation dans un processus est diffusée aux autres par le compteur de version
+# du tag, que chaque processus relit au plus tous les LOCAL_CACHE_VERSION_TTL secondes.
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    Cache LRU en mémoire, borné en nombre d'entrées, avec expiration (thread-safe).
+    Les valeurs sont partagées entre les requêtes du processus : elles ne doivent pas être modifiées.
+    """
+    
+    def __init__(self, max_entries=1000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        """
+        Retourne les compteurs du cache local.
+        
+        Returns:
+            dict: Entrées, succès, échecs, évictions et taux de succès
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+local_cache = LocalCache(
+    max_entries=getattr(settings, 'LOCAL_CACHE_MAX_ENTRIES', 1000),
+    timeout=getattr(settings, 'LOCAL_CACHE_TIMEOUT', 300),
+)
+
+# Délai maximal de prise en compte, dans ce processus, d'une invalidation faite par un autre
+LOCAL_CACHE_VERSION_TTL = getattr(settings, 'LOCAL_CACHE_VERSION_TTL', 2)
+
+
+def get_local_cache_stats():
+    """Retourne les compteurs succès/échecs/évictions du cache local du processus."""
+    return local_cache.stats()
+
+
+# --- Invalidation par tags ----------------------------------------------------------
+#
+# Chaque tag (ex: 'gap_types', 'gap_types:audit_source:3', 'services') possède un numéro
+# de version stocké dans le cache. Les clés des données étiquetées incluent les versions
+# de leurs tags : invalider un tag revient à incrémenter son compteur (O(1)), les anciennes
+# clés ne sont plus jamais lues et expirent d'elles-mêmes.
+
+TAG_VERSION_PREFIX = 'tagver'
+
+# Tags des données de référence
+REFERENCE_TAGS = ('services', 'gap_types', 'audit_sources', 'processes', 'validateurs')
+
+
+def _tag_version_key(tag):
+    return f"{TAG_VERSION_PREFIX}:{tag}"
+
+
+def _initial_tag_version():
+    """
+    Version initiale d'un tag absent du cache (jamais utilisé ou évincé).
+    Basée sur l'horloge pour ne jamais réutiliser une version déjà servie.
+    """
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(tags):
+    """
+    Retourne les versions courantes des tags : depuis le cache local si elles ont été lues
+    récemment, sinon depuis le cache partagé (un seul aller-retour).
+    
+    Args:
+        tags: Liste de tags
+    
+    Returns:
+        dict: {tag: version}
+    """
+    versions = {}
+    keys = {}
+    for tag in tags:
+        key = _tag_version_key(tag)
+        version = local_cache.get(key, _MISSING)
+        if version is _MISSING:
+            keys[key] = tag
+        else:
+            versions[tag] = version
+    if not keys:
+        return versions
+    
+    with timed('cache'):
+        found = cache.get_many(list(keys))
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = _initial_tag_version()
+            # add() : un autre processus a pu initialiser le tag entre-temps
+            with timed('cache'):
+                if not cache.add(key, version, None):
+                    version = cache.get(key, version)
+        versions[tag] = version
+        local_cache.set(key, version, LOCAL_CACHE_VERSION_TTL)
+    return versions
+
+
+def tagged_cache_key(base_key, tags):
+    """
+    Construit une clé de cache incluant les versions des tags dont dépend la donnée.
+    
+    Args:
+        base_key: Clé de base (ex: "gap_types:all")
+        tags: Tags dont dépend la donnée (ex: ['gap_types'])
+    
+    Returns:
+        str: Clé versionnée (ex: "gap_types:all:v1718000000000")
+    """
+    versions = get_tag_versions(tags)
+    return f"{base_key}:v" + '.'.join(str(versions[tag]) for tag in tags)
+
+
+def invalidate_tags(*tags):
+    """
+    Invalide toutes les données étiquetées par ces tags en incrémentant leur version.
+    """
+    for tag in tags:
+        key = _tag_version_key(tag)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            # Tag absent (jamais utilisé ou évincé) : repartir d'une version neuve
+            version = _initial_tag_version()
+            cache.set(key, version, None)
+        # Prise en compte immédiate dans ce processus ; les autres relisent la version sous peu
+        local_cache.set(key, version, LOCAL_CACHE_VERSION_TTL)
+
+
+# --- Protection contre l'effet de horde -----------------------------------------------
+#
+# Les valeurs sont stockées avec la durée de leur calcul et leur échéance logique.
+# - Recalcul anticipé probabiliste (XFetch) : à l'approche de l'échéance, une requête
+#   recalcule la valeur avec une probabilité croissante, avant l'expiration effective.
+# - Verrou de remplissage : une seule requête à la fois recalcule une clé donnée ; les
+#   autres servent la valeur périmée (CACHE_SERVE_STALE) ou attendent le résultat.
+# Les entrées restent CACHE_STALE_TIMEOUT secondes après leur échéance pour être servies périmées.
+
+CACHE_XFETCH_BETA = getattr(settings, 'CACHE_XFETCH_BETA', 1.0)
+CACHE_SERVE_STALE = getattr(settings, 'CACHE_SERVE_STALE', True)
+CACHE_STALE_TIMEOUT = getattr(settings, 'CACHE_STALE_TIMEOUT', 300)
+CACHE_LOCK_TIMEOUT = getattr(settings, 'CACHE_LOCK_TIMEOUT', 30)
+CACHE_LOCK_WAIT = 0.05
+
+
+def _should_recompute(delta, expires_at, beta=None):
+    """
+    Décide du recalcul anticipé (XFetch) : vrai si l'échéance est dépassée, ou
+    aléatoirement d'autant plus souvent que l'échéance est proche et le calcul long.
+    """
+    beta = CACHE_XFETCH_BETA if beta is None else beta
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _fill(backend, cache_key, compute, timeout):
+    """Calcule la valeur et la stocke avec sa durée de calcul et son échéance."""
+    start = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - start
+    with timed('cache'):
+        backend.set(cache_key, (value, delta, time.time() + timeout), timeout + CACHE_STALE_TIMEOUT)
+    return value
+
+
+# Suppression du verrou seulement s'il porte encore le jeton du calcul (atomique côté Redis)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _release_lock(backend, lock_key, token):
+    """
+    Libère un verrou de remplissage s'il porte encore le jeton de ce calcul : un verrou
+    expiré pendant un calcul trop long, puis repris par un autre processus, n'est pas supprimé.
+    """
+    client = getattr(backend, 'client', None)
+    with timed('cache'):
+        if hasattr(client, 'get_client'):
+            # django-redis : comparaison et suppression en une seule opération
+            client.get_client(write=True).eval(
+                _RELEASE_LOCK_SCRIPT, 1, client.make_key(lock_key), client.encode(token)
+            )
+        elif backend.get(lock_key) == token:
+            backend.delete(lock_key)
+
+
+def get_or_compute(cache_key, compute, timeout, cache_alias='default'):
+    """
+    Lit une valeur dans le cache partagé ou la calcule, avec recalcul anticipé et
+    verrou de remplissage (un seul calcul simultané par clé, tous processus confondus).
+    
+    Args:
+        cache_key: Clé de cache
+        compute: Fonction sans argument calculant la valeur
+        timeout: Durée de validité de la valeur (secondes)
+        cache_alias: Alias du cache à utiliser
+    
+    Returns:
+        La valeur en cache, éventuellement périmée pendant un recalcul concurrent
+    """
+    from core.utils.metrics import CACHE_SHARED_REQUESTS
+    
+    backend = caches[cache_alias]
+    with timed('cache'):
+        entry = backend.get(cache_key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _should_recompute(delta, expires_at):
+            CACHE_SHARED_REQUESTS.inc(result='hit')
+            return value
+    
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+    while not backend.add(lock_key, token, CACHE_LOCK_TIMEOUT):
+        # Une autre requête recalcule la valeur
+        if entry is not None and (CACHE_SERVE_STALE or time.time() < entry[2]):
+            CACHE_SHARED_REQUESTS.inc(result='stale' if time.time() >= entry[2] else 'hit')
+            return entry[0]
+        if time.monotonic() >= deadline:
+            logger.warning("Verrou de cache %s non libéré, calcul sans verrou", cache_key)
+            return _fill(backend, cache_key, compute, timeout)
+        time.sleep(CACHE_LOCK_WAIT)
+        entry = backend.get(cache_key)
+        if entry is not None and time.time() < entry[2]:
+            CACHE_SHARED_REQUESTS.inc(result='hit')
+            return entry[0]
+    
+    CACHE_SHARED_REQUESTS.inc(result='miss')
+    try:
+        return _fill(backend, cache_key, compute, timeout)
+    finally:
+        _release_lock(backend, lock_key, token)
+
+
+def get_or_set_reference(base_key, tags, compute, timeout):
+    """
+    Lecture à deux niveaux d'une donnée de référence : cache local du processus,
+    puis cache partagé, puis calcul protégé (voir get_or_compute). La clé est versionnée par les tags.
+    
+    Args:
+        base_key: Clé de base (ex: "services:hierarchical_list")
+        tags: Tags dont dépend la donnée
+        compute: Fonction sans argument calculant la donnée
+        timeout: Durée de vie dans le cache partagé (secondes)
+    
+    Returns:
+        La donnée (partagée entre les requêtes du processus : ne pas la modifier)
+    """
+    cache_key = tagged_cache_key(base_key, tags)
+    value = local_cache.get(cache_key, _MISSING)
+    if value is not _MISSING:
+        return value
+    
+    value = get_or_compute(cache_key, compute, timeout)
+    local_cache.set(cache_key, value, min(timeout, local_cache.timeout))
+    return value
+
+
+def user_cache_tags(user):
+    """
+    Tags des données propres à un utilisateur : sa génération ('user:<id>') et celle de
+    son service ('service:<id>'). Incrémenter l'un des deux invalide toutes ses clés.
+    
+    Args:
+        user: Instance utilisateur
+    
+    Returns:
+        list: Tags (vide pour un utilisateur anonyme)
+    """
+    if user is None or not user.is_authenticated:
+        return []
+    tags = [f'user:{user.pk}']
+    if user.service_id:
+        tags.append(f'service:{user.service_id}')
+    return tags
 
 
 def cache_key_for_user(base_key, user, **kwargs):
     """
     Génère une clé de cache unique basée sur l'utilisateur et des paramètres.
+    La clé inclut la génération de l'utilisateur et de son service (voir invalidate_user_cache).
     
     Args:
         base_key: Clé de base
         user: Instance utilisateur
         **kwargs: Paramètres additionnels pour la clé
     """
+    authenticated = user is not None and user.is_authenticated
     key_data = {
-        'user_id': user.id if user and user.is_authenticated else 'anonymous',
-        'user_droits': getattr(user, 'droits', None) if user and user.is_authenticated else None,
-        'user_service_id': user.service_id if user and user.is_authenticated and hasattr(user, 'service') else None,
+        'user_id': user.pk if authenticated else 'anonymous',
+        'user_droits': getattr(user, 'droits', None) if authenticated else None,
+        'user_service_id': user.service_id if authenticated else None,
         **kwargs
     }
     
-    # Créer un hash des données pour une clé courte et unique
-    key_hash = hashlib.md5(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:8]
+    # Hachage complet : un préfixe court expose à des collisions entre utilisateurs
+    key_hash = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+    
+    return tagged_cache_key(f"{base_key}:{key_hash}", user_cache_tags(user))
+
+
+def invalidate_user_cache(*user_ids):
+    """
+    Invalide toutes les données en cache propres aux utilisateurs donnés
+    (un incrément de génération par utilisateur, sans parcours des clés).
     
-    return f"{base_key}:{key_hash}"
+    Args:
+        *user_ids: IDs (ou instances) des utilisateurs
+    """
+    invalidate_tags(*(f'user:{getattr(user_id, "pk", user_id)}' for user_id in user_ids))
 
 
-def cache_user_dependent(timeout=300, cache_alias='default'):
+def invalidate_service_users_cache(*service_ids):
     """
-    Décorateur pour mettre en cache les résultats des vues en fonction de l'utilisateur.
+    Invalide les données en cache propres à tous les utilisateurs des services donnés.
     
     Args:
+        *service_ids: IDs des services
+    """
+    invalidate_tags(*(f'service:{service_id}' for service_id in service_ids))
+
+
+# En-têtes HTMX qui modifient le fragment rendu
+HTMX_VARY_HEADERS = ('HX-Request', 'HX-Target', 'HX-Trigger', 'HX-Boosted')
+
+# En-têtes de réponse couverts par la clé de cache_response
+_RESPONSE_VARY_COVERED = {'cookie', 'accept-language'} | {header.lower() for header in HTMX_VARY_HEADERS}
+
+# Au-delà de cette taille, le contenu est compressé avant stockage
+RESPONSE_COMPRESS_MIN_SIZE = 1024
+
+
+def _response_cache_key(request, view_name, args, kwargs, tags, per_user, headers, cookies):
+    """
+    Clé de cache d'une réponse : hachage complet (SHA-256) de la vue, de ses arguments,
+    des paramètres GET, des en-têtes et cookies pris en compte et, si per_user, de l'utilisateur.
+    """
+    user = getattr(request, 'user', None)
+    key_data = {
+        'view': view_name,
+        'args': [str(arg) for arg in args],
+        'kwargs': {k: str(v) for k, v in kwargs.items()},
+        'method': request.method,
+        'query': sorted(request.GET.lists()),
+        'language': getattr(request, 'LANGUAGE_CODE', None),
+        'headers': [request.headers.get(header) for header in headers],
+        'cookies': [request.COOKIES.get(cookie) for cookie in cookies],
+    }
+    if per_user:
+        key_data['user_id'] = user.pk if user is not None and user.is_authenticated else None
+        tags = [*tags, *user_cache_tags(user)]
+    key_hash = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+    return tagged_cache_key(f"response:{view_name}:{key_hash}", tags)
+
+
+def _is_response_cacheable(request, response):
+    """Vérifie qu'une réponse peut être resservie telle quelle à la même clé."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    if 'no-store' in response.get('Cache-Control', ''):
+        return False
+    # Un jeton CSRF rendu dans la réponse est lié à la session : ne pas le partager
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    # Une réponse variant selon un en-tête non pris en compte dans la clé n'est pas mise en cache
+    vary = {header.strip().lower() for header in response.get('Vary', '').split(',') if header.strip()}
+    return vary <= _RESPONSE_VARY_COVERED
+
+
+def cache_response(tags, timeout=300, per_user=True, headers=HTMX_VARY_HEADERS, cookies=(), cache_alias='default'):
+    """
+    Décorateur de mise en cache des réponses (fragments HTMX, API JSON) des vues en lecture.
+    Stocke le contenu rendu (compressé s'il est volumineux) et les en-têtes, sous une clé
+    versionnée par les tags des données dont dépend la réponse : toute modification de ces
+    données invalide la réponse (voir invalidate_tags).
+    
+    Seules les requêtes GET/HEAD et les réponses 200 sans cookie ni jeton CSRF sont mises en cache.
+    
+    Args:
+        tags: Tags des données dont dépend la réponse (ex: ['processes', 'audit_sources'])
         timeout: Durée de cache en secondes (défaut: 5 minutes)
+        per_user: Si True, la réponse dépend de l'utilisateur connecté
+        headers: En-têtes de requête faisant varier la réponse (défaut: en-têtes HTMX)
+        cookies: Cookies faisant varier la réponse
         cache_alias: Alias du cache à utiliser
     """
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            # Générer une clé unique basée sur la vue, les arguments et l'utilisateur
-            cache_key = cache_key_for_user(
-                f"view:{view_func.__name__}",
-                request.user,
-                args=args,
-                kwargs=kwargs,
-                query_params=dict(request.GET.items())
-            )
-            
-            # Essayer de récupérer depuis le cache
-            cached_result = cache.get(cache_key, alias=cache_alias)
-            if cached_result is not None:
-                return cached_result
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
             
-            # Exécuter la vue et mettre en cache le résultat
-            result = view_func(request, *args, **kwargs)
-            cache.set(cache_key, result, timeout, alias=cache_alias)
+            backend = caches[cache_alias]
+            cache_key = _response_cache_key(
+                request, view_func.__name__, args, kwargs, tags, per_user, headers, cookies
+            )
+            with timed('cache'):
+                cached = backend.get(cache_key)
+            if cached is not None:
+                content, compressed, status, response_headers = cached
+                response = HttpResponse(zlib.decompress(content) if compressed else content, status=status)
+                for header, value in response_headers:
+                    response[header] = value
+                return response
             
-            return result
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            if _is_response_cacheable(request, response):
+                content = response.content
+                compressed = len(content) >= RESPONSE_COMPRESS_MIN_SIZE
+                if compressed:
+                    content = zlib.compress(content)
+                with timed('cache'):
+                    backend.set(cache_key, (content, compressed, response.status_code, list(response.items())), timeout)
+            return response
         return wrapper
     return decorator
 
@@ -87,50 +522,22 @@ def cache_queryset(timeout=300, cache_alias='default'):
             ).hexdigest()[:8]
             cache_key = f"queryset:{func.__name__}:{cache_key_hash}"
             
-            # Essayer de récupérer depuis le cache
-            cached_result = cache.get(cache_key, alias=cache_alias)
-            if cached_result is not None:
-                return cached_result
-            
-            # Exécuter la fonction et mettre en cache le résultat
-            result = func(*args, **kwargs)
-            cache.set(cache_key, result, timeout, alias=cache_alias)
-            
-            return result
+            # Récupérer depuis le cache ou exécuter la fonction (un seul calcul simultané)
+            return get_or_compute(cache_key, lambda: func(*args, **kwargs), timeout, cache_alias)
         return wrapper
     return decorator
 
 
-def invalidate_user_cache(user, pattern=None):
-    """
-    Invalide le cache pour un utilisateur spécifique.
-    
-    Args:
-        user: Instance utilisateur
-        pattern: Pattern optionnel pour limiter l'invalidation
-    """
-    # Note: Django-Redis supporte la suppression par pattern
-    if hasattr(cache, 'delete_pattern'):
-        if pattern:
-            cache.delete_pattern(f"*user:{user.id}*{pattern}*")
-        else:
-            cache.delete_pattern(f"*user:{user.id}*")
-
-
 def get_cached_services():
     """
     Récupère la liste hiérarchique des services depuis le cache.
     Cache pendant 1 heure car ces données changent rarement.
     """
-    cache_key = "services:hierarchical_list"
-    services = cache.get(cache_key)
-    
-    if services is None:
+    def compute():
         from core.views.gaps import get_services_hierarchical_order
-        services = get_services_hierarchical_order()
-        cache.set(cache_key, services, 3600)  # 1 heure
+        return get_services_hierarchical_order()
     
-    return services
+    return get_or_set_reference("services:hierarchical_list", ['services'], compute, 3600)  # 1 heure
 
 
 def get_cached_gap_types():
@@ -138,15 +545,12 @@ def get_cached_gap_types():
     Récupère la liste des types d'écarts depuis le cache.
     Cache pendant 30 minutes.
     """
-    cache_key = "gap_types:all"
-    gap_types = cache.get(cache_key)
-    
-    if gap_types is None:
+    def compute():
         from core.models import GapType
-        gap_types = list(GapType.objects.filter(is_active=True).order_by('audit_source__name', 'name'))
-        cache.set(cache_key, gap_types, 1800)  # 30 minutes
+        return list(GapType.objects.filter(is_active=True).order_by('audit_source__name', 'name'))
     
-    return gap_types
+    # Le tri utilise le nom de la source d'audit : la liste dépend aussi des sources
+    return get_or_set_reference("gap_types:all", ['gap_types', 'audit_sources'], compute, 1800)  # 30 minutes
 
 
 def get_cached_audit_sources():
@@ -154,30 +558,142 @@ def get_cached_audit_sources():
     Récupère la liste des sources d'audit depuis le cache.
     Cache pendant 1 heure car ces données changent rarement.
     """
-    cache_key = "audit_sources:all"
-    audit_sources = cache.get(cache_key)
-    
-    if audit_sources is None:
+    def compute():
         from core.models import AuditSource
-        audit_sources = list(AuditSource.objects.filter(is_active=True).order_by('name'))
-        cache.set(cache_key, audit_sources, 3600)  # 1 heure
+        return list(AuditSource.objects.filter(is_active=True).order_by('name'))
+    
+    return get_or_set_reference("audit_sources:all", ['audit_sources'], compute, 3600)  # 1 heure
+
+
+def get_cached_processes():
+    """
+    Récupère la liste des processus actifs depuis le cache.
+    Cache pendant 1 heure car ces données changent rarement.
+    """
+    def compute():
+        from core.models import Process
+        return list(Process.objects.filter(is_active=True).order_by('code'))
+    
+    return get_or_set_reference("processes:all", ['processes'], compute, 3600)  # 1 heure
+
+
+def get_cached_gap_types_for_audit_source(audit_source_id):
+    """
+    Récupère les types d'écarts actifs d'une source d'audit depuis le cache.
+    Cache pendant 30 minutes, invalidé par les modifications des types d'écart de cette source.
+    
+    Args:
+        audit_source_id: ID de la source d'audit
+    """
+    def compute():
+        from core.models import GapType
+        return list(GapType.objects.filter(audit_source_id=audit_source_id, is_active=True).order_by('name'))
+    
+    tag = f'gap_types:audit_source:{audit_source_id}'
+    return get_or_set_reference(tag, [tag], compute, 1800)  # 30 minutes
+
+
+def get_cached_validateurs_matrix():
+    """
+    Récupère la matrice des validateurs actifs depuis le cache (gestion du workflow).
+    Cache pendant 1 heure, invalidé par les modifications des affectations.
+    
+    Returns:
+        dict: {service_id: {audit_source_id: {niveau: ValidateurService}}}
+    """
+    def compute():
+        from core.models import ValidateurService
+        matrix = {}
+        for vs in ValidateurService.objects.filter(
+            actif=True,
+            audit_source__is_active=True
+        ).select_related('validateur', 'service', 'audit_source'):
+            matrix.setdefault(vs.service_id, {}).setdefault(vs.audit_source_id, {})[vs.niveau] = vs
+        return matrix
+    
+    return get_or_set_reference("validateurs:matrix", ['validateurs', 'audit_sources'], compute, 3600)  # 1 heure
+
+
+def get_cached_max_validation_level(service_id):
+    """
+    Récupère le niveau maximum de validation configuré pour un service depuis le cache
+    (routage des validations, lu à chaque validation).
+    
+    Args:
+        service_id: ID du service
+    
+    Returns:
+        int: Niveau maximum ou 0 si aucun validateur
+    """
+    def compute():
+        from core.models import ValidateurService
+        return ValidateurService.get_niveaux_max_service(service_id)
+    
+    return get_or_set_reference(f"validateurs:niveau_max:{service_id}", ['validateurs'], compute, 3600)
+
+
+
+# Champs exclus de l'utilisateur mis en cache, différés et chargés à la demande :
+# - last_login, mis à jour à chaque connexion sans invalidation (voir invalidate_user_data_cache) ;
+# - password, pour ne pas copier les hachages de mots de passe dans le cache partagé
+#   (seul le hachage de session, un HMAC dérivé du mot de passe, est mis en cache)
+AUTH_USER_DEFERRED_FIELDS = ('last_login', 'password')
+
+
+def get_cached_auth_user(user_id):
+    """
+    Charge l'utilisateur authentifié d'une requête depuis le cache (voir MatriculeAuthBackend.get_user) :
+    ligne utilisateur (sans le mot de passe), hachage de session, service et chemin hiérarchique
+    du service, sans requête SQL à chaud.
+    La clé dépend de la génération de l'utilisateur et des services : elle est invalidée par
+    l'enregistrement de l'utilisateur (y compris un changement de mot de passe) ou d'un service.
     
-    return audit_sources
+    Args:
+        user_id: ID de l'utilisateur (session)
+    
+    Returns:
+        User: Nouvelle instance (service préchargé), ou None si l'utilisateur n'existe pas
+    """
+    from django.contrib.auth import get_user_model
+    from core.models import Service
+    User = get_user_model()
+    
+    def compute():
+        user = User.objects.select_related('service').filter(pk=user_id).first()
+        if user is None:
+            return None
+        return {
+            'user': {
+                field.attname: getattr(user, field.attname)
+                for field in User._meta.concrete_fields if field.attname not in AUTH_USER_DEFERRED_FIELDS
+            },
+            'service': {
+                field.attname: getattr(user.service, field.attname) for field in Service._meta.concrete_fields
+            } if user.service else None,
+            'service_path': user.service.get_chemin_hierarchique() if user.service else None,
+            'session_auth_hash': user.get_session_auth_hash(),
+        }
+    
+    data = get_or_set_reference(f"auth_user:{user_id}", [f'user:{user_id}', 'services'], compute, 3600)
+    if data is None:
+        return None
+    
+    # Instances neuves à chaque requête : la donnée en cache est partagée par le processus
+    user = User.from_db('default', list(data['user']), list(data['user'].values()))
+    user._session_auth_hash = data.get('session_auth_hash')
+    if data['service'] is not None:
+        service = Service.from_db('default', list(data['service']), list(data['service'].values()))
+        User._meta.get_field('service').set_cached_value(user, service)
+        user._service_path = (service.pk, data['service_path'])
+    return user
 
 
-def invalidate_reference_data_cache():
+def invalidate_reference_data_cache(*tags):
     """
-    Invalide le cache des données de référence (services, types d'écarts, sources d'audit).
+    Invalide le cache des données de référence (services, types d'écarts, sources d'audit, processus).
     À appeler quand ces données sont modifiées via l'admin.
+    
+    Args:
+        *tags: Tags à invalider (défaut: toutes les données de référence)
     """
-    # Vider les caches principaux
-    cache.delete_many([
-        "services:hierarchical_list",
-        "gap_types:all", 
-        "audit_sources:all"
-    ])
-    
-    # Vider aussi tous les caches par audit_source
-    # Note: En l'absence d'une méthode pour lister toutes les clés, on vide tout le cache
-    # pour s'assurer que les caches gap_types:audit_source:* sont supprimés
-    cache.clear()
\ No newline at end of file
+    invalidate_tags(*(tags or REFERENCE_TAGS))
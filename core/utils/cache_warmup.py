@@ -0,0 +1,117 @@
+"""
+Préchauffage des caches de données de référence.
+Après un déploiement ou un redémarrage de Redis, les premières requêtes reconstruisent
+l'arborescence des services, les listes de référence et la matrice du workflow : le
+préchauffage les calcule à l'avance, avec un parallélisme borné.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from core.utils.cache import (
+    REFERENCE_TAGS, get_cached_audit_sources, get_cached_gap_types, get_cached_gap_types_for_audit_source,
+    get_cached_max_validation_level, get_cached_processes, get_cached_services, get_cached_validateurs_matrix,
+    get_tag_versions, invalidate_reference_data_cache, user_cache_tags,
+)
+
+logger = logging.getLogger(__name__)
+
+# Nombre de caches remplis simultanément (une connexion à la base par tâche)
+DEFAULT_WARMUP_WORKERS = 4
+
+
+def _warm_gap_types_by_audit_source():
+    from core.models import AuditSource
+    for audit_source_id in AuditSource.objects.filter(is_active=True).values_list('pk', flat=True):
+        get_cached_gap_types_for_audit_source(audit_source_id)
+
+
+def _warm_max_validation_levels():
+    from core.models import Service
+    for service_id in Service.objects.filter(actif=True).values_list('pk', flat=True):
+        get_cached_max_validation_level(service_id)
+
+
+def _warm_user_generations():
+    from core.models import User
+    tags = set()
+    for user in User.objects.filter(actif=True).only('pk', 'service_id').iterator(chunk_size=2000):
+        tags.update(user_cache_tags(user))
+    tags = sorted(tags)
+    for start in range(0, len(tags), 500):
+        get_tag_versions(tags[start:start + 500])
+
+
+# Caches à préchauffer : (nom, fonction)
+WARMERS = [
+    ('services', get_cached_services),
+    ('gap_types', get_cached_gap_types),
+    ('audit_sources', get_cached_audit_sources),
+    ('processes', get_cached_processes),
+    ('gap_types_par_source', _warm_gap_types_by_audit_source),
+    ('niveaux_validation', _warm_max_validation_levels),
+    ('matrice_validateurs', get_cached_validateurs_matrix),
+]
+
+
+def _run_warmer(name, func):
+    """Exécute un préchauffage et mesure sa durée (la connexion du thread est fermée ensuite)."""
+    start = time.monotonic()
+    try:
+        func()
+        error = None
+    except Exception as e:
+        logger.exception("Échec du préchauffage du cache %s", name)
+        error = str(e)
+    finally:
+        connections.close_all()
+    return {'name': name, 'seconds': time.monotonic() - start, 'error': error}
+
+
+def warm_caches(workers=DEFAULT_WARMUP_WORKERS, users=False, force=False, only=None):
+    """
+    Remplit les caches de données de référence.
+    
+    Args:
+        workers: Nombre maximum de caches remplis en parallèle
+        users: Si True, initialise aussi les générations de cache des utilisateurs actifs
+        force: Si True, invalide les données de référence avant de les recalculer
+        only: Noms des caches à préchauffer (défaut: tous)
+    
+    Returns:
+        list: Un dictionnaire par cache (name, seconds, error), dans l'ordre de WARMERS
+    """
+    warmers = list(WARMERS)
+    if users:
+        warmers.append(('generations_utilisateurs', _warm_user_generations))
+    if only:
+        warmers = [(name, func) for name, func in warmers if name in only]
+    if force:
+        invalidate_reference_data_cache(*REFERENCE_TAGS)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='warm_caches') as executor:
+        futures = [executor.submit(_run_warmer, name, func) for name, func in warmers]
+        return [future.result() for future in futures]
+
+
+def warm_caches_in_background():
+    """
+    Lance le préchauffage dans un thread en arrière-plan (démarrage d'un worker,
+    voir WARM_CACHES_ON_STARTUP) : le worker sert les requêtes sans attendre.
+    """
+    def run():
+        results = warm_caches(
+            workers=getattr(settings, 'WARM_CACHES_WORKERS', DEFAULT_WARMUP_WORKERS),
+            users=getattr(settings, 'WARM_CACHES_USERS', False),
+        )
+        logger.info("Caches préchauffés : %s", ', '.join(
+            f"{result['name']} {result['seconds']:.2f}s" for result in results
+        ))
+    
+    thread = threading.Thread(target=run, name='warm_caches', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,160 @@
+"""
+Exports JSON en flux des données de référence (utilisateurs, services).
+Les lignes sont lues par .values().iterator() et écrites au fil de l'eau dans une
+StreamingHttpResponse, compressée en gzip si le client l'accepte : la mémoire utilisée et
+le délai avant le premier octet ne dépendent pas du nombre d'enregistrements.
+
+Deux formats :
+- JSON (défaut) : {"model": ..., "export_date": ..., "total_records": ..., "data": [...]},
+  relisible par l'import (voir core.utils.imports.iter_json_records) ;
+- NDJSON : un enregistrement JSON par ligne.
+"""
+from datetime import datetime
+import json
+import textwrap
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+ITERATOR_CHUNK_SIZE = 2000
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _json_chunks(model_name, records, total):
+    """Document JSON d'export (même mise en forme que l'export historique), morceau par morceau."""
+    header = json.dumps({
+        'model': model_name,
+        'export_date': datetime.now().isoformat(),
+        'total_records': total,
+    }, indent=2, ensure_ascii=False)
+    # Ouvrir la liste "data" à la place de l'accolade fermante
+    yield header[:-2] + ',\n  "data": ['
+    separator = '\n'
+    for record in records:
+        yield separator + textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), '    ')
+        separator = ',\n'
+    yield '\n  ]\n}' if separator != '\n' else ']\n}'
+
+
+def _ndjson_chunks(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def _buffered(chunks, size=OUTPUT_CHUNK_SIZE):
+    """Regroupe les morceaux de texte en blocs UTF-8 d'environ size octets."""
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(blocks):
+    """Compresse un flux de blocs au format gzip, bloc par bloc."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_filename(request, prefix):
+    """Nom du fichier d'export : <prefix>_YYMMDD.json (ou .ndjson avec ?format=ndjson)."""
+    extension = 'ndjson' if request.GET.get('format') == 'ndjson' else 'json'
+    return f"{prefix}_{datetime.now().strftime('%y%m%d')}.{extension}"
+
+
+def streaming_export_response(request, model_name, queryset, fields, transform, filename):
+    """
+    Construit la réponse d'export en flux d'un QuerySet.
+    Format NDJSON si ?format=ndjson, compression gzip si le client envoie Accept-Encoding: gzip.
+
+    Args:
+        request: Requête HTTP
+        model_name: Nom du modèle inscrit dans l'export JSON (ex: 'User')
+        queryset: QuerySet ordonné des lignes à exporter
+        fields: Champs lus par .values() (relations avec '__')
+        transform: Fonction convertissant un dictionnaire de .values() en enregistrement exporté
+        filename: Nom du fichier joint (voir export_filename)
+
+    Returns:
+        StreamingHttpResponse: Réponse en pièce jointe
+    """
+    ndjson = request.GET.get('format') == 'ndjson'
+    records = (transform(row) for row in queryset.values(*fields).iterator(chunk_size=ITERATOR_CHUNK_SIZE))
+    if ndjson:
+        chunks = _ndjson_chunks(records)
+    else:
+        # total_records précède les données : une requête COUNT au lieu de tout charger
+        chunks = _json_chunks(model_name, records, queryset.count())
+    blocks = _buffered(chunks)
+
+    gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(
+        _gzipped(blocks) if gzip else blocks,
+        content_type='application/x-ndjson; charset=utf-8' if ndjson else 'application/json; charset=utf-8'
+    )
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+USER_EXPORT_FIELDS = (
+    'id', 'matricule', 'nom', 'prenom', 'email', 'droits', 'service_id', 'service__code', 'actif',
+    'must_change_password', 'is_staff', 'is_superuser', 'created_at', 'updated_at', 'last_login',
+)
+
+
+def user_export_record(row):
+    """Enregistrement d'export d'un utilisateur (ligne .values() de USER_EXPORT_FIELDS)."""
+    return {
+        'id': row['id'],
+        'matricule': row['matricule'],
+        'nom': row['nom'],
+        'prenom': row['prenom'],
+        'email': row['email'] or None,
+        'droits': row['droits'],
+        'service_id': row['service_id'],
+        'service_code': row['service__code'],
+        'actif': row['actif'],
+        'must_change_password': row['must_change_password'],
+        'is_staff': row['is_staff'],
+        'is_superuser': row['is_superuser'],
+        'created_at': _iso(row['created_at']),
+        'updated_at': _iso(row['updated_at']),
+        'last_login': _iso(row['last_login']),
+    }
+
+
+SERVICE_EXPORT_FIELDS = ('id', 'nom', 'code', 'parent_id', 'parent__code', 'actif', 'created_at', 'updated_at')
+
+
+def service_export_record(row):
+    """Enregistrement d'export d'un service (ligne .values() de SERVICE_EXPORT_FIELDS)."""
+    return {
+        'id': row['id'],
+        'nom': row['nom'],
+        'code': row['code'],
+        'parent_id': row['parent_id'],
+        'parent_code': row['parent__code'],
+        'actif': row['actif'],
+        'created_at': _iso(row['created_at']),
+        'updated_at': _iso(row['updated_at']),
+    }
@@ -0,0 +1,422 @@
+"""
+Écriture et stockage de l'historique des modifications.
+Regroupe les entrées d'historique produites pendant une requête (signaux, validations...)
+et les écrit en un seul INSERT groupé à la fin de la requête (entrées validées uniquement).
+Fournit aussi les outils du stockage différentiel (instantanés périodiques, reconstruction).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from itertools import count
+import json
+import logging
+
+from django.db import DatabaseError, transaction
+
+from core.utils.server_timing import timed
+
+logger = logging.getLogger('core')
+
+# Tampon de la requête courante (une valeur par contexte : thread ou tâche asyncio)
+_current_buffer = ContextVar('historique_buffer', default=None)
+
+
+class HistoriqueBuffer:
+    """
+    Tampon des entrées d'historique d'une requête, écrit en un seul INSERT groupé
+    à la sortie de la portée.
+
+    Hors transaction (autocommit), une entrée est ajoutée directement au tampon.
+    Dans un bloc atomic, elle reste en attente jusqu'au commit de la transaction qui l'a
+    produite (transaction.on_commit) : une entrée produite dans une transaction ou un
+    savepoint annulé n'est jamais ajoutée au tampon.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._pending = {}
+        self._sequence = count()
+        # Entrées depuis le dernier instantané, par (objet_type, objet_id) (voir is_checkpoint_due)
+        self.since_checkpoint = {}
+
+    def enqueue(self, entry):
+        """Ajoute une entrée au tampon, ou programme son ajout au commit de la transaction courante."""
+        entry._historique_sequence = next(self._sequence)
+        if not transaction.get_connection().in_atomic_block:
+            self.entries.append(entry)
+        else:
+            self._pending[entry._historique_sequence] = entry
+            transaction.on_commit(partial(self._commit, entry))
+
+    def _commit(self, entry):
+        """Ajoute une entrée dont la transaction a été validée."""
+        self._pending.pop(entry._historique_sequence, None)
+        self.entries.append(entry)
+
+    def pending(self):
+        """
+        Retourne les entrées en attente du commit de leur transaction.
+        Hors transaction, les entrées encore en attente appartenaient à une transaction
+        annulée : elles sont abandonnées. Celles d'un savepoint annulé restent en attente
+        jusqu'à la fin de la transaction englobante.
+        """
+        if self._pending and not transaction.get_connection().in_atomic_block:
+            self._pending = {}
+        return list(self._pending.values())
+
+    def flush(self):
+        """
+        Écrit les entrées validées en un seul bulk_create, dans leur ordre d'enregistrement.
+        Si des entrées attendent encore le commit d'un bloc atomic englobant, un second
+        lot est écrit à ce commit.
+        """
+        if self.pending():
+            transaction.on_commit(self.flush)
+        self._write_checkpoint_counters()
+        entries, self.entries = self.entries, []
+        if not entries:
+            return []
+
+        from core.models.gaps import HistoriqueModification
+        entries.sort(key=lambda entry: entry._historique_sequence)
+        try:
+            with transaction.atomic():
+                return HistoriqueModification.objects.bulk_create(entries)
+        except DatabaseError:
+            # Repli ligne à ligne pour ne pas perdre tout le lot à cause d'une seule entrée
+            logger.exception("Échec de l'écriture groupée de l'historique, repli ligne à ligne")
+            saved = []
+            for entry in entries:
+                try:
+                    with transaction.atomic():
+                        entry.save(force_insert=True)
+                    saved.append(entry)
+                except DatabaseError:
+                    logger.exception("Entrée d'historique perdue : %s", entry.description[:100])
+            return saved
+
+
+    def _write_checkpoint_counters(self):
+        """Écrit les compteurs d'instantanés de la requête dans le cache partagé (une seule opération)."""
+        if not self.since_checkpoint:
+            return
+        from django.core.cache import cache
+        counters = {
+            _checkpoint_counter_key(objet_type, objet_id): since_checkpoint
+            for (objet_type, objet_id), since_checkpoint in self.since_checkpoint.items()
+        }
+        self.since_checkpoint = {}
+        with timed('cache'):
+            cache.set_many(counters, CHECKPOINT_COUNTER_TIMEOUT)
+
+
+def get_current_buffer():
+    """Retourne le tampon d'historique actif, ou None hors d'une portée de tampon."""
+    return _current_buffer.get()
+
+
+@contextmanager
+def historique_buffer(flush=True):
+    """
+    Portée de tampon d'historique (une requête, un import...).
+    Les entrées restantes sont écrites à la sortie de la portée.
+
+    Args:
+        flush: Si False, l'appelant écrit lui-même le tampon (ex: depuis du code async
+               via sync_to_async, les écritures en base étant interdites dans la boucle)
+    """
+    buffer = HistoriqueBuffer()
+    token = _current_buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _current_buffer.reset(token)
+        if flush:
+            buffer.flush()
+
+
+def enregistrer(entry):
+    """
+    Enregistre une entrée d'historique (instance non sauvegardée de HistoriqueModification).
+    Dans une portée de tampon, l'écriture est différée et groupée ; sinon elle est immédiate.
+    """
+    track_checkpoint(entry)
+    buffer = get_current_buffer()
+    if buffer is None:
+        entry.save(force_insert=True)
+    else:
+        buffer.enqueue(entry)
+    return entry
+
+
+# Objets dont la modification en cours a déjà été historisée explicitement
+_logged_objects = ContextVar('historique_logged_objects', default=frozenset())
+
+
+@contextmanager
+def historique_logged(instance):
+    """
+    Portée pendant laquelle les modifications de l'instance sont déjà historisées
+    par l'appelant (validation, changement de statut...) : les signaux génériques
+    n'enregistrent pas d'entrée en double pour cette instance.
+
+    Exemple:
+        with historique_logged(gap):
+            gap.save(update_fields=['status', 'updated_at'])
+    """
+    token = _logged_objects.set(_logged_objects.get() | {(instance._meta.label, instance.pk)})
+    try:
+        yield
+    finally:
+        _logged_objects.reset(token)
+
+
+def is_historique_logged(instance):
+    """Vérifie si la modification en cours de l'instance est déjà historisée (voir historique_logged)."""
+    return (instance._meta.label, instance.pk) in _logged_objects.get()
+
+
+# --- Stockage différentiel -------------------------------------------------------
+#
+# Les entrées de modification ne stockent que les champs modifiés (donnees_avant /
+# donnees_apres). Un instantané complet (« checkpoint ») est conservé à la création
+# puis toutes les HISTORIQUE_CHECKPOINT_INTERVAL entrées d'un même objet, ce qui
+# borne le nombre de différentiels à rejouer pour reconstruire un état.
+
+DEFAULT_CHECKPOINT_INTERVAL = 10
+
+
+def get_checkpoint_interval():
+    """Retourne l'intervalle (en nombre d'entrées) entre deux instantanés complets."""
+    from django.conf import settings
+    return max(1, getattr(settings, 'HISTORIQUE_CHECKPOINT_INTERVAL', DEFAULT_CHECKPOINT_INTERVAL))
+
+
+def is_full_snapshot(data):
+    """Un instantané complet contient toujours la clé primaire, jamais un différentiel."""
+    return isinstance(data, dict) and 'id' in data
+
+
+def diff_snapshots(avant, apres):
+    """
+    Calcule le différentiel entre deux états sérialisés.
+
+    Returns:
+        tuple: (valeurs avant, valeurs après) des seuls champs modifiés
+    """
+    avant = avant or {}
+    apres = apres or {}
+    changed = [key for key in apres if avant.get(key) != apres[key]]
+    return {key: avant.get(key) for key in changed}, {key: apres[key] for key in changed}
+
+
+# Nombre d'entrées depuis le dernier instantané de chaque objet, tenu à jour en cache partagé
+# (écrit à la fin de la requête) : la décision d'instantané ne coûte une requête SQL
+# que si le compteur est absent du cache. Le tag est invalidé quand l'historique est
+# supprimé ou réécrit en masse.
+CHECKPOINT_COUNTER_TAG = 'historique_checkpoints'
+CHECKPOINT_COUNTER_TIMEOUT = 7 * 24 * 3600
+
+
+def _checkpoint_counter_key(objet_type, objet_id):
+    from core.utils.cache import tagged_cache_key
+    return tagged_cache_key(f"historique:depuis_checkpoint:{objet_type}:{objet_id}", [CHECKPOINT_COUNTER_TAG])
+
+
+def _count_since_checkpoint(objet_type, objet_id, interval):
+    """
+    Compte en base les entrées d'un objet depuis son dernier instantané complet.
+    Retourne interval si aucun instantané n'est récent.
+    """
+    from core.models.gaps import HistoriqueModification
+    recent = HistoriqueModification.objects.filter(
+        objet_type=objet_type,
+        objet_id=objet_id
+    ).order_by('-created_at', '-id').values_list('est_checkpoint', flat=True)[:interval]
+    since_checkpoint = 0
+    for est_checkpoint in recent:
+        if est_checkpoint:
+            return since_checkpoint
+        since_checkpoint += 1
+    return interval
+
+
+def _since_checkpoint(objet_type, objet_id, buffer):
+    """
+    Nombre d'entrées d'un objet depuis son dernier instantané : tampon de la requête
+    (entrées pas encore écrites comprises), puis cache partagé, puis base.
+    """
+    key = (objet_type, objet_id)
+    if buffer is not None and key in buffer.since_checkpoint:
+        return buffer.since_checkpoint[key]
+
+    from django.core.cache import cache
+    cache_key = _checkpoint_counter_key(objet_type, objet_id)
+    with timed('cache'):
+        since_checkpoint = cache.get(cache_key)
+    if since_checkpoint is None:
+        since_checkpoint = _count_since_checkpoint(objet_type, objet_id, get_checkpoint_interval())
+        with timed('cache'):
+            cache.set(cache_key, since_checkpoint, CHECKPOINT_COUNTER_TIMEOUT)
+    if buffer is not None:
+        buffer.since_checkpoint[key] = since_checkpoint
+    return since_checkpoint
+
+
+def track_checkpoint(entry):
+    """Met à jour le compteur d'entrées depuis le dernier instantané pour une nouvelle entrée."""
+    buffer = get_current_buffer()
+    if entry.est_checkpoint or is_full_snapshot(entry.donnees_apres):
+        since_checkpoint = 0
+    else:
+        since_checkpoint = _since_checkpoint(entry.objet_type, entry.objet_id, buffer) + 1
+
+    if buffer is not None:
+        # Écrit dans le cache partagé avec le tampon (voir HistoriqueBuffer.flush)
+        buffer.since_checkpoint[(entry.objet_type, entry.objet_id)] = since_checkpoint
+    else:
+        from django.core.cache import cache
+        with timed('cache'):
+            cache.set(_checkpoint_counter_key(entry.objet_type, entry.objet_id), since_checkpoint,
+                      CHECKPOINT_COUNTER_TIMEOUT)
+
+
+def invalidate_checkpoint_counters():
+    """Invalide tous les compteurs d'instantanés (historique supprimé ou réécrit en masse)."""
+    from core.utils.cache import invalidate_tags
+    invalidate_tags(CHECKPOINT_COUNTER_TAG)
+
+
+def is_checkpoint_due(objet_type, objet_id):
+    """
+    Détermine si la prochaine entrée d'un objet doit être un instantané complet.
+    Tient compte des entrées encore en attente dans le tampon de la requête ; sans
+    requête SQL si le compteur de l'objet est en cache.
+    """
+    since_checkpoint = _since_checkpoint(objet_type, objet_id, get_current_buffer())
+    return since_checkpoint + 1 >= get_checkpoint_interval()
+
+
+def replay_entries(entries):
+    """
+    Reconstruit un état à partir d'entrées ordonnées chronologiquement,
+    la première devant être un instantané complet (ou une suppression).
+
+    Returns:
+        dict: État sérialisé de l'objet, ou None s'il n'existe pas à ce point
+    """
+    state = None
+    for entry in entries:
+        if entry.action == 'suppression':
+            state = None
+        elif is_full_snapshot(entry.donnees_apres):
+            state = dict(entry.donnees_apres)
+        elif state is not None and isinstance(entry.donnees_apres, dict):
+            # Seuls les champs du modèle sont rejoués (ignore 'validated_by', 'level'...)
+            state.update({key: value for key, value in entry.donnees_apres.items() if key in state})
+    return state
+
+
+def compress_object_history(entries, interval=None):
+    """
+    Convertit l'historique d'un objet stocké en instantanés complets vers le format
+    différentiel avec instantanés périodiques.
+
+    Args:
+        entries: Entrées de l'objet, ordonnées chronologiquement
+        interval: Intervalle entre deux instantanés (défaut: réglage du projet)
+
+    Returns:
+        list: Entrées modifiées (à sauvegarder)
+    """
+    interval = interval or get_checkpoint_interval()
+    changed = []
+    state = None
+    since_checkpoint = 0
+
+    for entry in entries:
+        if entry.action == 'suppression':
+            # L'état avant suppression reste complet : c'est la dernière trace de l'objet
+            state = None
+            continue
+
+        if not is_full_snapshot(entry.donnees_apres):
+            # Différentiel déjà compact (validation, ajout/retrait...) : le rejouer
+            if state is not None and isinstance(entry.donnees_apres, dict):
+                state.update({key: value for key, value in entry.donnees_apres.items() if key in state})
+            since_checkpoint += 1
+            continue
+
+        snapshot = entry.donnees_apres
+        avant_source = entry.donnees_avant if is_full_snapshot(entry.donnees_avant) else state
+        if state is None or since_checkpoint + 1 >= interval:
+            entry.est_checkpoint = True
+            if avant_source is not None:
+                avant, _apres = diff_snapshots(avant_source, snapshot)
+                entry.donnees_avant = avant or None
+            since_checkpoint = 0
+        else:
+            avant, apres = diff_snapshots(avant_source, snapshot)
+            entry.donnees_avant = avant or None
+            entry.donnees_apres = apres or None
+            since_checkpoint += 1
+
+        state = dict(snapshot)
+        changed.append(entry)
+
+    return changed
+
+
+def _payload_size(entry):
+    """Taille approximative (octets) des données JSON d'une entrée d'historique."""
+    return len(json.dumps(entry.donnees_avant).encode()) + len(json.dumps(entry.donnees_apres).encode())
+
+
+def compress_historique(queryset, batch_size=500, interval=None, dry_run=False):
+    """
+    Compresse l'historique existant (instantanés complets) au format différentiel.
+    Les objets sont traités un par un, leurs entrées réécrites par lots.
+
+    Args:
+        queryset: QuerySet d'entrées d'historique à considérer
+        batch_size: Nombre d'entrées par lot de mise à jour
+        interval: Intervalle entre deux instantanés (défaut: réglage du projet)
+        dry_run: Si True, calcule les statistiques sans rien écrire
+
+    Returns:
+        dict: Statistiques (objets traités, entrées compressées, octets avant/après)
+    """
+    stats = {'objects': 0, 'compressed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    batch = []
+
+    def write(batch):
+        if batch and not dry_run:
+            with transaction.atomic():
+                queryset.model.objects.bulk_update(
+                    batch, ['donnees_avant', 'donnees_apres', 'est_checkpoint'], batch_size=batch_size
+                )
+
+    objets = queryset.filter(
+        est_checkpoint=False,
+        donnees_apres__has_key='id'
+    ).exclude(action='suppression').values_list('objet_type', 'objet_id').distinct().order_by('objet_type', 'objet_id')
+
+    for objet_type, objet_id in objets.iterator(chunk_size=batch_size):
+        entries = list(queryset.filter(objet_type=objet_type, objet_id=objet_id).order_by('created_at', 'id'))
+        sizes = {entry.pk: _payload_size(entry) for entry in entries}
+
+        stats['objects'] += 1
+        for entry in compress_object_history(entries, interval):
+            stats['compressed'] += 1
+            stats['bytes_before'] += sizes[entry.pk]
+            stats['bytes_after'] += _payload_size(entry)
+            batch.append(entry)
+
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+
+    write(batch)
+    if not dry_run and stats['compressed']:
+        invalidate_checkpoint_counters()
+    return stats
@@ -0,0 +1,345 @@
+"""
+Archivage de l'historique des modifications.
+Déplace l'historique des déclarations closes ou anciennes de la table HistoriqueModification
+vers des segments compressés (HistoriqueArchive, un segment par déclaration et par archivage),
+et fournit un accès transparent : les entrées récentes sont lues dans la table,
+les plus anciennes dans l'archive.
+"""
+from datetime import timedelta
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.utils.pagination import decode_cursor, encode_cursor, keyset_paginate
+
+# Délais par défaut avant archivage (en jours depuis la dernière entrée d'historique)
+DEFAULT_ARCHIVE_AGE_DAYS = 365
+DEFAULT_ARCHIVE_CLOSED_DAYS = 90
+
+# Statuts d'écart pour lesquels une déclaration est considérée comme terminée
+FINAL_GAP_STATUSES = ('closed', 'rejected', 'cancelled')
+
+# Colonnes conservées dans les segments
+ARCHIVE_FIELDS = (
+    'id', 'gap_report_id', 'gap_id', 'action', 'objet_type', 'objet_id', 'objet_repr',
+    'utilisateur_id', 'description', 'donnees_avant', 'donnees_apres', 'est_checkpoint',
+    'created_at', 'updated_at',
+)
+
+
+def get_archive_delays():
+    """
+    Retourne les délais d'archivage configurés.
+
+    Returns:
+        tuple: (jours pour toute déclaration, jours pour une déclaration terminée)
+    """
+    return (
+        getattr(settings, 'HISTORIQUE_ARCHIVE_AGE_DAYS', DEFAULT_ARCHIVE_AGE_DAYS),
+        getattr(settings, 'HISTORIQUE_ARCHIVE_CLOSED_DAYS', DEFAULT_ARCHIVE_CLOSED_DAYS),
+    )
+
+
+def encode_entries(rows):
+    """
+    Compresse une liste d'entrées (dictionnaires de colonnes) en segment binaire.
+    Les horodatages sont conservés à la microseconde (DjangoJSONEncoder les tronque).
+    """
+    rows = [
+        {**row, 'created_at': row['created_at'].isoformat(), 'updated_at': row['updated_at'].isoformat()}
+        for row in rows
+    ]
+    return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder, separators=(',', ':')).encode(), 9)
+
+
+def decode_segment(segment):
+    """
+    Décompresse un segment d'archive.
+
+    Returns:
+        list: Instances non sauvegardées de HistoriqueModification, des plus récentes aux plus anciennes
+    """
+    from core.models.gaps import HistoriqueModification
+
+    rows = json.loads(zlib.decompress(bytes(segment.donnees)))
+    entries = []
+    for row in reversed(rows):
+        row['created_at'] = parse_datetime(row['created_at'])
+        row['updated_at'] = parse_datetime(row['updated_at'])
+        entry = HistoriqueModification(**row)
+        entry._state.adding = False
+        entry.est_archive = True
+        entries.append(entry)
+    return entries
+
+
+def find_archivable_reports(age_days=None, closed_days=None):
+    """
+    Sélectionne les déclarations dont l'historique peut être archivé : dernière entrée plus
+    ancienne que age_days, ou plus ancienne que closed_days si tous ses écarts sont terminés.
+
+    Returns:
+        QuerySet: IDs des déclarations (values_list)
+    """
+    from core.models.gaps import GapReport
+
+    default_age, default_closed = get_archive_delays()
+    now = timezone.now()
+    age_cutoff = now - timedelta(days=default_age if age_days is None else age_days)
+    closed_cutoff = now - timedelta(days=default_closed if closed_days is None else closed_days)
+
+    return GapReport.objects.annotate(
+        last_activity=Max('historique_modifications__created_at'),
+        open_gaps=Count('gaps', filter=~Q(gaps__status__in=FINAL_GAP_STATUSES), distinct=True),
+    ).filter(
+        Q(last_activity__lt=age_cutoff) | Q(last_activity__lt=closed_cutoff, open_gaps=0)
+    ).order_by('pk').values_list('pk', flat=True)
+
+
+def archive_gap_report(gap_report_id, dry_run=False):
+    """
+    Déplace l'historique d'une déclaration vers un nouveau segment d'archive.
+
+    Returns:
+        dict: Statistiques (entrées, octets JSON, octets compressés)
+    """
+    from core.models.gaps import HistoriqueArchive, HistoriqueModification
+
+    with transaction.atomic():
+        hot = HistoriqueModification.objects.select_for_update().filter(gap_report_id=gap_report_id)
+        rows = list(hot.order_by('created_at', 'id').values(*ARCHIVE_FIELDS))
+        if not rows:
+            return {'entries': 0, 'bytes_json': 0, 'bytes_compressed': 0}
+
+        donnees = encode_entries(rows)
+        stats = {
+            'entries': len(rows),
+            'bytes_json': len(json.dumps(rows, cls=DjangoJSONEncoder).encode()),
+            'bytes_compressed': len(donnees),
+        }
+        if dry_run:
+            return stats
+
+        HistoriqueArchive.objects.create(
+            gap_report_id=gap_report_id,
+            gap_ids=sorted({row['gap_id'] for row in rows if row['gap_id']}),
+            date_debut=rows[0]['created_at'],
+            date_fin=rows[-1]['created_at'],
+            nombre_entrees=len(rows),
+            donnees=donnees,
+        )
+        HistoriqueModification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return stats
+
+
+def archiver_historique(age_days=None, closed_days=None, limit=None, dry_run=False):
+    """
+    Archive l'historique des déclarations closes ou anciennes (une transaction par déclaration).
+
+    Args:
+        age_days: Ancienneté minimale de la dernière entrée (défaut: HISTORIQUE_ARCHIVE_AGE_DAYS)
+        closed_days: Ancienneté minimale si tous les écarts sont terminés (défaut: HISTORIQUE_ARCHIVE_CLOSED_DAYS)
+        limit: Nombre maximum de déclarations à traiter
+        dry_run: Si True, calcule les statistiques sans rien déplacer
+
+    Returns:
+        dict: Statistiques (déclarations, entrées, octets JSON, octets compressés)
+    """
+    stats = {'reports': 0, 'entries': 0, 'bytes_json': 0, 'bytes_compressed': 0}
+    report_ids = find_archivable_reports(age_days, closed_days)
+    if limit:
+        report_ids = report_ids[:limit]
+
+    for gap_report_id in list(report_ids):
+        report_stats = archive_gap_report(gap_report_id, dry_run=dry_run)
+        if not report_stats['entries']:
+            continue
+        stats['reports'] += 1
+        for key in ('entries', 'bytes_json', 'bytes_compressed'):
+            stats[key] += report_stats[key]
+    return stats
+
+
+def historique_querysets(gap_report=None, gap=None, objet_type=None, objet_id=None,
+                        utilisateur=None, action=None, date_from=None, date_to=None):
+    """
+    Construit les requêtes du fil d'historique. Un OR entre colonnes indexées séparément
+    empêche l'usage des index : les critères d'objet sont donc exprimés en plusieurs
+    branches, combinées par UNION (voir keyset_paginate).
+
+    Args:
+        gap_report: Déclaration (ses entrées, celles de ses écarts et sa suppression)
+        gap: Écart (ses entrées et celles de sa déclaration, comme la page de détail)
+        objet_type, objet_id: Objet quelconque de l'historique
+        utilisateur: Auteur des modifications
+        action: Type d'action
+        date_from, date_to: Bornes de date (incluse, exclue)
+
+    Returns:
+        list: QuerySets à combiner
+    """
+    from core.models import HistoriqueModification
+
+    base = HistoriqueModification.objects.all()
+    if utilisateur is not None:
+        base = base.filter(utilisateur=utilisateur)
+    if action:
+        base = base.filter(action=action)
+    if date_from:
+        base = base.filter(created_at__gte=date_from)
+    if date_to:
+        base = base.filter(created_at__lt=date_to)
+
+    if gap is not None:
+        return [base.filter(gap=gap), base.filter(gap_report_id=gap.gap_report_id)]
+    if gap_report is not None:
+        return [base.filter(gap_report=gap_report), base.filter(objet_type='gap_report', objet_id=gap_report.pk)]
+    if objet_type and objet_id:
+        return [base.filter(objet_type=objet_type, objet_id=objet_id)]
+    return [base]
+
+
+def _archive_matches(entry, utilisateur=None, action=None, date_from=None, date_to=None, **_objet):
+    """Applique aux entrées archivées les filtres de historique_querysets."""
+    return (
+        (utilisateur is None or entry.utilisateur_id == getattr(utilisateur, 'pk', utilisateur))
+        and (not action or entry.action == action)
+        and (not date_from or entry.created_at >= date_from)
+        and (not date_to or entry.created_at < date_to)
+    )
+
+
+def historique_timeline(cursor=None, per_page=25, **filters):
+    """
+    Page du fil d'historique, paginée par curseur sur (created_at, id).
+    Pour une déclaration ou un écart, la pagination se poursuit dans l'archive
+    une fois la table épuisée (les entrées archivées sont toujours plus anciennes).
+
+    Args:
+        cursor: Curseur de la page précédente (None pour la première page)
+        per_page: Nombre d'entrées par page (maximum 100)
+        **filters: Filtres de historique_querysets
+
+    Returns:
+        tuple: (entrées, curseur de la page suivante ou None) ; les entrées
+        archivées ont l'attribut est_archive=True
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    from core.models import HistoriqueArchive, User
+
+    per_page = max(1, min(per_page, 100))
+    entries, next_cursor = keyset_paginate(historique_querysets(**filters), cursor, per_page)
+    prefetch_related_objects(entries, 'utilisateur')
+
+    gap = filters.get('gap')
+    gap_report = filters.get('gap_report')
+    gap_report_id = gap.gap_report_id if gap is not None else getattr(gap_report, 'pk', None)
+    if next_cursor is not None or gap_report_id is None:
+        return entries, next_cursor
+
+    # Table épuisée : poursuivre dans les segments d'archive de la déclaration
+    if entries:
+        position = (entries[-1].created_at, entries[-1].pk)
+    else:
+        position = decode_cursor(cursor) if cursor else None
+
+    archived = []
+    segments = HistoriqueArchive.objects.filter(gap_report_id=gap_report_id).order_by('-date_fin')
+    for segment in segments.iterator(chunk_size=10):
+        if position and segment.date_debut > position[0]:
+            continue
+        for entry in segment.get_entrees():
+            if position and (entry.created_at, entry.pk) >= position:
+                continue
+            if _archive_matches(entry, **filters):
+                archived.append(entry)
+        if len(entries) + len(archived) > per_page:
+            break
+
+    archived = archived[:per_page + 1 - len(entries)]
+    users = User.objects.in_bulk({entry.utilisateur_id for entry in archived})
+    for entry in archived:
+        entry.utilisateur = users.get(entry.utilisateur_id)
+
+    entries += archived
+    if len(entries) > per_page:
+        entries = entries[:per_page]
+        next_cursor = encode_cursor(entries[-1].created_at, entries[-1].pk)
+    return entries, next_cursor
+
+
+def historique_objet_archive(objet_type, objet_id, gap_report_id, position=None):
+    """
+    Parcourt les entrées archivées d'un objet, des plus récentes aux plus anciennes.
+    Les segments ne sont décompressés qu'à la demande (générateur).
+
+    Args:
+        objet_type, objet_id: Objet de l'historique
+        gap_report_id: Déclaration dont les segments contiennent l'objet
+        position: (created_at, id) de la dernière entrée incluse (None pour toutes)
+
+    Yields:
+        HistoriqueModification: Entrées archivées (est_archive=True)
+    """
+    from core.models import HistoriqueArchive
+
+    if gap_report_id is None:
+        return
+    segments = HistoriqueArchive.objects.filter(gap_report_id=gap_report_id).order_by('-date_fin')
+    for segment in segments.iterator(chunk_size=10):
+        if position and segment.date_debut > position[0]:
+            continue
+        for entry in segment.get_entrees():
+            if entry.objet_type != objet_type or entry.objet_id != objet_id:
+                continue
+            if position and (entry.created_at, entry.pk) > position:
+                continue
+            yield entry
+
+
+def entree_archivee(gap_report_id, pk):
+    """
+    Recherche une entrée d'historique dans les segments d'archive d'une déclaration.
+
+    Returns:
+        HistoriqueModification: Entrée archivée, ou None si elle est introuvable
+    """
+    from core.models import HistoriqueArchive
+
+    if gap_report_id is None:
+        return None
+    segments = HistoriqueArchive.objects.filter(gap_report_id=gap_report_id).order_by('-date_fin')
+    for segment in segments.iterator(chunk_size=10):
+        for entry in segment.get_entrees():
+            if entry.pk == pk:
+                return entry
+    return None
+
+
+def historique_recent(gap_report, gap=None, limit=10):
+    """
+    Retourne les entrées d'historique les plus récentes d'une déclaration (ou d'un écart et de
+    sa déclaration), en complétant si besoin avec les segments d'archive.
+
+    Args:
+        gap_report: Déclaration concernée
+        gap: Écart concerné (optionnel)
+        limit: Nombre maximum d'entrées (maximum 100)
+
+    Returns:
+        list: Entrées des plus récentes aux plus anciennes ; les entrées archivées
+        ont l'attribut est_archive=True
+    """
+    if gap is not None:
+        entries, _next_cursor = historique_timeline(gap=gap, per_page=limit)
+    else:
+        entries, _next_cursor = historique_timeline(gap_report=gap_report, per_page=limit)
+    return entries
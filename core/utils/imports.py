@@ -0,0 +1,732 @@
+"""
+Import en masse des données de référence depuis les fichiers JSON d'export.
+Le fichier est lu en flux (enregistrement par enregistrement, sans charger tout son contenu),
+les enregistrements sont validés par lots hors transaction, puis écrits par opérations groupées
+dans une transaction courte. Les erreurs sont rapportées ligne par ligne.
+
+Deux modes :
+- remplacement (import_users) : la table est vidée puis recréée ;
+- synchronisation (sync_users, sync_services) : les différences avec la base sont calculées en
+  mémoire (clé : matricule ou code) et seules les créations, modifications et désactivations
+  sont appliquées. En simulation (dry_run), elles sont appliquées puis annulées pour mesurer
+  la durée d'écriture attendue.
+"""
+import codecs
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+# Mot de passe attribué aux utilisateurs importés (à changer à la première connexion)
+DEFAULT_IMPORT_PASSWORD = 'azerty'
+
+DEFAULT_BATCH_SIZE = 500
+READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+class ImportFileError(ValueError):
+    """Fichier d'import illisible ou de structure invalide."""
+
+
+class _JSONStream:
+    """Lecture incrémentale d'un fichier JSON (UTF-8) : tampon de texte rempli à la demande."""
+
+    def __init__(self, fileobj, chunk_size=READ_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Ajoute un bloc au tampon ; retourne False en fin de fichier."""
+        if self.eof:
+            return False
+        chunk = self.fileobj.read(self.chunk_size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        try:
+            text = self.decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise ImportFileError(f"Le fichier n'est pas encodé en UTF-8 : {e}") from e
+        # Le tampon ne conserve que la partie non encore lue
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        self.eof = not chunk
+        return True
+
+    def peek(self):
+        """Retourne le prochain caractère significatif (None en fin de fichier)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ImportFileError(f"Structure JSON invalide : '{char}' attendu (position {self.pos}).")
+        self.pos += 1
+
+    def value(self):
+        """Décode la valeur JSON suivante, en complétant le tampon si elle est incomplète."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise ImportFileError(f"Fichier JSON invalide : {e}") from e
+            # Un nombre en fin de tampon peut être tronqué : attendre le caractère suivant
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_records(fileobj, key='data', chunk_size=READ_CHUNK_SIZE):
+    """
+    Parcourt en flux les enregistrements d'un fichier d'export ({"model": ..., "data": [...]}).
+    Seul l'enregistrement en cours est gardé en mémoire.
+
+    Args:
+        fileobj: Fichier ouvert en lecture (binaire ou texte), ex: request.FILES['json_file']
+        key: Clé de la liste des enregistrements
+        chunk_size: Taille des blocs lus
+
+    Yields:
+        dict: Enregistrements, dans l'ordre du fichier
+
+    Raises:
+        ImportFileError: Fichier invalide ou sans clé key
+    """
+    stream = _JSONStream(fileobj, chunk_size)
+    stream.expect('{')
+    if stream.peek() == '}':
+        raise ImportFileError(f'Structure de fichier JSON invalide. Le fichier doit contenir une clé "{key}".')
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name != key:
+            stream.value()
+        else:
+            if stream.peek() != '[':
+                raise ImportFileError(f'La clé "{key}" doit contenir une liste.')
+            stream.expect('[')
+            if stream.peek() == ']':
+                return
+            while True:
+                yield stream.value()
+                if stream.peek() == ']':
+                    return
+                stream.expect(',')
+        if stream.peek() == '}':
+            raise ImportFileError(f'Structure de fichier JSON invalide. Le fichier doit contenir une clé "{key}".')
+        stream.expect(',')
+
+
+def _batches(iterable, size):
+    """Découpe un itérable en listes de size éléments."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ImportResult:
+    """Bilan d'un import : compteurs, erreurs par ligne et durées par étape."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.deactivated = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.errors = []
+        self.changes = []
+        self.timings = {}
+        self.dry_run = False
+        self.aborted = False
+
+    def add_error(self, row, identifier, message):
+        self.errors.append({'row': row, 'identifier': identifier, 'message': message})
+
+    def add_change(self, action, identifier, details=''):
+        """Enregistre une ligne du différentiel ('+' création, '~' modification, '-' désactivation)."""
+        self.changes.append(f"{action} {identifier}" + (f" : {details}" if details else ''))
+
+    def summary(self):
+        """Bilan d'une synchronisation en une ligne."""
+        return (
+            f"{self.created} création(s), {self.updated} modification(s), {self.deactivated} désactivation(s), "
+            f"{self.unchanged} inchangé(s), {len(self.errors)} ligne(s) en erreur"
+        )
+
+    def format_errors(self, limit=None):
+        """Erreurs lisibles ('Ligne 12 (A1234) : ...'), au plus limit."""
+        return [
+            f"Ligne {error['row']} ({error['identifier'] or 'N/A'}) : {error['message']}"
+            for error in self.errors[:limit]
+        ]
+
+
+def _validation_message(error):
+    """Message d'une ValidationError, préfixé par les champs en erreur."""
+    if hasattr(error, 'message_dict'):
+        return ' ; '.join(f"{field}: {', '.join(messages)}" for field, messages in error.message_dict.items())
+    return ' ; '.join(error.messages)
+
+
+def _matricule(record):
+    """Matricule d'un enregistrement, en majuscules comme à l'enregistrement (User.clean)."""
+    matricule = record.get('matricule')
+    return matricule.upper() if isinstance(matricule, str) else matricule
+
+
+def _resolve_services(batch, services):
+    """Complète services ({code: Service ou None}) avec les codes du lot : une requête par lot."""
+    from core.models import Service
+
+    codes = {record.get('service_code') for record in batch if isinstance(record, dict)} - set(services) - {None, ''}
+    if codes:
+        found = Service.objects.in_bulk(codes, field_name='code')
+        services.update({code: found.get(code) for code in codes})
+
+
+def import_users(records, exclude_user=None, batch_size=DEFAULT_BATCH_SIZE, progress=None, ignore_errors=False):
+    """
+    Remplace les utilisateurs par ceux des enregistrements (import destructif).
+    Le mot de passe par défaut est haché une seule fois et les services sont résolus
+    par lots (in_bulk sur le code). Toutes les lignes sont validées avant toute écriture :
+    si une ligne est invalide, rien n'est écrit (sauf ignore_errors) et les erreurs sont rapportées.
+
+    Args:
+        records: Itérable d'enregistrements (voir iter_json_records)
+        exclude_user: Utilisateur conservé tel quel (l'utilisateur qui importe)
+        batch_size: Taille des lots de validation et d'insertion
+        progress: Fonction appelée après chaque lot avec (lignes lues, ImportResult)
+        ignore_errors: Si True, importe les lignes valides malgré les lignes en erreur
+            (les utilisateurs des lignes invalides sont alors supprimés)
+
+    Returns:
+        ImportResult: Bilan de l'import (aborted si rien n'a été écrit)
+    """
+    User = get_user_model()
+
+    result = ImportResult()
+    start = time.monotonic()
+    password = make_password(DEFAULT_IMPORT_PASSWORD)
+    result.timings['hash'] = time.monotonic() - start
+
+    services = {}
+    matricules = set()
+    users = []
+
+    start = time.monotonic()
+    for batch in _batches(records, batch_size):
+        _resolve_services(batch, services)
+
+        for record in batch:
+            result.rows += 1
+            if not isinstance(record, dict):
+                result.add_error(result.rows, None, "Enregistrement invalide (objet JSON attendu).")
+                continue
+            matricule = _matricule(record)
+            if exclude_user is not None and (record.get('id') == exclude_user.pk or matricule == exclude_user.matricule):
+                result.skipped += 1
+                continue
+            if matricule in matricules:
+                result.add_error(result.rows, matricule, "Matricule en double dans le fichier.")
+                continue
+
+            user = User(
+                matricule=matricule,
+                nom=record.get('nom', ''),
+                prenom=record.get('prenom', ''),
+                email=record.get('email') or '',
+                droits=record.get('droits', User.USER),
+                # Un service inconnu est ignoré, comme à l'import historique
+                service=services.get(record.get('service_code')),
+                must_change_password=True,  # Toujours True pour les imports
+                is_staff=record.get('is_staff', False),
+                is_superuser=record.get('is_superuser', False),
+                password=password,
+            )
+            # bulk_create n'appelle pas save()
+            user.apply_droits_flags()
+            try:
+                # Unicité contrôlée sur le fichier (la table est vidée) et service issu d'in_bulk :
+                # aucune requête par ligne
+                user.full_clean(exclude=['service'], validate_unique=False)
+            except ValidationError as e:
+                result.add_error(result.rows, matricule, _validation_message(e))
+                continue
+            matricules.add(matricule)
+            users.append(user)
+
+        if progress:
+            progress(result.rows, result)
+    result.timings['validation'] = time.monotonic() - start
+
+    if result.errors and not ignore_errors:
+        # Import tout ou rien : la table n'est pas vidée pour un fichier partiellement invalide
+        result.aborted = True
+        return result
+
+    # Écriture dans une transaction courte : tout le travail coûteux est déjà fait
+    start = time.monotonic()
+    with transaction.atomic():
+        existing_users = User.objects.all()
+        if exclude_user is not None:
+            existing_users = existing_users.exclude(pk=exclude_user.pk)
+        result.deleted = existing_users.count()
+        existing_users.delete()
+        User.objects.bulk_create(users, batch_size=batch_size)
+        result.created = len(users)
+    result.timings['write'] = time.monotonic() - start
+    return result
+
+
+# --- Synchronisation (import non destructif) ---------------------------------------
+
+def _format_value(value):
+    if value is None or value == '':
+        return "∅"
+    return str(value) if isinstance(value, models.Model) else repr(value)
+
+
+def _differs(old, new):
+    """Compare deux valeurs de champ (None et chaîne vide sont équivalents)."""
+    if old in (None, '') and new in (None, ''):
+        return False
+    return old != new
+
+
+def _describe_changes(changes):
+    return ', '.join(f"{field}: {_format_value(old)} -> {_format_value(new)}" for field, (old, new) in changes.items())
+
+
+def _apply_in_transaction(result, dry_run, write):
+    """
+    Exécute write() dans une transaction, annulée en simulation (durée d'écriture mesurée).
+    Les invalidations de cache doivent être enregistrées par transaction.on_commit.
+    """
+    result.dry_run = dry_run
+    start = time.monotonic()
+    with transaction.atomic():
+        write()
+        if dry_run:
+            transaction.set_rollback(True)
+    result.timings['write'] = time.monotonic() - start
+
+
+def sync_users(records, exclude_user=None, deactivate_missing=True, dry_run=False,
+               batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Synchronise les utilisateurs avec les enregistrements, par matricule (import non destructif).
+    Les nouveaux utilisateurs reçoivent le mot de passe par défaut ; les mots de passe des
+    utilisateurs existants ne sont pas modifiés. Les utilisateurs absents du fichier sont
+    désactivés (jamais supprimés : historique et rôles de validateur conservés).
+
+    Args:
+        records: Itérable d'enregistrements (voir iter_json_records)
+        exclude_user: Utilisateur laissé tel quel (l'utilisateur qui importe)
+        deactivate_missing: Désactiver les utilisateurs actifs absents du fichier
+        dry_run: Calculer et chronométrer les changements sans les conserver
+        batch_size: Taille des lots de validation et d'écriture
+        progress: Fonction appelée après chaque lot avec (lignes lues, ImportResult)
+
+    Returns:
+        ImportResult: Bilan et différentiel (result.changes)
+    """
+    from core.utils.cache import invalidate_user_cache, invalidate_reference_data_cache
+    User = get_user_model()
+    fields = ('nom', 'prenom', 'email', 'droits', 'service', 'is_staff', 'is_superuser', 'actif')
+
+    result = ImportResult()
+    start = time.monotonic()
+    existing = {user.matricule: user for user in User.objects.select_related('service')}
+    password = make_password(DEFAULT_IMPORT_PASSWORD)
+    services = {}
+    seen = set()
+    creates, updates, updated_fields = [], [], set()
+
+    for batch in _batches(records, batch_size):
+        _resolve_services(batch, services)
+        for record in batch:
+            result.rows += 1
+            if not isinstance(record, dict):
+                result.add_error(result.rows, None, "Enregistrement invalide (objet JSON attendu).")
+                continue
+            matricule = _matricule(record)
+            if exclude_user is not None and matricule == exclude_user.matricule:
+                result.skipped += 1
+                seen.add(matricule)
+                continue
+            if matricule in seen:
+                result.add_error(result.rows, matricule, "Matricule en double dans le fichier.")
+                continue
+            # Une ligne en erreur ne désactive pas l'utilisateur existant
+            seen.add(matricule)
+            service_code = record.get('service_code')
+            if service_code and services.get(service_code) is None:
+                # Une affectation inconnue ne doit pas retirer le service d'un utilisateur existant
+                result.add_error(result.rows, matricule, f"Service inconnu : {service_code}.")
+                continue
+
+            values = {
+                'nom': record.get('nom', ''),
+                'prenom': record.get('prenom', ''),
+                'email': record.get('email') or '',
+                'droits': record.get('droits', User.USER),
+                'service': services.get(service_code),
+                'actif': record.get('actif', True),
+            }
+            user = existing.get(matricule)
+            if user is None:
+                user = User(matricule=matricule, must_change_password=True, password=password, **values)
+                user.apply_droits_flags()
+                before = None
+            else:
+                before = {field: getattr(user, field) for field in fields}
+                for field, value in values.items():
+                    setattr(user, field, value)
+                user.apply_droits_flags()
+            try:
+                # Matricules contrôlés en mémoire, service issu d'in_bulk : aucune requête par ligne
+                user.full_clean(exclude=['service'], validate_unique=False)
+            except ValidationError as e:
+                if before is not None:
+                    for field, value in before.items():
+                        setattr(user, field, value)
+                result.add_error(result.rows, matricule, _validation_message(e))
+                continue
+
+            if before is None:
+                creates.append(user)
+                result.add_change('+', matricule, user.get_full_name())
+                continue
+            changes = {field: (before[field], getattr(user, field)) for field in fields
+                       if _differs(before[field], getattr(user, field))}
+            if changes:
+                updates.append(user)
+                updated_fields.update(changes)
+                result.add_change('~', matricule, _describe_changes(changes))
+            else:
+                result.unchanged += 1
+        if progress:
+            progress(result.rows, result)
+
+    deactivations = [
+        user for matricule, user in existing.items()
+        if deactivate_missing and matricule not in seen and user.actif
+        and (exclude_user is None or user.pk != exclude_user.pk)
+    ]
+    for user in deactivations:
+        result.add_change('-', user.matricule, "désactivé (absent du fichier)")
+    result.timings['diff'] = time.monotonic() - start
+
+    def write():
+        User.objects.bulk_create(creates, batch_size=batch_size)
+        if updates:
+            User.objects.bulk_update(updates, sorted(updated_fields), batch_size=batch_size)
+        if deactivations:
+            User.objects.filter(pk__in=[user.pk for user in deactivations]).update(actif=False)
+        # Les opérations groupées n'émettent pas de signaux : invalider les caches après le commit
+        changed_ids = [user.pk for user in updates + deactivations]
+        if changed_ids:
+            transaction.on_commit(lambda: (
+                invalidate_user_cache(*changed_ids), invalidate_reference_data_cache('validateurs')
+            ))
+
+    _apply_in_transaction(result, dry_run, write)
+    result.created, result.updated, result.deactivated = len(creates), len(updates), len(deactivations)
+    return result
+
+
+def find_cycle(parents):
+    """
+    Recherche un cycle dans une hiérarchie (parcours en O(n), chaque nœud visité une fois).
+
+    Args:
+        parents: {nœud: parent ou None}
+
+    Returns:
+        list: Nœuds du premier cycle trouvé (vide si la hiérarchie est un arbre)
+    """
+    state = {}  # nœud -> numéro du parcours qui l'a visité
+    for run, start in enumerate(parents):
+        path = []
+        node = start
+        while node is not None and node not in state:
+            state[node] = run
+            path.append(node)
+            node = parents.get(node)
+        if node is not None and state[node] == run:
+            # Remontée jusqu'à un nœud du parcours en cours : cycle
+            return path[path.index(node):]
+    return []
+
+
+def hierarchy_levels(parents):
+    """
+    Ordonne une hiérarchie sans cycle par niveaux (tri topologique en O(n)) : chaque nœud
+    apparaît au niveau suivant celui de son parent.
+
+    Args:
+        parents: {nœud: parent ou None} ; un parent absent des clés est traité comme une racine
+
+    Returns:
+        list: Listes de nœuds, niveau 0 (racines) en premier
+    """
+    depths = {}
+    for start in parents:
+        # Remonter jusqu'à un ancêtre de profondeur connue, puis redescendre
+        path = []
+        node = start
+        while node in parents and node not in depths:
+            path.append(node)
+            node = parents[node]
+        depth = depths.get(node, -1)
+        for node in reversed(path):
+            depth += 1
+            depths[node] = depth
+    levels = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+    for node in parents:
+        levels[depths[node]].append(node)
+    return levels
+
+
+def sync_services(records, deactivate_missing=True, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Synchronise les services avec les enregistrements, par code (import non destructif).
+    Le parent est désigné par parent_code (ou, à défaut, par parent_id parmi les ids du fichier).
+    Les services absents du fichier sont désactivés, jamais supprimés : les déclarations,
+    utilisateurs et validateurs qui y sont rattachés sont conservés.
+
+    Args:
+        records: Itérable d'enregistrements (voir iter_json_records)
+        deactivate_missing: Désactiver les services actifs absents du fichier
+        dry_run: Calculer et chronométrer les changements sans les conserver
+        batch_size: Taille des lots d'écriture
+
+    Returns:
+        ImportResult: Bilan et différentiel (result.changes)
+    """
+    from core.models import Service
+    from core.utils.cache import invalidate_reference_data_cache, invalidate_service_users_cache
+
+    result = ImportResult()
+    start = time.monotonic()
+    existing = {service.code: service for service in Service.objects.select_related('parent')}
+
+    # Les services sont peu nombreux : le fichier est lu entièrement pour résoudre les parents
+    rows = {}
+    codes_by_id = {}
+    for record in records:
+        result.rows += 1
+        if not isinstance(record, dict):
+            result.add_error(result.rows, None, "Enregistrement invalide (objet JSON attendu).")
+            continue
+        code = record.get('code')
+        if code in rows:
+            result.add_error(result.rows, code, "Code en double dans le fichier.")
+            continue
+        rows[code] = (result.rows, record)
+        if record.get('id') is not None:
+            codes_by_id[record['id']] = code
+
+    # Hiérarchie cible : services du fichier, et services existants absents du fichier
+    parents = {code: service.parent.code if service.parent else None for code, service in existing.items()}
+    for code, (row, record) in list(rows.items()):
+        parent_code = record.get('parent_code') or codes_by_id.get(record.get('parent_id'))
+        if parent_code and parent_code not in rows and parent_code not in existing:
+            result.add_error(row, code, f"Service parent inconnu : {parent_code}.")
+            del rows[code]
+            continue
+        parents[code] = parent_code or None
+    cycle = find_cycle(parents)
+    if cycle:
+        result.add_error(rows.get(cycle[0], (None,))[0], cycle[0],
+                         f"Dépendance circulaire : {' > '.join(cycle + cycle[:1])}.")
+        result.timings['diff'] = time.monotonic() - start
+        return result
+
+    creates, updates, updated_fields, pending_parents = [], [], set(), {}
+    for code, (row, record) in rows.items():
+        values = {'nom': record.get('nom', ''), 'actif': record.get('actif', True)}
+        service = existing.get(code)
+        if service is None:
+            service = Service(code=code, **values)
+            changes = None
+        else:
+            changes = {field: (getattr(service, field), value) for field, value in values.items()
+                       if _differs(getattr(service, field), value)}
+            old_parent = service.parent.code if service.parent else None
+            if old_parent != parents[code]:
+                changes['parent'] = (old_parent, parents[code])
+            for field, (_old, value) in changes.items():
+                if field != 'parent':
+                    setattr(service, field, value)
+        try:
+            # Hiérarchie déjà contrôlée (find_cycle) : pas de Service.clean, qui remonte les parents en base
+            service.clean_fields(exclude=['parent'])
+        except ValidationError as e:
+            result.add_error(row, code, _validation_message(e))
+            continue
+
+        if changes is None:
+            creates.append(service)
+            pending_parents[code] = parents[code]
+            result.add_change('+', code, service.nom + (f" (parent : {parents[code]})" if parents[code] else ''))
+        elif changes:
+            updates.append(service)
+            updated_fields.update(changes)
+            if 'parent' in changes:
+                pending_parents[code] = parents[code]
+            result.add_change('~', code, _describe_changes(changes))
+        else:
+            result.unchanged += 1
+
+    deactivations = [
+        service for code, service in existing.items()
+        if deactivate_missing and code not in rows and service.actif
+    ]
+    for service in deactivations:
+        result.add_change('-', service.code, "désactivé (absent du fichier)")
+    result.timings['diff'] = time.monotonic() - start
+
+    def write():
+        # Créations sans parent, puis parents résolus par code (les nouveaux services ont un pk)
+        Service.objects.bulk_create(creates, batch_size=batch_size)
+        by_code = Service.objects.in_bulk([code for code in pending_parents.values() if code] + [
+            service.code for service in creates
+        ], field_name='code')
+        for service in creates:
+            service.pk = by_code[service.code].pk
+        for service in creates + updates:
+            if service.code in pending_parents:
+                parent_code = pending_parents[service.code]
+                service.parent_id = by_code[parent_code].pk if parent_code else None
+        if updates:
+            Service.objects.bulk_update(updates, sorted(updated_fields), batch_size=batch_size)
+        created_children = [service for service in creates if pending_parents[service.code]]
+        if created_children:
+            Service.objects.bulk_update(created_children, ['parent'], batch_size=batch_size)
+        if deactivations:
+            Service.objects.filter(pk__in=[service.pk for service in deactivations]).update(actif=False)
+        changed_ids = [service.pk for service in updates + deactivations]
+        if creates or changed_ids:
+            transaction.on_commit(lambda: (
+                invalidate_reference_data_cache('services'), invalidate_service_users_cache(*changed_ids)
+            ))
+
+    _apply_in_transaction(result, dry_run, write)
+    result.created, result.updated, result.deactivated = len(creates), len(updates), len(deactivations)
+    return result
+
+
+# --- Import des services (remplacement) --------------------------------------------
+
+def import_services(records, batch_size=DEFAULT_BATCH_SIZE, ignore_errors=False):
+    """
+    Remplace les services par ceux des enregistrements (import destructif).
+    La hiérarchie est contrôlée (cycles) et ordonnée par niveaux avant toute écriture, puis
+    chaque niveau est créé par bulk_create avec ses parents déjà résolus : aucun save() ni
+    Service.clean par service. Le parent est désigné par parent_id parmi les ids du fichier
+    (ou par parent_code) ; un parent absent du fichier laisse le service à la racine.
+    Si une ligne est invalide, rien n'est écrit (sauf ignore_errors).
+
+    Args:
+        records: Itérable d'enregistrements (voir iter_json_records)
+        batch_size: Taille des lots d'insertion
+        ignore_errors: Si True, importe les lignes valides malgré les lignes en erreur
+
+    Returns:
+        ImportResult: Bilan de l'import (aborted si rien n'a été écrit, toujours le cas
+        si la hiérarchie contient un cycle)
+    """
+    from core.models import Service
+    from core.utils.cache import get_cached_services, invalidate_reference_data_cache
+
+    result = ImportResult()
+    start = time.monotonic()
+    rows = {}
+    codes_by_id = {}
+    for record in records:
+        result.rows += 1
+        if not isinstance(record, dict):
+            result.add_error(result.rows, None, "Enregistrement invalide (objet JSON attendu).")
+            continue
+        code = record.get('code', 'N/A')
+        if code in rows:
+            result.add_error(result.rows, code, "Code en double dans le fichier.")
+            continue
+        service = Service(code=code, nom=record.get('nom', 'N/A'), actif=record.get('actif', True))
+        try:
+            service.clean_fields(exclude=['parent'])
+        except ValidationError as e:
+            result.add_error(result.rows, code, _validation_message(e))
+            continue
+        rows[code] = (result.rows, record, service)
+        if record.get('id') is not None:
+            codes_by_id[record['id']] = code
+
+    parents = {}
+    for code, (_row, record, _service) in rows.items():
+        parent_code = codes_by_id.get(record.get('parent_id')) or record.get('parent_code')
+        parents[code] = parent_code if parent_code in rows else None
+    cycle = find_cycle(parents)
+    if cycle:
+        result.add_error(rows[cycle[0]][0], cycle[0], f"Dépendance circulaire : {' > '.join(cycle + cycle[:1])}.")
+        result.timings['validation'] = time.monotonic() - start
+        result.aborted = True
+        return result
+    levels = hierarchy_levels(parents)
+    result.timings['validation'] = time.monotonic() - start
+
+    if result.errors and not ignore_errors:
+        # Import tout ou rien : la table n'est pas vidée pour un fichier partiellement invalide
+        result.aborted = True
+        return result
+
+    start = time.monotonic()
+    with transaction.atomic():
+        result.deleted = Service.objects.count()
+        Service.objects.all().delete()
+
+        ids = {}
+        for level in levels:
+            services = []
+            for code in level:
+                service = rows[code][2]
+                service.parent_id = ids[parents[code]] if parents[code] else None
+                services.append(service)
+            Service.objects.bulk_create(services, batch_size=batch_size)
+            if any(service.pk is None for service in services):
+                # Base ne renvoyant pas les clés insérées : une requête par niveau
+                ids.update(Service.objects.filter(code__in=level).values_list('code', 'id'))
+            else:
+                ids.update((service.code, service.pk) for service in services)
+            result.created += len(services)
+
+        # bulk_create n'émet pas de signaux : liste hiérarchique invalidée et recalculée une fois
+        transaction.on_commit(lambda: (invalidate_reference_data_cache('services'), get_cached_services()))
+    result.timings['write'] = time.monotonic() - start
+    return result
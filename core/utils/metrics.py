@@ -0,0 +1,325 @@
+"""
+Registre de métriques au format d'exposition Prometheus.
+Chaque processus cumule ses métriques en mémoire ; avec METRICS_DIR, il les écrit
+périodiquement dans un fichier propre (un par processus) et l'exposition additionne
+les fichiers de tous les workers gunicorn.
+"""
+from bisect import bisect_left
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bornes par défaut des histogrammes de durée (secondes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Intervalle minimal entre deux écritures du fichier du processus (secondes)
+DEFAULT_FLUSH_INTERVAL = 5
+# Au-delà, le fichier d'un processus disparu est supprimé (secondes)
+DEFAULT_FILE_MAX_AGE = 3600
+
+
+class Metric:
+    """Métrique étiquetée : valeurs indexées par le tuple des valeurs d'étiquettes."""
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = registry.lock
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labelnames)
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """Compteur monotone."""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """Reporte un total tenu ailleurs (ex: compteurs du cache local du processus)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    """Valeur instantanée, propre au processus qui expose les métriques."""
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Histogramme à bornes fixes : comptes par borne (non cumulés), somme et nombre."""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            state['buckets'][index] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def dump(self):
+        with self._lock:
+            return [[list(key), {**value, 'buckets': list(value['buckets'])}] for key, value in self._values.items()]
+
+
+class MetricsRegistry:
+    """
+    Registre des métriques du processus.
+    Les collecteurs (fonctions sans argument) sont appelés avant chaque écriture et
+    exposition pour mettre à jour les valeurs tenues ailleurs.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+        self._last_flush = 0.0
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def collect(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Échec du collecteur de métriques %s", collector)
+
+    def dump(self):
+        """
+        Retourne les valeurs cumulables du processus sous forme sérialisable
+        (les jauges, calculées à l'exposition, ne sont pas additionnées entre processus).
+        """
+        self.collect()
+        return {
+            name: metric.dump() for name, metric in self.metrics.items()
+            if not isinstance(metric, Gauge)
+        }
+
+    # --- Agrégation multi-processus ---
+
+    def flush(self, force=False):
+        """
+        Écrit les valeurs du processus dans METRICS_DIR (écriture atomique),
+        au plus une fois par METRICS_FLUSH_INTERVAL sauf si force.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL):
+            return
+        self._last_flush = now
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{os.getpid()}.json')
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self.dump(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            logger.exception("Impossible d'écrire les métriques dans %s", directory)
+
+    def aggregate(self):
+        """
+        Additionne les valeurs de tous les processus (fichiers de METRICS_DIR),
+        ou retourne celles du processus courant sans METRICS_DIR.
+
+        Returns:
+            dict: {nom: {tuple d'étiquettes: valeur}}
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            dumps = [self.dump()]
+        else:
+            self.flush(force=True)
+            dumps = []
+            max_age = getattr(settings, 'METRICS_FILE_MAX_AGE', DEFAULT_FILE_MAX_AGE)
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json'):
+                    continue
+                path = os.path.join(directory, filename)
+                try:
+                    if time.time() - os.path.getmtime(path) > max_age:
+                        os.remove(path)
+                        continue
+                    with open(path) as f:
+                        dumps.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        totals = {name: {} for name in self.metrics}
+        for name, metric in self.metrics.items():
+            if isinstance(metric, Gauge):
+                totals[name] = {tuple(key): value for key, value in metric.dump()}
+        for dump in dumps:
+            for name, values in dump.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in values:
+                    key = tuple(key)
+                    current = totals[name].get(key)
+                    if isinstance(metric, Histogram):
+                        if current is None:
+                            current = totals[name][key] = {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0}
+                        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                        current['sum'] += value['sum']
+                        current['count'] += value['count']
+                    else:
+                        totals[name][key] = (current or 0) + value
+        return totals
+
+    def render(self, extra_collectors=()):
+        """
+        Génère l'exposition au format texte Prometheus (toutes les métriques de tous les processus).
+
+        Args:
+            extra_collectors: Fonctions appelées avant l'exposition, dans le processus qui expose
+                (jauges calculées à la demande, non additionnées entre processus)
+        """
+        for collector in extra_collectors:
+            collector()
+        totals = self.aggregate()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(totals[name].items()):
+                labels = [f'{label}="{_escape(val)}"' for label, val in zip(metric.labelnames, key)]
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip((*metric.buckets, '+Inf'), value['buckets']):
+                        cumulative += count
+                        bucket_labels = [*labels, 'le="%s"' % bound]
+                        lines.append(f'{name}_bucket{_labels(bucket_labels)} {cumulative}')
+                    lines.append(f'{name}_sum{_labels(labels)} {value["sum"]}')
+                    lines.append(f'{name}_count{_labels(labels)} {value["count"]}')
+                else:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, force=True)
+
+# --- Métriques de l'application ---
+
+REQUEST_DURATION = registry.histogram(
+    'ecarts_http_request_duration_seconds', "Durée des requêtes HTTP par vue", ('view', 'method'))
+REQUEST_DB_DURATION = registry.histogram(
+    'ecarts_http_request_db_duration_seconds', "Temps passé en base par requête HTTP", ('view',))
+REQUEST_DB_QUERIES = registry.histogram(
+    'ecarts_http_request_db_queries', "Nombre de requêtes SQL par requête HTTP", ('view',), QUERY_COUNT_BUCKETS)
+REQUESTS_TOTAL = registry.counter(
+    'ecarts_http_requests_total', "Requêtes HTTP par vue et statut", ('view', 'method', 'status'))
+CACHE_SHARED_REQUESTS = registry.counter(
+    'ecarts_cache_shared_requests_total', "Lectures du cache partagé par résultat (hit, miss, stale)", ('result',))
+CACHE_LOCAL_REQUESTS = registry.counter(
+    'ecarts_cache_local_requests_total', "Lectures du cache local des processus par résultat", ('result',))
+CACHE_LOCAL_EVICTIONS = registry.counter(
+    'ecarts_cache_local_evictions_total', "Évictions du cache local des processus")
+GAPS_CREATED = registry.counter(
+    'ecarts_gaps_created_total', "Écarts créés")
+NOTIFICATIONS_UNREAD = registry.gauge(
+    'ecarts_notifications_unread', "Notifications non lues")
+NOTIFICATIONS_OLDEST_UNREAD_AGE = registry.gauge(
+    'ecarts_notifications_oldest_unread_age_seconds', "Ancienneté de la plus ancienne notification non lue")
+
+
+def _collect_local_cache():
+    from core.utils.cache import get_local_cache_stats
+    stats = get_local_cache_stats()
+    CACHE_LOCAL_REQUESTS.set_total(stats['hits'], result='hit')
+    CACHE_LOCAL_REQUESTS.set_total(stats['misses'], result='miss')
+    CACHE_LOCAL_EVICTIONS.set_total(stats['evictions'])
+
+
+registry.collectors.append(_collect_local_cache)
+
+
+def collect_notification_backlog():
+    """
+    Met à jour les jauges du retard de traitement des notifications (non lues).
+    Calculées par le processus qui expose, avec un cache de 30 secondes.
+    """
+    from django.db.models import Count, Min
+    from django.utils import timezone
+    from core.models import Notification
+    from core.utils.cache import get_or_compute
+
+    def compute():
+        return Notification.objects.filter(is_read=False).aggregate(count=Count('id'), oldest=Min('created_at'))
+
+    backlog = get_or_compute('metrics:notifications_backlog', compute, 30)
+    oldest = backlog['oldest']
+    NOTIFICATIONS_UNREAD.set(backlog['count'])
+    NOTIFICATIONS_OLDEST_UNREAD_AGE.set((timezone.now() - oldest).total_seconds() if oldest else 0)
+
+
+def record_request(view_name, method, status_code, duration, db_recorder=None):
+    """
+    Enregistre les métriques d'une requête HTTP (appelé par PerformanceMonitoringMiddleware).
+
+    Args:
+        view_name: Nom de vue résolu (ou None si aucune vue n'a été résolue)
+        method: Méthode HTTP
+        status_code: Statut de la réponse
+        duration: Durée totale (secondes)
+        db_recorder: QueryRecorder de la requête (optionnel)
+    """
+    view = view_name or 'unresolved'
+    REQUEST_DURATION.observe(duration, view=view, method=method)
+    REQUESTS_TOTAL.inc(view=view, method=method, status=status_code)
+    if db_recorder is not None:
+        REQUEST_DB_DURATION.observe(db_recorder.duration, view=view)
+        REQUEST_DB_QUERIES.observe(db_recorder.count, view=view)
+    registry.flush()
@@ -0,0 +1,297 @@
+"""
+Gabarits des notifications et rendu à la lecture.
+Les notifications sont stockées sous forme d'une clé de gabarit et d'un petit
+dictionnaire de paramètres ; le titre et le message sont rendus à l'affichage.
+Ce module ne dépend d'aucun modèle. La migration 0028 en garde une copie figée :
+modifier les gabarits ici n'a pas d'effet sur elle.
+"""
+from functools import lru_cache
+import json
+import re
+import string
+
+
+# Longueur de l'extrait de description affiché dans les demandes de validation
+DESCRIPTION_EXCERPT_LENGTH = 100
+
+# Gabarits des notifications : 'title' et 'message' sont des chaînes str.format,
+# 'comment' est un suffixe ajouté au message seulement si le paramètre 'comment' est renseigné.
+NOTIFICATION_TEMPLATES = {
+    'validation_request_initial': {
+        'title': "{gap_number} - Nouvel événement à valider",
+        'message': "Un nouvel écart ({gap_number}) a été déclaré par {declarant} "
+                   "et nécessite votre validation (Niveau 1).\n\n"
+                   "Service: {service}\n"
+                   "Type: {gap_type}\n"
+                   "Description: {description_excerpt}...",
+    },
+    'validation_request_next': {
+        'title': "{gap_number} - Événement à valider (Niveau {level})",
+        'message': "L'écart {gap_number} a été approuvé au niveau {previous_level} par {validator} "
+                   "et nécessite maintenant votre validation (Niveau {level}).\n\n"
+                   "Service: {service}\n"
+                   "Type: {gap_type}\n"
+                   "Description: {description_excerpt}...",
+    },
+    'gap_rejected': {
+        'title': "{gap_number} - Événement rejeté",
+        'message': "Votre événement {gap_number} a été rejeté au niveau {level} par {validator}.",
+        'comment': "\nCommentaire: {comment}",
+    },
+    'gap_retained': {
+        'title': "{gap_number} - Événement retenu",
+        'message': "Votre événement {gap_number} a été retenu après validation complète par {validator}.",
+    },
+    'validation_completed_rejected': {
+        'title': "{gap_number} - Traitement effectué : Non retenu",
+        'message': "Vous avez rejeté l'événement {gap_number}. Le déclarant a été notifié.",
+    },
+    'validation_completed_retained': {
+        'title': "{gap_number} - Traitement effectué : Retenu",
+        'message': "Vous avez approuvé l'événement {gap_number}. "
+                   "L'événement est maintenant retenu et le déclarant a été notifié.",
+    },
+    'validation_completed_approved': {
+        'title': "{gap_number} - Traitement effectué : Approuvé",
+        'message': "Vous avez approuvé l'événement {gap_number}. Il passe maintenant au niveau {level}.",
+    },
+    'gap_created': {
+        'title': "{gap_number} - Événement créé",
+        'message': "Votre événement {gap_number} ({gap_type}) a été créé avec succès.",
+    },
+    'gap_modified': {
+        'title': "Écart {gap_number} modifié",
+        'message': "Votre événement {gap_number} a été modifié par {author}.",
+    },
+    'gap_modified_status': {
+        'title': "Écart {gap_number} modifié",
+        'message': "Le statut de votre écart {gap_number} a été modifié par {author} : {old_status} → {new_status}.",
+    },
+    'gap_reclassified_event': {
+        'title': "Événement reclassé - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
+    },
+    'gap_reclassified_gap': {
+        'title': "Écart reclassé - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en écart et nécessite désormais une validation.",
+    },
+    'gap_type_changed_event': {
+        'title': "Modification de type - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en événement simple (plus de validation nécessaire).",
+    },
+    'gap_type_changed_gap': {
+        'title': "Modification de type - {gap_number}",
+        'message': "Votre déclaration {gap_number} a été reclassée en écart et nécessite désormais une validation.",
+    },
+    'gap_deleted': {
+        'title': "{gap_number} - Événement supprimé",
+        'message': "Votre événement {gap_number} ({gap_type}) a été supprimé par {author}.",
+    },
+    'gap_status_changed': {
+        'title': "{gap_number} - Statut modifié",
+        'message': "Le statut de votre événement {gap_number} a été modifié vers '{status}' par {author}.",
+        'comment': " Commentaire: {comment}",
+    },
+    'declaration_involved': {
+        'title': "Déclaration #{gap_report_id} - Vous êtes impliqué",
+        'message': "Vous avez été associé à une déclaration d'événement créée par {author}. "
+                   "Service: {service}, Source: {audit_source}.",
+    },
+}
+
+_FORMATTER = string.Formatter()
+
+# Paramètres qui peuvent être relus depuis les objets liés (écart, déclaration)
+# et n'ont donc pas besoin d'être stockés dans la notification
+DERIVED_PARAMS = ('gap_type', 'service', 'audit_source', 'description_excerpt', 'gap_report_id')
+
+
+class _DefaultDict(dict):
+    """Dictionnaire de formatage qui rend une chaîne vide pour les paramètres absents."""
+
+    def __missing__(self, key):
+        return ''
+
+
+def derive_params(gap=None, gap_report=None):
+    """
+    Calcule les paramètres relus depuis les objets liés à une notification.
+
+    Args:
+        gap: Écart lié (optionnel)
+        gap_report: Déclaration liée (optionnel, déduite de l'écart si absente)
+
+    Returns:
+        dict: Paramètres dérivés (voir DERIVED_PARAMS)
+    """
+    params = {}
+    if gap is not None:
+        params['gap_type'] = gap.gap_type.name
+        params['description_excerpt'] = gap.description[:DESCRIPTION_EXCERPT_LENGTH]
+        if gap_report is None:
+            gap_report = gap.gap_report
+    if gap_report is not None:
+        params['gap_report_id'] = gap_report.id
+        params['service'] = gap_report.service.nom if gap_report.service else 'Non défini'
+        params['audit_source'] = gap_report.audit_source.name
+    return params
+
+
+@lru_cache(maxsize=4096)
+def _render_cached(template_key, frozen_params):
+    """Rend un gabarit à partir de paramètres figés (tuple trié, hachable)."""
+    template = NOTIFICATION_TEMPLATES.get(template_key)
+    if template is None:
+        return '', ''
+
+    params = _DefaultDict(frozen_params)
+    title = template['title'].format_map(params)
+    message = template['message'].format_map(params)
+    if template.get('comment') and params.get('comment'):
+        message += template['comment'].format_map(params)
+    return title, message
+
+
+def render_notification(template_key, params):
+    """
+    Rend le titre et le message d'une notification.
+    Le résultat est mis en cache par processus (LRU) sur la clé et les paramètres.
+
+    Args:
+        template_key: Clé du gabarit (voir NOTIFICATION_TEMPLATES)
+        params: Dictionnaire des paramètres (stockés et dérivés)
+
+    Returns:
+        tuple: (titre, message)
+    """
+    frozen_params = tuple(sorted(
+        (key, value if isinstance(value, (str, int, float, bool, type(None))) else json.dumps(value))
+        for key, value in (params or {}).items()
+    ))
+    return _render_cached(template_key, frozen_params)
+
+
+def _compile_pattern(template_string):
+    """Transforme une chaîne str.format en expression régulière à groupes nommés."""
+    pattern = ''
+    seen = set()
+    for literal, field_name, _spec, _conversion in _FORMATTER.parse(template_string):
+        pattern += re.escape(literal)
+        if field_name is None:
+            continue
+        if field_name in seen:
+            pattern += f'(?P={field_name})'
+        else:
+            seen.add(field_name)
+            pattern += f'(?P<{field_name}>.*?)'
+    return pattern
+
+
+@lru_cache(maxsize=None)
+def _compiled_templates():
+    """Retourne les expressions régulières (titre, message) de chaque gabarit."""
+    compiled = {}
+    for template_key, template in NOTIFICATION_TEMPLATES.items():
+        message_pattern = _compile_pattern(template['message'])
+        if template.get('comment'):
+            message_pattern += f"(?:{_compile_pattern(template['comment'])})?"
+        compiled[template_key] = (
+            re.compile(_compile_pattern(template['title']) + r'\Z', re.DOTALL),
+            re.compile(message_pattern + r'\Z', re.DOTALL),
+        )
+    return compiled
+
+
+def compact_notification(title, message, derived=None):
+    """
+    Retrouve le gabarit et les paramètres d'une notification déjà rendue.
+    Les paramètres identiques aux valeurs dérivées des objets liés ne sont pas conservés.
+
+    Args:
+        title: Titre stocké
+        message: Message stocké
+        derived: Paramètres dérivés des objets liés (voir derive_params)
+
+    Returns:
+        tuple: (clé du gabarit, paramètres) ou (None, None) si aucun gabarit
+        ne reproduit exactement le titre et le message
+    """
+    derived = derived or {}
+    for template_key, (title_re, message_re) in _compiled_templates().items():
+        title_match = title_re.match(title)
+        if not title_match:
+            continue
+        message_match = message_re.match(message)
+        if not message_match:
+            continue
+
+        captured = {**title_match.groupdict(), **message_match.groupdict()}
+        params = {
+            key: value for key, value in captured.items()
+            if value is not None and str(derived.get(key)) != value
+        }
+
+        # Ne compacter que si le rendu reproduit exactement le texte d'origine
+        if render_notification(template_key, {**derived, **params}) == (title, message):
+            return template_key, params
+    return None, None
+
+
+def _stored_size(template_key, params, title, message):
+    """Taille approximative (octets) des colonnes de contenu d'une notification."""
+    return (
+        len(template_key.encode()) + len(json.dumps(params or {}).encode())
+        + len(title.encode()) + len(message.encode())
+    )
+
+
+def compact_notifications(queryset, batch_size=1000, dry_run=False):
+    """
+    Convertit les notifications rendues (titre et message en texte) en gabarit + paramètres.
+    Les lignes sont traitées par lots ; celles qu'aucun gabarit ne reproduit à l'identique
+    sont laissées telles quelles.
+
+    Args:
+        queryset: QuerySet de notifications (modèle courant ou historique de migration)
+        batch_size: Nombre de lignes par lot de mise à jour
+        dry_run: Si True, calcule les statistiques sans rien écrire
+
+    Returns:
+        dict: Statistiques (lignes analysées, compactées, octets avant/après)
+    """
+    stats = {'scanned': 0, 'compacted': 0, 'bytes_before': 0, 'bytes_after': 0}
+    batch = []
+
+    rows = queryset.filter(template_key='').select_related(
+        'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+        'gap_report__service', 'gap_report__audit_source'
+    ).order_by('pk')
+
+    for notification in rows.iterator(chunk_size=batch_size):
+        stats['scanned'] += 1
+        size_before = _stored_size('', notification.params, notification.title, notification.message)
+        stats['bytes_before'] += size_before
+
+        derived = derive_params(gap=notification.gap, gap_report=notification.gap_report)
+        template_key, params = compact_notification(notification.title, notification.message, derived)
+        if template_key is None:
+            stats['bytes_after'] += size_before
+            continue
+
+        stats['compacted'] += 1
+        stats['bytes_after'] += _stored_size(template_key, params, '', '')
+        notification.template_key = template_key
+        notification.params = params
+        notification.title = ''
+        notification.message = ''
+        batch.append(notification)
+
+        if len(batch) >= batch_size:
+            if not dry_run:
+                queryset.model.objects.bulk_update(batch, ['template_key', 'params', 'title', 'message'])
+            batch = []
+
+    if batch and not dry_run:
+        queryset.model.objects.bulk_update(batch, ['template_key', 'params', 'title', 'message'])
+
+    return stats
@@ -2,7 +2,13 @@
 Utilitaires de pagination optimisés pour l'application EcartsActions.
 Améliore les performances avec de nombreux utilisateurs concurrents.
 """
+from datetime import datetime
+import base64
+import binascii
+
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db import connections
+from django.db.models import Q
 from django.http import Http404
 
 
@@ -105,4 +111,87 @@ def build_pagination_url(request, page_number):
     """
     params = request.GET.copy()
     params['page'] = page_number
-    return f"{request.path}?{params.urlencode()}"
\ No newline at end of file
+    return f"{request.path}?{params.urlencode()}"
+
+# --- Pagination par curseur (keyset) --------------------------------------------
+#
+# Pour les tables volumineuses triées chronologiquement (historique...), la pagination
+# par OFFSET et le COUNT(*) deviennent coûteux. Le curseur encode la dernière position
+# (created_at, id) et la page suivante repart de cette position via l'index.
+
+KEYSET_ORDERING = ('-created_at', '-id')
+
+
+def encode_cursor(created_at, pk):
+    """
+    Encode une position (created_at, id) en curseur opaque pour l'URL.
+    """
+    raw = f"{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par encode_cursor.
+    
+    Returns:
+        tuple: (created_at, id)
+    
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        created_at = datetime.fromisoformat(created_at)
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Curseur invalide : {cursor}") from e
+
+
+def keyset_condition(cursor):
+    """
+    Condition « après le curseur » dans l'ordre (-created_at, -id).
+    """
+    created_at, pk = decode_cursor(cursor)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def keyset_paginate(querysets, cursor=None, per_page=25):
+    """
+    Pagine une ou plusieurs requêtes par curseur sur (created_at, id).
+    Plusieurs requêtes sont combinées par UNION : chaque branche est filtrée, triée
+    et limitée séparément (et peut donc utiliser son propre index) avant la fusion.
+    
+    Args:
+        querysets: QuerySet ou liste de QuerySets du même modèle
+        cursor: Curseur de la page précédente (None pour la première page)
+        per_page: Nombre d'éléments par page (maximum 100)
+    
+    Returns:
+        tuple: (éléments de la page, curseur de la page suivante ou None)
+    
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    if not isinstance(querysets, (list, tuple)):
+        querysets = [querysets]
+    per_page = max(1, min(per_page, 100))
+    
+    condition = keyset_condition(cursor) if cursor else Q()
+    branches = [qs.filter(condition) for qs in querysets]
+    if len(branches) == 1:
+        items = list(branches[0].order_by(*KEYSET_ORDERING)[:per_page + 1])
+    else:
+        if connections[branches[0].db].features.supports_slicing_ordering_in_compound:
+            # Limiter chaque branche évite de fusionner plus de lignes que nécessaire
+            branches = [branch.order_by(*KEYSET_ORDERING)[:per_page + 1] for branch in branches]
+        else:
+            # SQLite : pas de tri ni de limite dans les branches d'un UNION
+            branches = [branch.order_by() for branch in branches]
+        items = list(branches[0].union(*branches[1:]).order_by(*KEYSET_ORDERING)[:per_page + 1])
+    
+    if len(items) > per_page:
+        items = items[:per_page]
+        return items, encode_cursor(items[-1].created_at, items[-1].pk)
+    return items, None
@@ -0,0 +1,255 @@
+"""
+Mesure des requêtes SQL exécutées pendant une requête HTTP et détection des requêtes N+1.
+Repose sur connection.execute_wrapper : fonctionne en production (DEBUG=False),
+contrairement à connection.queries, avec un coût négligeable par requête SQL.
+"""
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+import heapq
+import os
+import re
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections
+
+# Seuils par défaut (surchargeables par vue, voir get_view_thresholds)
+DEFAULT_MAX_QUERIES = 20
+DEFAULT_DUPLICATE_THRESHOLD = 5
+
+# Nombre de requêtes les plus lentes conservées par requête HTTP
+DEFAULT_KEEP_SLOWEST = 5
+
+# Nombre d'exécutions d'une même forme de requête au-delà duquel un N+1 est signalé
+DEFAULT_NPLUSONE_THRESHOLD = 5
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)", re.IGNORECASE)
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Réduit une requête SQL à sa forme : littéraux remplacés par '?', listes IN
+    réduites à un seul élément. Deux requêtes de même forme ne diffèrent que par leurs valeurs.
+
+    Args:
+        sql: Texte SQL (paramétré ou non)
+
+    Returns:
+        str: Forme normalisée de la requête
+    """
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _SPACES_RE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """
+    Enregistreur de requêtes SQL à installer avec connection.execute_wrapper.
+    Compte les requêtes, cumule leur durée, retient la plus lente et les
+    occurrences de chaque texte SQL (normalisé seulement à la demande).
+    """
+
+    def __init__(self, keep_slowest=DEFAULT_KEEP_SLOWEST):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = None
+        self.keep_slowest = keep_slowest
+        self._statements = Counter()
+        self._slowest_heap = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            self._statements[sql] += 1
+            if self.slowest is None or elapsed > self.slowest['duration']:
+                self.slowest = {'sql': sql, 'params': params, 'duration': elapsed}
+            # Les N requêtes les plus lentes (tas minimal borné)
+            if not many:
+                item = (elapsed, self.count, sql, params)
+                if len(self._slowest_heap) < self.keep_slowest:
+                    heapq.heappush(self._slowest_heap, item)
+                elif elapsed > self._slowest_heap[0][0]:
+                    heapq.heapreplace(self._slowest_heap, item)
+
+    def slowest_statements(self):
+        """
+        Retourne les requêtes les plus lentes (au plus keep_slowest), de la plus lente à la plus rapide.
+
+        Returns:
+            list: Dictionnaires (sql, params, duration)
+        """
+        return [
+            {'sql': sql, 'params': params, 'duration': duration}
+            for duration, _order, sql, params in sorted(self._slowest_heap, reverse=True)
+        ]
+
+    def shapes(self):
+        """
+        Retourne le nombre d'exécutions par forme de requête.
+
+        Returns:
+            Counter: {forme normalisée: nombre d'exécutions}
+        """
+        shapes = Counter()
+        for sql, count in self._statements.items():
+            shapes[normalize_sql(sql)] += count
+        return shapes
+
+    def duplicates(self, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+        """
+        Retourne les formes de requête exécutées au moins threshold fois.
+
+        Returns:
+            list: [(forme, nombre d'exécutions)], les plus fréquentes d'abord
+        """
+        return [(shape, count) for shape, count in self.shapes().most_common() if count >= threshold]
+
+
+@contextmanager
+def record_queries(recorder=None, using=None):
+    """
+    Enregistre les requêtes SQL exécutées dans le bloc, sur toutes les connexions.
+
+    Args:
+        recorder: Enregistreur à utiliser (défaut: un nouveau QueryRecorder)
+        using: Alias des connexions à surveiller (défaut: toutes)
+
+    Yields:
+        QueryRecorder: L'enregistreur, complété à la sortie du bloc
+    """
+    recorder = recorder or QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def get_view_thresholds(view_name):
+    """
+    Retourne les seuils de surveillance d'une vue.
+    PERFORMANCE_VIEW_THRESHOLDS permet de les ajuster par nom de vue résolu, par exemple
+    {'gaps:gap_list': {'time': 2.0, 'queries': 40}}.
+
+    Args:
+        view_name: Nom de vue résolu (ex: 'gaps:gap_list'), ou None
+
+    Returns:
+        dict: Seuils 'time' (secondes), 'queries' et 'duplicates'
+    """
+    thresholds = {
+        'time': getattr(settings, 'SLOW_QUERY_THRESHOLD', 1.0),
+        'queries': getattr(settings, 'PERFORMANCE_MAX_QUERIES', DEFAULT_MAX_QUERIES),
+        'duplicates': getattr(settings, 'PERFORMANCE_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD),
+    }
+    if view_name:
+        thresholds.update(getattr(settings, 'PERFORMANCE_VIEW_THRESHOLDS', {}).get(view_name, {}))
+    return thresholds
+
+
+# --- Détection des requêtes N+1 -----------------------------------------------------
+
+class NPlusOneError(AssertionError):
+    """Levée quand une forme de requête est répétée au-delà du seuil (tests, NPLUSONE_RAISE)."""
+
+
+def _project_stack():
+    """Pile d'appels limitée au code du projet (hors Django et bibliothèques)."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(os.path.join('utils', 'performance.py'))
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class NPlusOneDetector:
+    """
+    Détecteur de requêtes N+1 à installer avec connection.execute_wrapper.
+    Compte les exécutions par forme de requête et capture la pile d'appels
+    du code du projet à la première exécution au-delà du seuil.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or getattr(settings, 'NPLUSONE_THRESHOLD', DEFAULT_NPLUSONE_THRESHOLD)
+        self.counts = Counter()
+        self.stacks = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize_sql(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold + 1:
+            self.stacks[shape] = _project_stack()
+        return execute(sql, params, many, context)
+
+    def problems(self):
+        """
+        Retourne les formes de requête répétées au-delà du seuil.
+
+        Returns:
+            list: [(forme, nombre d'exécutions, pile d'appels)], les plus fréquentes d'abord
+        """
+        return [
+            (shape, count, self.stacks.get(shape, ''))
+            for shape, count in self.counts.most_common() if count > self.threshold
+        ]
+
+    def report(self):
+        """Retourne un rapport lisible des requêtes N+1 détectées (chaîne vide si aucune)."""
+        return '\n\n'.join(
+            f"Requête exécutée {count} fois (seuil {self.threshold}) : {shape}\n{stack}"
+            for shape, count, stack in self.problems()
+        )
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, raise_error=False, using=None):
+    """
+    Détecte les requêtes N+1 exécutées dans le bloc.
+
+    Args:
+        threshold: Nombre d'exécutions toléré par forme (défaut: NPLUSONE_THRESHOLD)
+        raise_error: Si True, lève NPlusOneError à la sortie du bloc en cas de N+1
+        using: Alias des connexions à surveiller (défaut: toutes)
+
+    Yields:
+        NPlusOneDetector: Le détecteur, complété à la sortie du bloc
+
+    Raises:
+        NPlusOneError: Si raise_error et qu'une forme dépasse le seuil
+    """
+    detector = NPlusOneDetector(threshold)
+    with record_queries(detector, using=using):
+        yield detector
+    if raise_error and detector.problems():
+        raise NPlusOneError(detector.report())
+
+
+class NPlusOneTestMixin:
+    """
+    Mixin de tests (TestCase Django) : chaque test échoue s'il exécute une requête N+1.
+    Le seuil se règle par classe (nplusone_threshold) ; assertNoNPlusOne permet
+    de ne contrôler qu'un bloc.
+    """
+    nplusone_threshold = None
+
+    def setUp(self):
+        super().setUp()
+        stack = ExitStack()
+        stack.enter_context(detect_n_plus_one(self.nplusone_threshold, raise_error=True))
+        self.addCleanup(stack.close)
+
+    def assertNoNPlusOne(self, threshold=None):
+        """Contexte vérifiant l'absence de requête N+1 dans le bloc."""
+        return detect_n_plus_one(threshold or self.nplusone_threshold, raise_error=True)
@@ -0,0 +1,151 @@
+"""
+Profilage à la demande d'une requête HTTP par échantillonnage de la pile d'appels.
+Un thread relève périodiquement la pile du thread qui traite la requête (sys._current_frames) :
+le coût est borné par l'intervalle d'échantillonnage, quelle que soit la quantité de code exécuté.
+Le résultat est produit au format « collapsed stacks » (une pile par ligne suivie de son nombre
+d'échantillons), importable tel quel dans speedscope ou flamegraph.pl.
+"""
+from collections import Counter
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_SAMPLE_INTERVAL = 0.005  # Secondes
+DEFAULT_MAX_PROFILES = 200
+
+
+def _frame_label(code):
+    """Libellé d'une fonction : nom, fichier (relatif au projet ou à site-packages) et ligne."""
+    filename = code.co_filename
+    root = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(root):
+        filename = filename[len(root):]
+    elif 'site-packages' + os.sep in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    # ';' sépare les fonctions dans le format collapsed
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+class SamplingProfiler:
+    """
+    Profileur par échantillonnage de la pile d'un thread.
+
+    Usage:
+        with SamplingProfiler() as profiler:
+            ...
+        profiler.collapsed()
+    """
+
+    def __init__(self, interval=None, thread_id=None):
+        self.interval = interval or getattr(settings, 'PROFILE_SAMPLE_INTERVAL', DEFAULT_SAMPLE_INTERVAL)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='request_profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._start_time
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Retourne le profil au format collapsed stacks (speedscope, flamegraph.pl)."""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def top_functions(collapsed, limit=20):
+    """
+    Calcule les fonctions les plus présentes d'un profil collapsed.
+
+    Args:
+        collapsed: Profil au format collapsed stacks
+        limit: Nombre de fonctions retournées
+
+    Returns:
+        list: Dictionnaires (function, self, total) en nombre d'échantillons,
+        triés par temps propre décroissant
+    """
+    self_counts = Counter()
+    total_counts = Counter()
+    for line in collapsed.splitlines():
+        stack, _sep, count = line.rpartition(' ')
+        if not stack:
+            continue
+        frames = stack.split(';')
+        self_counts[frames[-1]] += int(count)
+        for frame in set(frames):
+            total_counts[frame] += int(count)
+    return [
+        {'function': function, 'self': count, 'total': total_counts[function]}
+        for function, count in self_counts.most_common(limit)
+    ]
+
+
+def wants_profile(request):
+    """
+    Vérifie si le profilage est demandé (?__profile=1 ou en-tête X-Profile: 1)
+    et autorisé (administrateurs SA/AD, PROFILING_ENABLED).
+    """
+    if not getattr(settings, 'PROFILING_ENABLED', True):
+        return False
+    requested = request.GET.get('__profile') == '1' or request.headers.get('X-Profile') == '1'
+    return requested and getattr(request.user, 'droits', None) in ['SA', 'AD']
+
+
+def save_profile(request, response, profiler):
+    """
+    Enregistre le profil d'une requête (table plafonnée à PROFILE_MAX_ROWS).
+
+    Returns:
+        RequestProfile: Le profil enregistré
+    """
+    from core.models import RequestProfile
+
+    profile = RequestProfile.objects.create(
+        path=request.get_full_path()[:500],
+        method=request.method,
+        view_name=(request.resolver_match.view_name if request.resolver_match else '')[:200],
+        user=request.user if request.user.is_authenticated else None,
+        status_code=response.status_code,
+        duration=profiler.duration,
+        interval=profiler.interval,
+        samples=profiler.samples,
+        collapsed=profiler.collapsed(),
+    )
+    max_rows = getattr(settings, 'PROFILE_MAX_ROWS', DEFAULT_MAX_PROFILES)
+    cutoff = list(RequestProfile.objects.order_by('-id').values_list('id', flat=True)[max_rows:max_rows + 1])
+    if cutoff:
+        RequestProfile.objects.filter(id__lte=cutoff[0]).delete()
+    return profile
@@ -0,0 +1,139 @@
+"""
+En-têtes Server-Timing : décomposition du temps de chaque réponse par phase
+(middlewares, vue, base de données, cache, rendu des gabarits, gestionnaires de signaux),
+affichée par les outils de développement du navigateur (onglet Réseau > Timing).
+
+Les phases sont mesurées dans le contexte de la requête (contextvars) par timed(),
+utilisable comme gestionnaire de contexte ou comme décorateur ; hors requête il est sans effet.
+Les phases se recouvrent : le temps de la vue inclut la base, le cache et le rendu.
+"""
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# Phases dans l'ordre d'affichage, avec leur description
+PHASES = {
+    'total': "Total",
+    'middleware': "Middlewares",
+    'view': "Vue",
+    'db': "Base de données",
+    'cache': "Cache partagé",
+    'template': "Rendu des gabarits",
+    'signals': "Gestionnaires de signaux",
+}
+
+_current_timing = ContextVar('server_timing', default=None)
+
+
+class ServerTiming:
+    """Durées et nombres d'appels cumulés par phase pour une requête."""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+        self._depths = {}
+
+    def add(self, phase, duration, count=1):
+        self.durations[phase] = self.durations.get(phase, 0.0) + duration
+        self.counts[phase] = self.counts.get(phase, 0) + count
+
+    def header(self):
+        """
+        Retourne la valeur de l'en-tête Server-Timing (durées en millisecondes).
+
+        Returns:
+            str: Ex: 'total;dur=42.1;desc="Total", db;dur=8.3;desc="Base de données (12)"'
+        """
+        metrics = []
+        for phase, description in PHASES.items():
+            if phase not in self.durations:
+                continue
+            count = self.counts.get(phase)
+            if count and phase not in ('total', 'middleware', 'view'):
+                description = f"{description} ({count})"
+            metrics.append(f'{phase};dur={self.durations[phase] * 1000:.1f};desc="{description}"')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def server_timing_context():
+    """
+    Ouvre la mesure des phases d'une requête.
+
+    Yields:
+        ServerTiming: Les mesures, complétées à la sortie du bloc
+    """
+    timing = ServerTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+class timed(ContextDecorator):
+    """
+    Mesure une phase de la requête en cours (gestionnaire de contexte ou décorateur).
+    Les appels imbriqués d'une même phase ne sont comptés qu'une fois.
+
+    Usage:
+        with timed('cache'):
+            ...
+
+        @timed('signals')
+        def handler(sender, instance, **kwargs):
+            ...
+    """
+
+    def __init__(self, phase):
+        self.phase = phase
+        self._timing = None
+        self._start = None
+
+    def _recreate_cm(self):
+        # Une instance par appel de la fonction décorée (appels concurrents ou récursifs)
+        return self.__class__(self.phase)
+
+    def __enter__(self):
+        self._timing = _current_timing.get()
+        if self._timing is not None:
+            depth = self._timing._depths.get(self.phase, 0)
+            self._timing._depths[self.phase] = depth + 1
+            if depth == 0:
+                self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timing is None:
+            return False
+        self._timing._depths[self.phase] -= 1
+        if self._start is not None:
+            self._timing.add(self.phase, time.perf_counter() - self._start)
+        return False
+
+
+class TimedTemplate(Template):
+    """Gabarit dont le rendu est mesuré dans la phase 'template'."""
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class ServerTimingTemplates(DjangoTemplates):
+    """
+    Moteur de gabarits Django mesurant le rendu des gabarits (phase 'template').
+    Remplace 'django.template.backends.django.DjangoTemplates' dans TEMPLATES.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,164 @@
+"""
+Échantillonnage des requêtes SQL lentes.
+Pour une fraction des requêtes HTTP (SLOW_QUERY_SAMPLE_RATE) et pour toutes les requêtes
+HTTP lentes, les requêtes SQL les plus lentes sont enregistrées avec leurs paramètres et
+leur plan d'exécution (EXPLAIN, ou EXPLAIN ANALYZE si SLOW_QUERY_EXPLAIN_ANALYZE) dans
+une table plafonnée, consultable dans l'administration regroupée par forme.
+Les paramètres des écritures (INSERT, UPDATE...) sont masqués : ils peuvent contenir des
+hachages de mots de passe ou des données de session.
+"""
+import hashlib
+import json
+import math
+import random
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+
+from core.utils.performance import normalize_sql
+
+# Valeurs par défaut des réglages
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_SAMPLE_SIZE = 5
+DEFAULT_MIN_DURATION = 0.05
+DEFAULT_MAX_ROWS = 5000
+
+REDACTED_PARAM = '***'
+
+
+def should_sample():
+    """Tire au sort les requêtes HTTP échantillonnées (SLOW_QUERY_SAMPLE_RATE)."""
+    return random.random() < getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+def is_select(sql):
+    """Vérifie si une requête SQL est une lecture (SELECT)."""
+    return sql.lstrip().upper().startswith('SELECT')
+
+
+def explain(sql, params, using='default'):
+    """
+    Retourne le plan d'exécution d'une requête SELECT (None pour les autres requêtes).
+    EXPLAIN ANALYZE exécute réellement la requête : activé seulement par SLOW_QUERY_EXPLAIN_ANALYZE.
+    """
+    if not is_select(sql):
+        return None
+    connection = connections[using]
+    options = {}
+    if getattr(settings, 'SLOW_QUERY_EXPLAIN_ANALYZE', False) and connection.vendor == 'postgresql':
+        options['analyze'] = True
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def _json_params(sql, params):
+    """
+    Paramètres convertis en valeurs JSON (dates, décimaux, etc. sous forme de texte).
+    Seuls ceux des SELECT sont conservés ; ceux des écritures sont masqués.
+    """
+    if not is_select(sql):
+        return [REDACTED_PARAM] * len(params or [])
+    return json.loads(json.dumps(list(params or []), cls=DjangoJSONEncoder, default=str))
+
+
+def store_slow_queries(recorder, view_name='', path=''):
+    """
+    Enregistre les requêtes SQL les plus lentes d'une requête HTTP avec leur plan.
+    À appeler une fois la requête HTTP terminée (hors de l'enregistreur).
+
+    Args:
+        recorder: QueryRecorder de la requête HTTP
+        view_name: Nom de vue résolu
+        path: Chemin de la requête
+
+    Returns:
+        int: Nombre d'échantillons enregistrés
+    """
+    from core.models import SlowQuerySample
+
+    min_duration = getattr(settings, 'SLOW_QUERY_SAMPLE_MIN_DURATION', DEFAULT_MIN_DURATION)
+    statements = [statement for statement in recorder.slowest_statements() if statement['duration'] >= min_duration]
+    if not statements:
+        return 0
+
+    samples = []
+    for statement in statements:
+        try:
+            plan = explain(statement['sql'], statement['params'])
+        except Exception as e:
+            plan = f"EXPLAIN impossible : {e}"
+        shape = normalize_sql(statement['sql'])
+        samples.append(SlowQuerySample(
+            shape=shape,
+            shape_hash=hashlib.sha256(shape.encode()).hexdigest(),
+            sql=statement['sql'],
+            params=_json_params(statement['sql'], statement['params']),
+            duration=statement['duration'],
+            view_name=(view_name or '')[:200],
+            path=path[:500],
+            plan=plan or '',
+        ))
+    SlowQuerySample.objects.bulk_create(samples)
+    trim_slow_query_samples()
+    return len(samples)
+
+
+def trim_slow_query_samples(max_rows=None):
+    """Supprime les échantillons les plus anciens au-delà de SLOW_QUERY_SAMPLE_MAX_ROWS."""
+    from core.models import SlowQuerySample
+
+    max_rows = max_rows or getattr(settings, 'SLOW_QUERY_SAMPLE_MAX_ROWS', DEFAULT_MAX_ROWS)
+    cutoff = list(SlowQuerySample.objects.order_by('-id').values_list('id', flat=True)[max_rows:max_rows + 1])
+    if cutoff:
+        SlowQuerySample.objects.filter(id__lte=cutoff[0]).delete()
+
+
+def _percentile(sorted_values, percentile):
+    """Percentile par la méthode du rang le plus proche (valeurs triées)."""
+    rank = math.ceil(percentile / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def slow_query_shapes():
+    """
+    Regroupe les échantillons par forme de requête (la table est plafonnée : calcul en mémoire).
+
+    Returns:
+        list: Dictionnaires (forme, nombre, p50, p95, max, dernière occurrence, vues,
+        échantillon le plus lent), triés par durée cumulée décroissante
+    """
+    from core.models import SlowQuerySample
+
+    groups = {}
+    for sample in SlowQuerySample.objects.order_by('id').only(
+        'id', 'shape', 'shape_hash', 'duration', 'view_name', 'created_at'
+    ):
+        group = groups.setdefault(sample.shape_hash, {
+            'shape': sample.shape, 'durations': [], 'views': set(), 'last_seen': None, 'slowest': None,
+        })
+        group['durations'].append(sample.duration)
+        if sample.view_name:
+            group['views'].add(sample.view_name)
+        group['last_seen'] = sample.created_at
+        if group['slowest'] is None or sample.duration > group['slowest'][1]:
+            group['slowest'] = (sample.pk, sample.duration)
+
+    shapes = []
+    for group in groups.values():
+        durations = sorted(group['durations'])
+        shapes.append({
+            'shape': group['shape'],
+            'count': len(durations),
+            'total': sum(durations),
+            'p50': _percentile(durations, 50),
+            'p95': _percentile(durations, 95),
+            'max': durations[-1],
+            'last_seen': group['last_seen'],
+            'views': sorted(group['views']),
+            'slowest_id': group['slowest'][0],
+        })
+    shapes.sort(key=lambda shape: shape['total'], reverse=True)
+    return shapes
@@ -17,6 +17,7 @@ from .workflow import (
     search_users, service_detail_api, workflow_stats
 )
 from .niveau_partial import get_niveau_partial
+from .monitoring import metrics
 
 # Export explicite pour les imports directs
 __all__ = [
@@ -28,5 +29,6 @@ __all__ = [
     'gap_list', 'gap_report_list', 'gap_report_detail', 'gap_report_create', 'gap_report_edit',
     'gap_create', 'gap_edit', 'get_gap_types', 'get_process_field',
     'workflow_management', 'assign_validator', 'remove_validator',
-    'workflow_stats', 'search_users', 'service_detail_api', 'get_niveau_partial'
+    'workflow_stats', 'search_users', 'service_detail_api', 'get_niveau_partial',
+    'metrics'
 ]
\ No newline at end of file
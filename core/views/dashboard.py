@@ -39,7 +39,10 @@ def dashboard(request):
     notifications = Notification.objects.filter(
         user=user,
         is_read=False
-    ).select_related('gap', 'gap__gap_report', 'gap_report').order_by('-created_at')[:5]
+    ).select_related(
+        'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+        'gap_report__service', 'gap_report__audit_source'
+    ).order_by('-created_at')[:5]
     
     # Nombre de notifications non lues
     unread_notifications = Notification.objects.filter(
@@ -66,7 +69,10 @@ def dashboard(request):
         read_at__gte=three_days_ago
     ).exclude(
         type='validation_completed'  # Exclure les notifications de confirmation de validation
-    ).select_related('gap', 'gap__gap_report', 'gap_report').order_by('-read_at')[:10]
+    ).select_related(
+        'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+        'gap_report__service', 'gap_report__audit_source'
+    ).order_by('-read_at')[:10]
     
     # Mélanger les actions et notifications lues, prendre les 5 plus récentes
     history_items = []
@@ -6,35 +6,43 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.cache import cache_page
 from django.db.models import Q, Prefetch
 from django.core.cache import cache
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.utils import timezone
 
-from core.models import GapReport, Gap, AuditSource, Service, Process, GapType, User, GapReportAttachment, GapAttachment, HistoriqueModification
+from core.models import GapReport, Gap, AuditSource, Service, Process, GapType, User, GapReportAttachment, GapAttachment
 from core.forms import GapReportForm, GapForm, GapAttachmentForm
-from core.utils.cache import get_cached_services, get_cached_gap_types, get_cached_audit_sources, cache_key_for_user
+from core.utils.cache import (
+    get_cached_services, get_cached_gap_types, get_cached_audit_sources, get_cached_processes,
+    get_cached_gap_types_for_audit_source,
+    cache_key_for_user, tagged_cache_key, cache_response
+)
 from core.utils.pagination import paginate_queryset, get_page_range
+from core.utils.historique_archive import historique_recent, historique_timeline
 from core.signals import set_current_user
 
 
 def get_services_hierarchical_order():
-    """Retourne les services actifs triés par ordre alphabétique hiérarchique."""
+    """
+    Retourne les services actifs triés par ordre alphabétique hiérarchique.
+    Une seule requête : l'arbre est reconstruit en mémoire.
+    """
     services_ordered = []
     
-    # D'abord, récupérer tous les services racines actifs triés par nom
-    services_racines = Service.objects.filter(parent__isnull=True, actif=True).order_by('nom')
+    # Sous-services actifs de chaque service, déjà triés par nom
+    enfants = {}
+    for service in Service.objects.filter(actif=True).order_by('nom'):
+        enfants.setdefault(service.parent_id, []).append(service)
     
     def add_service_and_children(service, level=0):
         """Ajoute récursivement un service et ses enfants actifs triés par nom."""
         services_ordered.append(service)
-        # Récupérer les sous-services actifs triés par nom
-        sous_services = service.sous_services.filter(actif=True).order_by('nom')
-        for sous_service in sous_services:
+        for sous_service in enfants.get(service.id, []):
             add_service_and_children(sous_service, level + 1)
     
-    # Construire la liste hiérarchique
-    for service_racine in services_racines:
+    # Construire la liste hiérarchique depuis les services racines
+    for service_racine in enfants.get(None, []):
         add_service_and_children(service_racine)
     
     return services_ordered
@@ -221,7 +229,7 @@ def gap_list(request):
         try:
             service_id = int(selected_service)
             # Chercher dans le cache d'abord
-            cache_key = f"service:{service_id}"
+            cache_key = tagged_cache_key(f"service:{service_id}", ['services'])
             selected_service_obj = cache.get(cache_key)
             if not selected_service_obj:
                 selected_service_obj = Service.objects.get(id=service_id, actif=True)
@@ -385,7 +393,7 @@ def gap_report_list(request):
     if selected_service:
         try:
             # Chercher dans le cache d'abord
-            cache_key = f"service:{selected_service}"
+            cache_key = tagged_cache_key(f"service:{selected_service}", ['services'])
             service_obj = cache.get(cache_key)
             if not service_obj:
                 from core.models import Service
@@ -438,9 +446,7 @@ def gap_report_detail(request, pk):
     # Récupérer l'historique complet de la déclaration (pour admin/superadmin uniquement)
     historique = []
     if request.user.droits in ['SA', 'AD']:
-        historique = HistoriqueModification.objects.filter(
-            gap_report=gap_report
-        ).select_related('utilisateur').order_by('-created_at')[:50]  # Limiter à 50 entrées récentes
+        historique = historique_recent(gap_report, limit=50)  # Limiter à 50 entrées récentes
     
     context = {
         'gap_report': gap_report,
@@ -590,9 +596,9 @@ def gap_report_create(request):
         # Si pas de service défini, afficher toutes les sources actives
         audit_sources = AuditSource.objects.filter(is_active=True).order_by('name')
     
-    processes = Process.objects.filter(is_active=True).order_by('code')
+    processes = get_cached_processes()
     users = User.objects.filter(actif=True).order_by('nom', 'prenom')  # Seuls les utilisateurs actifs
-    gap_types = GapType.objects.filter(is_active=True).order_by('audit_source__name', 'name')
+    gap_types = get_cached_gap_types()
     
     context = {
         'services': services,
@@ -998,7 +1004,6 @@ def delete_gap_confirm(request, pk):
 
 
 @login_required
-@cache_page(300)  # Cache pendant 5 minutes
 def get_gap_types(request):
     """
     API HTMX pour récupérer les types d'écart selon la source d'audit sélectionnée.
@@ -1008,15 +1013,7 @@ def get_gap_types(request):
     
     if audit_source_id:
         # Utiliser le cache pour les types d'écart
-        cache_key = f"gap_types:audit_source:{audit_source_id}"
-        gap_types = cache.get(cache_key)
-        
-        if gap_types is None:
-            gap_types = list(GapType.objects.filter(
-                audit_source_id=audit_source_id,
-                is_active=True
-            ).order_by('name'))
-            cache.set(cache_key, gap_types, 1800)  # 30 minutes
+        gap_types = get_cached_gap_types_for_audit_source(audit_source_id)
     else:
         gap_types = []
     
@@ -1036,6 +1033,7 @@ def get_gap_types(request):
 
 
 @login_required
+@cache_response(['audit_sources', 'processes'], per_user=False)
 def get_process_field(request):
     """
     API HTMX pour afficher/masquer le champ processus selon la source d'audit.
@@ -1052,9 +1050,9 @@ def get_process_field(request):
         requires_process = False
     
     if requires_process:
-        processes = Process.objects.filter(is_active=True).order_by('code')
+        processes = get_cached_processes()
     else:
-        processes = Process.objects.none()
+        processes = []
     
     context = {
         'requires_process': requires_process,
@@ -1211,10 +1209,8 @@ def gap_detail(request, pk):
     if hasattr(gap, 'validations'):
         validations = gap.validations.select_related('validator').order_by('level', 'validated_at')
     
-    # Récupérer l'historique des modifications
-    historique = HistoriqueModification.objects.filter(
-        Q(gap=gap) | Q(gap_report=gap.gap_report)
-    ).select_related('utilisateur').order_by('-created_at')[:10]
+    # Récupérer l'historique des modifications (table puis archive)
+    historique = historique_recent(gap.gap_report, gap=gap, limit=10)
     
     context = {
         'gap': gap,
@@ -1227,6 +1223,7 @@ def gap_detail(request, pk):
     return render(request, 'core/gaps/gap_detail.html', context)
 
 
+@cache_response(['services', 'validateurs', 'audit_sources'], per_user=False)
 def get_audit_sources_field(request):
     """
     API HTMX pour filtrer les sources d'audit selon le service sélectionné.
@@ -1272,4 +1269,74 @@ def get_audit_sources_field(request):
         'selected_audit_source': selected_audit_source,
         'service_id': service_id
     }
-    return render(request, 'core/gaps/partials/audit_sources_field.html', context)
\ No newline at end of file
+    return render(request, 'core/gaps/partials/audit_sources_field.html', context)
+
+@login_required
+def historique_timeline_api(request):
+    """
+    API du fil d'historique des modifications, paginée par curseur (réservée aux administrateurs).
+    
+    Paramètres GET : gap_report, gap, objet_type + objet_id, utilisateur, action,
+    date_from, date_to (AAAA-MM-JJ, bornes incluses), cursor, limit (25 par défaut, 100 max).
+    """
+    if request.user.droits not in ['SA', 'AD']:
+        return JsonResponse({'error': "Accès réservé aux administrateurs."}, status=403)
+    
+    filters = {}
+    try:
+        if request.GET.get('gap'):
+            filters['gap'] = get_object_or_404(Gap, pk=int(request.GET['gap']))
+        elif request.GET.get('gap_report'):
+            filters['gap_report'] = get_object_or_404(GapReport, pk=int(request.GET['gap_report']))
+        elif request.GET.get('objet_type') and request.GET.get('objet_id'):
+            filters['objet_type'] = request.GET['objet_type']
+            filters['objet_id'] = int(request.GET['objet_id'])
+        
+        if request.GET.get('utilisateur'):
+            filters['utilisateur'] = int(request.GET['utilisateur'])
+        if request.GET.get('action'):
+            filters['action'] = request.GET['action']
+        
+        current_tz = timezone.get_current_timezone()
+        if request.GET.get('date_from'):
+            date_from = datetime.strptime(request.GET['date_from'], '%Y-%m-%d')
+            filters['date_from'] = timezone.make_aware(date_from, current_tz)
+        if request.GET.get('date_to'):
+            date_to = datetime.strptime(request.GET['date_to'], '%Y-%m-%d') + timedelta(days=1)
+            filters['date_to'] = timezone.make_aware(date_to, current_tz)
+        
+        per_page = int(request.GET.get('limit', 25))
+        entries, next_cursor = historique_timeline(
+            cursor=request.GET.get('cursor') or None,
+            per_page=per_page,
+            **filters
+        )
+    except ValueError as e:
+        return JsonResponse({'error': f"Paramètre invalide : {e}"}, status=400)
+    
+    results = []
+    for entry in entries:
+        results.append({
+            'id': entry.id,
+            'created_at': entry.created_at.isoformat(),
+            'action': entry.action,
+            'action_display': entry.get_action_display(),
+            'objet_type': entry.objet_type,
+            'objet_id': entry.objet_id,
+            'objet_repr': entry.objet_repr,
+            'description': entry.description,
+            'utilisateur': {
+                'id': entry.utilisateur_id,
+                'matricule': entry.utilisateur.matricule if entry.utilisateur else None,
+                'get_full_name': entry.utilisateur.get_full_name() if entry.utilisateur else None,
+            },
+            'donnees_avant': entry.donnees_avant,
+            'donnees_apres': entry.donnees_apres,
+            'est_archive': getattr(entry, 'est_archive', False),
+        })
+    
+    return JsonResponse({
+        'results': results,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None,
+    })
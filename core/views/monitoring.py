@@ -0,0 +1,34 @@
+"""
+Vues de supervision : exposition des métriques au format Prometheus.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.utils.metrics import collect_notification_backlog, registry
+
+
+def _metrics_authorized(request):
+    """
+    Accès réservé au collecteur (jeton METRICS_TOKEN en en-tête Authorization: Bearer)
+    et aux administrateurs connectés.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorization = request.headers.get('Authorization', '')
+    if token and authorization.startswith('Bearer '):
+        return hmac.compare_digest(authorization[len('Bearer '):].encode(), token.encode())
+    user = request.user
+    return user.is_authenticated and user.droits in ['SA', 'AD']
+
+
+def metrics(request):
+    """
+    Métriques de l'application au format d'exposition texte Prometheus
+    (additionnées sur tous les workers si METRICS_DIR est configuré).
+    """
+    if not _metrics_authorized(request):
+        return HttpResponseForbidden("Accès refusé.")
+    
+    content = registry.render(extra_collectors=[collect_notification_backlog])
+    return HttpResponse(content, content_type='text/plain; version=0.0.4; charset=utf-8')
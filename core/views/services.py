@@ -8,12 +8,11 @@ from django.views.decorators.http import require_POST
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import user_passes_test
 from django.urls import reverse
-from django.db import transaction
 from django.template.loader import render_to_string
 from django.middleware.csrf import get_token
-from datetime import datetime
-import json
 from ..models import Service, GapReport
+from ..utils.exports import SERVICE_EXPORT_FIELDS, export_filename, service_export_record, streaming_export_response
+from ..utils.imports import ImportFileError, import_services, iter_json_records, sync_services
 
 
 def services_list(request):
@@ -266,43 +265,17 @@ def is_admin_or_superadmin(user):
 @staff_member_required
 def export_services_json(request):
     """
-    Exporte tous les services en JSON avec nommage automatique.
+    Exporte tous les services en JSON (ou NDJSON avec ?format=ndjson) avec nommage automatique, en flux.
     """
-    services = Service.objects.all().select_related('parent').order_by('nom')
-    
-    # Préparer les données pour l'export
-    data = []
-    for service in services:
-        service_data = {
-            'id': service.id,
-            'nom': service.nom,
-            'code': service.code,
-            'parent_id': service.parent.id if service.parent else None,
-            'parent_code': service.parent.code if service.parent else None,
-            'created_at': service.created_at.isoformat() if service.created_at else None,
-            'updated_at': service.updated_at.isoformat() if service.updated_at else None,
-        }
-        data.append(service_data)
-    
-    # Préparer le fichier JSON avec métadonnées
-    export_data = {
-        'model': 'Service',
-        'export_date': datetime.now().isoformat(),
-        'total_records': len(data),
-        'data': data
-    }
-    
-    # Créer la réponse HTTP avec le fichier JSON
-    response = HttpResponse(
-        json.dumps(export_data, indent=2, ensure_ascii=False),
-        content_type='application/json; charset=utf-8'
-    )
+    services = Service.objects.order_by('nom')
     
     # Nom du fichier avec convention : modele_YYMMDD.json
-    filename = f"Service_{datetime.now().strftime('%y%m%d')}.json"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    filename = export_filename(request, 'Service')
+    response = streaming_export_response(
+        request, 'Service', services, SERVICE_EXPORT_FIELDS, service_export_record, filename
+    )
     
-    messages.success(request, f'Export terminé : {len(data)} services exportés dans {filename}')
+    messages.success(request, f'Export lancé : services exportés dans {filename}')
     return response
 
 
@@ -310,7 +283,11 @@ def export_services_json(request):
 def import_services_json(request):
     """
     Importe des services depuis un fichier JSON.
-    Import destructif qui remplace toute la base de données existante.
+    Par défaut, les services sont synchronisés par code (créations, modifications, désactivations,
+    jamais de suppression) ; dry_run affiche le différentiel sans rien modifier et no_deactivate
+    conserve les services absents du fichier.
+    ⚠️ ATTENTION : avec mode=replace, l'import est destructif et remplace tous les services existants ;
+    si une ligne du fichier est invalide, rien n'est modifié (voir import_services --replace --ignore-errors).
     """
     if request.method == 'POST':
         json_file = request.FILES.get('json_file')
@@ -323,101 +300,85 @@ def import_services_json(request):
             messages.error(request, 'Le fichier doit être au format JSON.')
             return redirect('import_services_form')
         
+        if request.POST.get('mode') != 'replace':
+            return _sync_services_json(request, json_file)
+        
         try:
-            # Lire et parser le fichier JSON
-            file_content = json_file.read().decode('utf-8')
-            json_data = json.loads(file_content)
-            
-            # Vérifier la structure du fichier
-            if 'data' not in json_data:
-                messages.error(request, 'Structure JSON invalide : clé "data" manquante.')
-                return redirect('import_services_form')
-            
-            services_data = json_data['data']
-            
-            # Statistiques d'import
-            created_count = 0
-            errors = []
-            
-            with transaction.atomic():
-                # ÉTAPE 1: SUPPRIMER TOUS LES SERVICES EXISTANTS
-                deleted_count = Service.objects.count()
-                Service.objects.all().delete()
-                
-                # ÉTAPE 2: CRÉER UN MAPPING ID ANCIEN -> NOUVEAU SERVICE
-                id_mapping = {}
-                
-                # Trier les services par niveau hiérarchique (parents d'abord)
-                services_data_sorted = sorted(services_data, key=lambda x: 0 if x.get('parent_id') is None else 1)
-                
-                # ÉTAPE 3: CRÉER TOUS LES SERVICES EN DEUX PASSES
-                # Première passe : créer tous les services sans parent
-                for service_data in services_data_sorted:
-                    try:
-                        old_id = service_data.get('id')
-                        nom = service_data.get('nom', 'N/A')
-                        code = service_data.get('code', 'N/A')
-                        
-                        # Créer le service sans parent d'abord
-                        service = Service.objects.create(
-                            nom=nom,
-                            code=code,
-                            parent=None  # Parent sera défini en deuxième passe
-                        )
-                        
-                        # Mapper l'ancien ID vers le nouveau service
-                        if old_id:
-                            id_mapping[old_id] = service
-                        
-                        created_count += 1
-                        
-                    except Exception as e:
-                        error_msg = f"Erreur pour le service {service_data.get('code', 'N/A')}: {str(e)}"
-                        errors.append(error_msg)
-                
-                # Deuxième passe : définir les relations parent-enfant
-                for service_data in services_data_sorted:
-                    try:
-                        old_id = service_data.get('id')
-                        parent_id = service_data.get('parent_id')
-                        
-                        if old_id in id_mapping and parent_id and parent_id in id_mapping:
-                            service = id_mapping[old_id]
-                            parent_service = id_mapping[parent_id]
-                            service.parent = parent_service
-                            service.save()
-                            
-                    except Exception as e:
-                        error_msg = f"Erreur de relation parent pour le service {service_data.get('code', 'N/A')}: {str(e)}"
-                        errors.append(error_msg)
-            
-            # Messages de résultat
-            if created_count:
-                messages.success(
-                    request, 
-                    f'Import terminé : {deleted_count} services supprimés, {created_count} services importés depuis le fichier JSON.'
-                )
-            
-            if errors:
-                for error in errors[:5]:  # Afficher max 5 erreurs
-                    messages.error(request, error)
-                if len(errors) > 5:
-                    messages.error(request, f'... et {len(errors) - 5} autres erreurs.')
-            
-            # Rediriger vers la page admin des services après un import réussi
-            return redirect('/admin/core/service/')
-            
-        except json.JSONDecodeError:
-            messages.error(request, 'Fichier JSON invalide.')
+            # Lecture en flux, hiérarchie ordonnée par niveaux puis création groupée (voir core.utils.imports)
+            result = import_services(iter_json_records(json_file))
+        except ImportFileError as e:
+            messages.error(request, str(e))
             return redirect('import_services_form')
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'import : {str(e)}')
             return redirect('import_services_form')
+        
+        # Messages de résultat
+        if result.aborted:
+            messages.error(
+                request,
+                f'Import annulé : {len(result.errors)} ligne(s) en erreur, aucun service modifié. '
+                'Corrigez le fichier, ou importez les seules lignes valides avec la commande '
+                '"python manage.py import_services <fichier> --replace --ignore-errors".'
+            )
+        elif result.created:
+            messages.success(
+                request, 
+                f'Import terminé : {result.deleted} services supprimés, {result.created} services importés depuis le fichier JSON.'
+            )
+        
+        if result.errors:
+            for error in result.format_errors(limit=5):  # Afficher max 5 erreurs
+                messages.error(request, error)
+            if len(result.errors) > 5:
+                messages.error(request, f'... et {len(result.errors) - 5} autres erreurs.')
+        
+        if result.aborted:
+            return redirect('import_services_form')
+        
+        # Rediriger vers la page admin des services après un import réussi
+        return redirect('/admin/core/service/')
     
     # Si GET, afficher le formulaire d'import
     return render(request, 'admin/core/service/import_form.html')
 
 
+def _sync_services_json(request, json_file):
+    """Synchronisation des services par code (import non destructif)."""
+    dry_run = bool(request.POST.get('dry_run'))
+    try:
+        result = sync_services(
+            iter_json_records(json_file),
+            deactivate_missing=not request.POST.get('no_deactivate'),
+            dry_run=dry_run,
+        )
+    except ImportFileError as e:
+        messages.error(request, str(e))
+        return redirect('import_services_form')
+    except Exception as e:
+        messages.error(request, f'Erreur lors de l\'import : {str(e)}')
+        return redirect('import_services_form')
+    
+    if dry_run:
+        messages.info(
+            request,
+            f'Simulation : {result.summary()} (écriture estimée : {result.timings["write"]:.2f}s). Aucune modification enregistrée.'
+        )
+        for change in result.changes[:20]:  # Afficher max 20 changements
+            messages.info(request, change)
+        if len(result.changes) > 20:
+            messages.info(request, f'... et {len(result.changes) - 20} autres changements.')
+    else:
+        messages.success(request, f'Synchronisation terminée : {result.summary()}.')
+    
+    for error in result.format_errors(limit=5):  # Afficher max 5 erreurs
+        messages.error(request, error)
+    if len(result.errors) > 5:
+        messages.error(request, f'... et {len(result.errors) - 5} autres erreurs.')
+    
+    return redirect('import_services_form' if dry_run else '/admin/core/service/')
+
+
 @staff_member_required  
 def import_services_form(request):
     """
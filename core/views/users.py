@@ -7,11 +7,10 @@ from django.contrib import messages
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.urls import reverse
-from django.db import transaction
 from django.contrib.auth import get_user_model
-from datetime import datetime
-import json
 from ..models import Service, ValidateurService, AuditSource
+from ..utils.exports import USER_EXPORT_FIELDS, export_filename, streaming_export_response, user_export_record
+from ..utils.imports import ImportFileError, import_users, iter_json_records, sync_users
 
 User = get_user_model()
 
@@ -446,54 +445,16 @@ def user_reset_password(request, pk):
 @user_passes_test(user_can_manage_users)
 def export_users_json(request):
     """
-    Export tous les utilisateurs au format JSON.
+    Export tous les utilisateurs au format JSON (ou NDJSON avec ?format=ndjson), en flux.
     """
-    
-    # Récupérer tous les utilisateurs avec leurs services
-    users = User.objects.select_related('service').order_by('matricule')
-    
-    # Préparer les données pour l'export
-    data = []
-    for user in users:
-        user_data = {
-            'id': user.id,
-            'matricule': user.matricule,
-            'nom': user.nom,
-            'prenom': user.prenom,
-            'email': user.email or None,
-            'droits': user.droits,
-            'service_id': user.service.id if user.service else None,
-            'service_code': user.service.code if user.service else None,
-            'actif': user.actif,
-            'must_change_password': user.must_change_password,
-            'is_staff': user.is_staff,
-            'is_superuser': user.is_superuser,
-            'created_at': user.created_at.isoformat() if hasattr(user, 'created_at') else None,
-            'updated_at': user.updated_at.isoformat() if hasattr(user, 'updated_at') else None,
-            'last_login': user.last_login.isoformat() if user.last_login else None,
-        }
-        data.append(user_data)
-    
-    # Créer la structure d'export
-    export_data = {
-        'model': 'User',
-        'export_date': datetime.now().isoformat(),
-        'total_records': len(data),
-        'data': data
-    }
+    users = User.objects.order_by('matricule')
     
     # Générer le nom de fichier avec la date
-    filename = f"Users_{datetime.now().strftime('%y%m%d')}.json"
-    
-    # Créer la réponse HTTP avec le fichier JSON
-    response = HttpResponse(
-        json.dumps(export_data, indent=2, ensure_ascii=False),
-        content_type='application/json; charset=utf-8'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    filename = export_filename(request, 'Users')
+    response = streaming_export_response(request, 'User', users, USER_EXPORT_FIELDS, user_export_record, filename)
     
     # Message de succès
-    messages.success(request, f'Export terminé : {len(data)} utilisateurs exportés dans {filename}')
+    messages.success(request, f'Export lancé : utilisateurs exportés dans {filename}')
     
     return response
 
@@ -503,7 +464,12 @@ def export_users_json(request):
 def import_users_json(request):
     """
     Import des utilisateurs depuis un fichier JSON.
-    ⚠️ ATTENTION : Cette opération supprime TOUS les utilisateurs existants.
+    Par défaut, les utilisateurs sont synchronisés par matricule (créations, modifications,
+    désactivations, jamais de suppression) ; dry_run affiche le différentiel sans rien modifier
+    et no_deactivate conserve les utilisateurs absents du fichier.
+    ⚠️ ATTENTION : avec mode=replace, TOUS les utilisateurs existants sont supprimés puis recréés.
+    Si une ligne du fichier est invalide, rien n'est modifié : l'import des seules lignes valides
+    se fait par la commande import_users --replace --ignore-errors.
     """
     
     if request.method == 'POST':
@@ -516,100 +482,87 @@ def import_users_json(request):
             messages.error(request, 'Le fichier doit être au format JSON.')
             return redirect('import_users_form')
         
+        if request.POST.get('mode') != 'replace':
+            return _sync_users_json(request, json_file)
+        
         try:
-            # Lire et parser le JSON
-            file_content = json_file.read().decode('utf-8')
-            try:
-                data = json.loads(file_content)
-            except json.JSONDecodeError as e:
-                messages.error(request, f'Fichier JSON invalide : {str(e)}')
-                return redirect('import_users_form')
-            
-            # Vérifier la structure du fichier
-            if not isinstance(data, dict) or 'data' not in data:
-                messages.error(request, 'Structure de fichier JSON invalide. Le fichier doit contenir une clé "data".')
-                return redirect('import_users_form')
-            
-            users_data = data['data']
-            if not isinstance(users_data, list):
-                messages.error(request, 'La clé "data" doit contenir une liste d\'utilisateurs.')
-                return redirect('import_users_form')
-            
-            # Statistiques d'import
-            deleted_count = 0
-            created_count = 0
-            
-            # Transaction atomique pour assurer la cohérence
-            try:
-                with transaction.atomic():
-                    # Étape 1: Supprimer TOUS les utilisateurs existants (sauf l'utilisateur actuel)
-                    current_user = request.user
-                    existing_users = User.objects.exclude(pk=current_user.pk)
-                    deleted_count = existing_users.count()
-                    existing_users.delete()
-                    
-                    # Étape 2: Créer les utilisateurs depuis le JSON
-                    services_map = {}  # Cache pour les services
-                    
-                    for user_data in users_data:
-                        # Éviter de recréer l'utilisateur actuel
-                        if user_data.get('id') == current_user.pk or user_data.get('matricule') == current_user.matricule:
-                            continue
-                            
-                        # Récupérer ou créer le service si spécifié
-                        service = None
-                        if user_data.get('service_code'):
-                            service_code = user_data['service_code']
-                            if service_code not in services_map:
-                                try:
-                                    services_map[service_code] = Service.objects.get(code=service_code)
-                                except Service.DoesNotExist:
-                                    # Si le service n'existe pas, on ignore cette affectation
-                                    services_map[service_code] = None
-                            service = services_map[service_code]
-                        
-                        # Créer l'utilisateur
-                        user = User(
-                            matricule=user_data.get('matricule'),
-                            nom=user_data.get('nom', ''),
-                            prenom=user_data.get('prenom', ''),
-                            email=user_data.get('email') or '',
-                            droits=user_data.get('droits', User.USER),
-                            service=service,
-                            must_change_password=True,  # Toujours True pour les imports
-                            is_staff=user_data.get('is_staff', False),
-                            is_superuser=user_data.get('is_superuser', False),
-                        )
-                        
-                        # Définir le mot de passe par défaut
-                        user.set_password('azerty')
-                        
-                        # Sauvegarder
-                        user.full_clean()  # Validation
-                        user.save()
-                        created_count += 1
-                
-                # Message de succès
-                messages.success(
-                    request,
-                    f'Import terminé : {deleted_count} utilisateurs supprimés, {created_count} utilisateurs importés depuis le fichier JSON.'
-                )
-                
-                # Rediriger vers la page admin des utilisateurs après un import réussi
-                return redirect('admin:core_user_changelist')
-                
-            except Exception as e:
-                messages.error(request, f'Erreur lors de l\'import : {str(e)}')
-                return redirect('import_users_form')
-            
+            # Lecture en flux, validation par lots puis écriture groupée (voir core.utils.imports)
+            result = import_users(iter_json_records(json_file), exclude_user=request.user)
+        except ImportFileError as e:
+            messages.error(request, str(e))
+            return redirect('import_users_form')
         except Exception as e:
             messages.error(request, f'Erreur lors de l\'import : {str(e)}')
             return redirect('import_users_form')
+        
+        if result.aborted:
+            messages.error(
+                request,
+                f'Import annulé : {len(result.errors)} ligne(s) en erreur, aucun utilisateur modifié. '
+                'Corrigez le fichier, ou importez les seules lignes valides avec la commande '
+                '"python manage.py import_users <fichier> --replace --ignore-errors".'
+            )
+        else:
+            # Message de succès
+            messages.success(
+                request,
+                f'Import terminé : {result.deleted} utilisateurs supprimés, {result.created} utilisateurs importés depuis le fichier JSON.'
+            )
+        
+        # Erreurs ligne par ligne
+        if result.errors:
+            for error in result.format_errors(limit=5):  # Afficher max 5 erreurs
+                messages.error(request, error)
+            if len(result.errors) > 5:
+                messages.error(request, f'... et {len(result.errors) - 5} autres erreurs.')
+        
+        if result.aborted:
+            return redirect('import_users_form')
+        
+        # Rediriger vers la page admin des utilisateurs après un import réussi
+        return redirect('admin:core_user_changelist')
     
     # Si GET, afficher le formulaire d'import
     return render(request, 'admin/core/user/import_form.html')
 
 
+def _sync_users_json(request, json_file):
+    """Synchronisation des utilisateurs par matricule (import non destructif)."""
+    dry_run = bool(request.POST.get('dry_run'))
+    try:
+        result = sync_users(
+            iter_json_records(json_file),
+            exclude_user=request.user,
+            deactivate_missing=not request.POST.get('no_deactivate'),
+            dry_run=dry_run,
+        )
+    except ImportFileError as e:
+        messages.error(request, str(e))
+        return redirect('import_users_form')
+    except Exception as e:
+        messages.error(request, f'Erreur lors de l\'import : {str(e)}')
+        return redirect('import_users_form')
+    
+    if dry_run:
+        messages.info(
+            request,
+            f'Simulation : {result.summary()} (écriture estimée : {result.timings["write"]:.2f}s). Aucune modification enregistrée.'
+        )
+        for change in result.changes[:20]:  # Afficher max 20 changements
+            messages.info(request, change)
+        if len(result.changes) > 20:
+            messages.info(request, f'... et {len(result.changes) - 20} autres changements.')
+    else:
+        messages.success(request, f'Synchronisation terminée : {result.summary()}.')
+    
+    for error in result.format_errors(limit=5):  # Afficher max 5 erreurs
+        messages.error(request, error)
+    if len(result.errors) > 5:
+        messages.error(request, f'... et {len(result.errors) - 5} autres erreurs.')
+    
+    return redirect('import_users_form' if dry_run else 'admin:core_user_changelist')
+
+
 @login_required
 @user_passes_test(user_can_manage_users)
 def import_users_form(request):
@@ -8,9 +8,10 @@ from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
 from django.db.models import Max
-from ..models import Gap, Notification, GapValidation
+from ..models import Gap, Notification, GapValidation, HistoriqueModification
 from ..services.validation_service import ValidationService
-from ..signals import set_current_user
+from ..signals import describe_status_change, set_current_user
+from ..utils.historique import historique_logged
 
 
 @login_required
@@ -96,7 +97,10 @@ def notifications_list(request):
     """
     notifications = Notification.objects.filter(
         user=request.user
-    ).select_related('gap', 'gap__gap_report', 'gap__gap_type').order_by('-created_at')
+    ).select_related(
+        'gap__gap_type', 'gap__gap_report__service', 'gap__gap_report__audit_source',
+        'gap_report__service', 'gap_report__audit_source'
+    ).order_by('-created_at')
     
     # Marquer les notifications comme lues si demandé
     mark_read = request.GET.get('mark_read')
@@ -270,9 +274,19 @@ def change_gap_status(request, gap_id):
             with transaction.atomic():
                 old_status = gap.status
                 gap.status = new_status
-                gap.save(update_fields=['status', 'updated_at'])
                 
-                # L'historique est automatiquement créé par le signal post_save
+                # Historiser explicitement le changement de statut (avec le commentaire) ;
+                # le signal post_save générique ne le double pas
+                HistoriqueModification.enregistrer_modification(
+                    objet=gap,
+                    action='changement_statut',
+                    utilisateur=request.user,
+                    description=describe_status_change(gap, old_status, new_status, comment),
+                    donnees_avant={'status': old_status},
+                    donnees_apres={'status': new_status}
+                )
+                with historique_logged(gap):
+                    gap.save(update_fields=['status', 'updated_at'])
                 
                 # Créer une entrée dans l'historique des validations pour les changements de statut directs
                 if new_status in ['retained', 'rejected', 'closed']:
@@ -313,14 +327,16 @@ def change_gap_status(request, gap_id):
                 # Créer des notifications si nécessaire
                 if new_status in ['retained', 'rejected', 'closed']:
                     # Notifier le déclarant du changement de statut
-                    Notification.objects.create(
+                    Notification.notify(
                         user=gap.gap_report.declared_by,
                         gap=gap,
                         type='gap_status_changed',
-                        title=f"{gap.gap_number} - Statut modifié",
-                        message=f"Le statut de votre événement {gap.gap_number} a été modifié vers '{gap.get_status_display()}' par {request.user.get_full_name()}."
-                                f"{f' Commentaire: {comment}' if comment else ''}",
-                        priority='normal'
+                        template_key='gap_status_changed',
+                        priority='normal',
+                        gap_number=gap.gap_number,
+                        status=gap.get_status_display(),
+                        author=request.user.get_full_name(),
+                        comment=comment
                     )
                 
                 messages.success(request, f"Statut de l'écart {gap.gap_number} modifié vers '{gap.get_status_display()}'.")
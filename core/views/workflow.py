@@ -10,6 +10,7 @@ from django.db import transaction, models
 from django.core.exceptions import ValidationError
 from django.db.models import Prefetch
 from ..models import ValidateurService, Service, User, AuditSource
+from ..utils.cache import cache_response, get_cached_validateurs_matrix
 
 
 @staff_member_required
@@ -65,14 +66,13 @@ def workflow_management(request):
         for audit_source in audit_sources:
             validateurs_dict[service.id][audit_source.id] = {1: None, 2: None, 3: None}
     
-    # Remplir le dictionnaire avec les validateurs existants
-    for vs in ValidateurService.objects.filter(
-        service__in=services_feuilles, 
-        actif=True,
-        audit_source__is_active=True  # Filtrer par sources d'audit actives
-    ).select_related('validateur', 'service', 'audit_source'):
-        if vs.service.id in validateurs_dict and vs.audit_source.id in validateurs_dict[vs.service.id]:
-            validateurs_dict[vs.service.id][vs.audit_source.id][vs.niveau] = vs
+    # Remplir le dictionnaire avec les validateurs existants (matrice en cache)
+    for service_id, validateurs_sources in get_cached_validateurs_matrix().items():
+        if service_id not in validateurs_dict:
+            continue
+        for audit_source_id, validateurs_niveaux in validateurs_sources.items():
+            if audit_source_id in validateurs_dict[service_id]:
+                validateurs_dict[service_id][audit_source_id].update(validateurs_niveaux)
     
     for service in services_feuilles:
         service_has_validators = False
@@ -393,6 +393,7 @@ def search_users(request):
 
 
 @staff_member_required
+@cache_response(['services', 'validateurs', 'audit_sources'], per_user=False)
 def service_detail_api(request, service_id):
     """
     API endpoint optimisée pour récupérer les détails d'un service.
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecarts_actions.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+# Préchauffage des caches au démarrage du worker (voir la commande warm_caches)
+if getattr(settings, 'WARM_CACHES_ON_STARTUP', False):
+    from core.utils.cache_warmup import warm_caches_in_background
+    warm_caches_in_background()
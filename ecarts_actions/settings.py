@@ -50,14 +50,18 @@ if DEBUG:
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PerformanceMonitoringMiddleware',
+    'core.middleware.ServerTimingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'core.middleware.ForcePasswordChangeMiddleware',
     'core.middleware.HistoriqueMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ServerTimingViewMiddleware',
 ]
 
 # Ajout du middleware Debug Toolbar pour le développement
@@ -70,7 +74,8 @@ ROOT_URLCONF = 'ecarts_actions.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates avec mesure du rendu pour l'en-tête Server-Timing
+        'BACKEND': 'core.utils.server_timing.ServerTimingTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -390,10 +395,41 @@ if DEBUG:
         'debug_toolbar.panels.profiling.ProfilingPanel',
     ]
 
-# Performance monitoring en production
-if not DEBUG:
-    # Configuration pour monitorer les requêtes lentes
-    SLOW_QUERY_THRESHOLD = 1.0  # Secondes
-    
-    # Middleware de monitoring personnalisé
-    MIDDLEWARE.append('core.middleware.PerformanceMonitoringMiddleware')
+# Performance monitoring (PerformanceMonitoringMiddleware, actif dans tous les environnements)
+# Configuration pour monitorer les requêtes lentes
+SLOW_QUERY_THRESHOLD = 1.0  # Secondes
+PERFORMANCE_MAX_QUERIES = 20  # Requêtes SQL par requête HTTP
+PERFORMANCE_DUPLICATE_THRESHOLD = 5  # Exécutions d'une même forme de requête
+# Seuils par vue, par nom de vue résolu, ex: {'gaps:gap_list': {'time': 2.0, 'queries': 40}}
+PERFORMANCE_VIEW_THRESHOLDS = {
+    'workflow_management': {'time': 2.0},
+}
+
+# Échantillonnage des requêtes SQL lentes (consultables dans l'administration, regroupées par forme)
+SLOW_QUERY_SAMPLING = True
+SLOW_QUERY_SAMPLE_RATE = 0.01  # Fraction des requêtes HTTP échantillonnées (plus toutes les requêtes lentes)
+SLOW_QUERY_SAMPLE_SIZE = 5  # Requêtes SQL les plus lentes conservées par requête HTTP
+SLOW_QUERY_SAMPLE_MIN_DURATION = 0.05  # Secondes
+SLOW_QUERY_SAMPLE_MAX_ROWS = 5000  # Taille maximale de la table d'échantillons
+SLOW_QUERY_EXPLAIN_ANALYZE = False  # EXPLAIN ANALYZE (PostgreSQL) : réexécute la requête
+
+# En-tête Server-Timing (décomposition du temps de chaque réponse dans les outils du navigateur)
+SERVER_TIMING_ENABLED = True
+
+# Profilage à la demande (?__profile=1 ou en-tête X-Profile: 1, administrateurs SA/AD)
+PROFILING_ENABLED = True
+PROFILE_SAMPLE_INTERVAL = 0.005  # Secondes entre deux relevés de pile
+PROFILE_MAX_ROWS = 200  # Nombre maximal de profils conservés
+
+# Détection des requêtes N+1 (développement et CI) : journalisées, ou levées si NPLUSONE_RAISE
+NPLUSONE_DETECTION = DEBUG
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_RAISE = False
+
+# Métriques Prometheus (/metrics) : répertoire partagé par les workers et jeton du collecteur
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Préchauffage des caches de référence au démarrage de chaque worker (voir la commande warm_caches)
+WARM_CACHES_ON_STARTUP = bool(os.environ.get('WARM_CACHES_ON_STARTUP'))
+WARM_CACHES_WORKERS = 4